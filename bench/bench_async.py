@@ -0,0 +1,93 @@
+# Threaded select loop vs. asyncio server: packet timing seen by a DSU client.
+#
+#   py bench/bench_async.py [hz] [seconds] [select|hybrid|timerfd]
+#
+# Each server runs against the synthetic backend on a free local port. A client
+# thread subscribes to slot 0 and timestamps every data packet. "jitter" is the
+# inter-arrival error |dt - period|. "late" is the server's own tick lateness.
+# The client keeps its requests under the subscriber timeout.
+
+import os, sys, socket, struct, threading, asyncio, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import vwiimote as vw
+
+def request(msg_type, payload):
+    return struct.pack("<4sHHII", b"DSUC", vw.PROTOCOL, len(payload) + 4, 0, 1) + struct.pack("<I", msg_type) + payload
+
+DATA_REQ = request(0x100002, bytes([1, 0]) + b"\0" * 6)   # slot 0
+
+def free_port():
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.bind((vw.HOST, 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+def client(port, hz, seconds):
+    c = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    c.settimeout(0.5)
+    period_us = 1e6 / hz
+    jitter = vw.Histogram()
+    n = 0
+    prev = None
+    next_req = 0.0
+    t_end = time.perf_counter() + seconds
+    try:
+        while True:
+            now = time.perf_counter()
+            if now >= t_end: break
+            if now >= next_req:
+                c.sendto(DATA_REQ, (vw.HOST, port))
+                next_req = now + 1.0
+            try:
+                c.recvfrom(2048)
+            except socket.timeout:
+                continue
+            t = time.perf_counter()
+            if prev is not None:
+                jitter.add(int(abs((t - prev) * 1e6 - period_us)))
+            prev = t
+            n += 1
+    finally:
+        c.close()
+    return jitter, n
+
+def run_threaded(port):
+    th = threading.Thread(target=vw.server_thread, args=([(vw.HOST, port)],), daemon=True)
+    th.start()
+    return th
+
+def run_asyncio(port):
+    th = threading.Thread(target=lambda: asyncio.run(vw.serve_async(vw.HOST, port)), daemon=True)
+    th.start()
+    return th
+
+def main():
+    hz = int(sys.argv[1]) if len(sys.argv) > 1 else 250
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    vw.use_backend(vw.ScriptedBackend())
+    vw.config.set_value("hz", hz)
+    if len(sys.argv) > 3: vw.config.set_value("sched_strategy", sys.argv[3])
+    print(f"{hz} Hz, {seconds:.1f} s per server, scheduler '{vw.config.snap.sched_key[0]}'  (us)")
+    print("(asyncio waits on a timerfd for 'select' where available, see _async_sched)")
+    print(f"{'server':<9} {'packets':>8} {'jit p50':>8} {'jit p99':>8} {'jit max':>8} {'late p50':>9} {'late p99':>9} {'cpu%':>6}")
+    for name, run in (("thread", run_threaded), ("asyncio", run_asyncio)):
+        port = free_port()
+        vw.config.want_stop = False
+        vw.stats.reset()
+        th = run(port)
+        time.sleep(0.2)
+        cpu0 = time.process_time()
+        t0 = time.perf_counter()
+        jitter, n = client(port, hz, seconds)
+        cpu = (time.process_time() - cpu0) / (time.perf_counter() - t0)
+        vw.config.want_stop = True
+        th.join(2.0)
+        late = vw.stats.lateness
+        print(f"{name:<9} {n:>8} {jitter.percentile(50):>8} {jitter.percentile(99):>8} {jitter.max_us:>8} "
+              f"{late.percentile(50):>9} {late.percentile(99):>9} {cpu*100:>6.1f}")
+    vw.config.want_stop = False
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# Binding dispatch benchmark: per-action is_binding_down() (the old resp_data path)
+# vs. CompiledBindings over one keyboard snapshot per tick.
+#
+#   py bench/bench_bindings.py [seconds]
+#
+# Input comes from the synthetic backend wrapped in a call counter that charges
+# what the Win32 backend would spend in ctypes: without the keyboard hook,
+# keys(mask) is one GetAsyncKeyState per VK in the mask ("polled" column);
+# with the hook it costs none ("hooked" column), pad reads cost one call either way.
+
+import os, sys, random, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import vwiimote as vw
+
+class CountingBackend(vw.ScriptedBackend):
+    calls = 0
+    key_polls = 0
+    def keys(self, mask):
+        self.key_polls += bin(mask).count("1")
+        return super().keys(mask)
+    def key_down(self, vk):
+        self.calls += 1
+        return (self.kb >> vk) & 1 == 1
+    def pad(self, index):
+        self.calls += 1
+        return super().pad(index)
+
+def is_binding_down(be, b, pad):
+    if not b: return False
+    kind, code = b
+    if kind == vw.BIND_VK:
+        return be.key_down(code)
+    elif kind == vw.BIND_XBTN:
+        if pad is None: return False
+        return (pad.buttons & code) != 0
+    return False
+
+def legacy(be, binds):
+    # the pre-compiled resp_data dispatch, reduced to its action word
+    xi = be.pad(0)
+    a = 0
+    for action,bit in vw.ACT_BITS.items():
+        if is_binding_down(be, binds.get(action), xi): a |= bit
+    return a
+
+def compiled(be, cb):
+    xi = be.pad(0)
+    return cb.actions(be.keys(cb.vk_mask), xi.buttons if xi is not None else 0)
+
+def make_states(n, binds, seed=99):
+    rnd = random.Random(seed)
+    bound_vks = [b[1] for b in binds.values() if b and b[0] == vw.BIND_VK]
+    out = []
+    for _ in range(n):
+        kb = 0
+        for vk in rnd.sample(bound_vks, rnd.randrange(0, 4)):
+            kb |= 1 << vk
+        if rnd.random() < 0.2: kb |= 1 << rnd.randrange(8, 254)   # unbound noise
+        out.append((kb, rnd.randrange(65536) if rnd.random() < 0.5 else 0))
+    return out
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    binds = dict(vw.DEFAULT_BINDINGS)
+    binds["wm_b"] = (vw.BIND_XBTN, vw.XBTN["RB"])        # mix in pad buttons
+    binds["spin_w"] = (vw.BIND_XBTN, vw.XBTN["LB"])
+    cb = vw.CompiledBindings(binds)
+    be = CountingBackend()
+    states = make_states(2000, binds)
+
+    for kb, buttons in states:
+        be.kb = kb
+        be.set_pad(0, buttons)
+        if legacy(be, binds) != compiled(be, cb):
+            print(f"MISMATCH kb={kb:#x} buttons={buttons:#06x}")
+            sys.exit(1)
+    print(f"identical action words: {len(states)} input states")
+
+    for name, fn, arg in (("legacy", legacy, binds), ("compiled", compiled, cb)):
+        be.calls = be.key_polls = 0
+        n = 0
+        t0 = time.perf_counter()
+        end = t0 + seconds
+        while time.perf_counter() < end:
+            for kb, buttons in states:
+                be.kb = kb
+                be.set_pad(0, buttons)
+                fn(be, arg)
+            n += len(states)
+        dt = time.perf_counter() - t0
+        print(f"{name:<9}: {dt / n * 1e9:8.0f} ns/tick   ctypes calls/tick: {(be.calls + be.key_polls) / n:5.1f} polled, {be.calls / n:5.1f} hooked")
+
+if __name__ == "__main__":
+    main()
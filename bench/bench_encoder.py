@@ -0,0 +1,82 @@
+# DSU data-packet encoder benchmark: legacy bytearray/struct.pack path vs DataPacketEncoder.
+#
+#   py bench/bench_encoder.py [seconds] [session.vwrec]
+#
+# Both paths get the same inputs; every packet is checked byte-for-byte before timing.
+# With a recorded session (see "Start Recording" in the app) it also times the full
+# resp_data() path on that realistic input via replay_session().
+
+import os, sys, struct, random, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import vwiimote as vw
+
+MAC = bytes.fromhex("02a1b2c3d4e5")
+
+def legacy_encode(idx, face, ps, active, lx, ly, tx, ty, ts_us, ax, ay, az, gx, gy, gz):
+    # The pre-encoder body of resp_data(), kept verbatim as the reference.
+    payload = bytearray()
+    payload += vw.common_begin(0, MAC)
+    payload += b"\x01"
+    payload += struct.pack("<I", idx)
+    payload += b"\x00"
+    payload += struct.pack("<B", face)
+    payload += struct.pack("<B", ps)
+    payload += (b"\x01" if active else b"\x00")
+    payload += bytes([lx, ly, 0x80, 0x80])
+    payload += b"\x00"*12
+    payload += struct.pack("<BBHH", 1 if active else 0, 1, tx, ty)
+    payload += struct.pack("<BBHH", 0, 0, 0, 0)
+    payload += struct.pack("<Q", ts_us)
+    payload += struct.pack("<fff", ax, ay, az)
+    payload += struct.pack("<fff", gx, gy, gz)
+    return vw.pack_header(0x100002, bytes(payload))
+
+def make_inputs(n, seed=1234):
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        out.append((i + 1, rnd.randrange(256), rnd.choice((0, 0x01, 0x10, 0x20)), rnd.random() < 0.9,
+                    rnd.randrange(256), rnd.randrange(256), rnd.randrange(1920), rnd.randrange(942),
+                    rnd.randrange(1 << 40), rnd.uniform(-60, 60), rnd.uniform(-60, 60), vw.G + rnd.uniform(-40, 40),
+                    rnd.uniform(-900, 900), rnd.uniform(-900, 900), rnd.uniform(-900, 900)))
+    return out
+
+def rate(fn, inputs, seconds):
+    n = 0
+    t0 = time.perf_counter()
+    deadline = t0 + seconds
+    while True:
+        for args in inputs:
+            fn(*args)
+        n += len(inputs)
+        now = time.perf_counter()
+        if now >= deadline:
+            return n / (now - t0)
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    inputs = make_inputs(5000)
+    enc = vw.DataPacketEncoder(0, MAC)
+
+    for args in inputs:
+        a = legacy_encode(*args)
+        b = enc.encode(*args)
+        if a != bytes(b):
+            print(f"MISMATCH at idx={args[0]}:\n  legacy  {a.hex()}\n  encoder {bytes(b).hex()}")
+            sys.exit(1)
+    print(f"byte-identical: {len(inputs)} packets")
+
+    r_legacy = rate(legacy_encode, inputs, seconds)
+    r_enc = rate(enc.encode, inputs, seconds)
+    print(f"legacy   : {r_legacy:12,.0f} packets/s")
+    print(f"encoder  : {r_enc:12,.0f} packets/s  ({r_enc / r_legacy:.2f}x)")
+
+    if len(sys.argv) > 2:
+        t0 = time.perf_counter()
+        n = vw.replay_session(sys.argv[2])
+        dt = time.perf_counter() - t0
+        print(f"resp_data: {n / dt:12,.0f} packets/s  (replay of '{sys.argv[2]}', {n} packets)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# Pointer filter harness: lag and jitter of each filter on a mouse trace.
+#
+#   py bench/bench_pointer.py [session.vwrec]
+#
+# Without a session it uses a synthetic 250 Hz trace: rest with 1 px sensor
+# noise, a slow drift, fast flicks and circles, quantized to whole pixels
+# like a real cursor. With a session (see "Start Recording") it uses the
+# recorded cursor positions at the session's hz.
+#
+#   lag     time shift (ms) that best aligns the output with the raw trace
+#           while moving; negative = ahead of the cursor (prediction)
+#   jitter  RMS tick-to-tick output motion (touchpad units) while at rest
+#   error   RMS distance to the raw trace (touchpad units)
+
+import os, sys, math, random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import vwiimote as vw
+
+TPAD_W, TPAD_H = vw.DEFAULTS["tpad_w"], vw.DEFAULTS["tpad_h"]
+
+def synthetic_trace(hz=250, seed=7):
+    rnd = random.Random(seed)
+    w, h = 1920, 1080
+    pts = []
+    x, y = w / 2, h / 2
+    def rest(sec):
+        for _ in range(int(sec * hz)):
+            pts.append((round(x + rnd.uniform(-1, 1)), round(y + rnd.uniform(-1, 1))))
+    def move(x1, y1, sec):
+        nonlocal x, y
+        x0, y0 = x, y
+        n = int(sec * hz)
+        for i in range(1, n + 1):
+            t = i / n
+            s = t*t*t * (10 - 15*t + 6*t*t)    # minimum-jerk
+            x, y = x0 + (x1 - x0) * s, y0 + (y1 - y0) * s
+            pts.append((round(x), round(y)))
+    rest(1.0)
+    move(x + 40, y + 10, 2.0)                   # slow drift, ~20 px/s
+    rest(0.5)
+    move(200, 150, 0.15)                        # flick
+    rest(0.5)
+    move(1700, 900, 0.2)
+    rest(0.5)
+    cx, cy, r = w / 2, h / 2, 300
+    move(cx + r, cy, 0.2)
+    for i in range(int(2.0 * hz)):              # two circles a second
+        a = 2 * math.pi * 2.0 * i / hz
+        x, y = cx + r * math.cos(a), cy + r * math.sin(a)
+        pts.append((round(x), round(y)))
+    rest(1.0)
+    return pts, (w, h), hz
+
+def session_trace(path):
+    rb = vw.ReplayBackend(path)
+    pts = []
+    screen = (1920, 1080)
+    while True:
+        rb.poll()
+        if rb.done: break
+        pts.append(rb.cursor_pos())
+        screen = rb.screen_size()
+    rb.close()
+    return pts, screen, rb.hz or 250
+
+def to_tpad(pts, screen):
+    w, h = screen
+    return [(x * (TPAD_W - 1) / max(1, w - 1), y * (TPAD_H - 1) / max(1, h - 1)) for x, y in pts]
+
+def legacy_ema(raw, alpha):
+    # the pre-filter resp_data path: int raw, EMA truncated to int every tick
+    out = []
+    px = py = None
+    for x, y in raw:
+        x, y = int(x), int(y)
+        if px is None: px, py = x, y
+        else:
+            px = int(px + alpha * (x - px))
+            py = int(py + alpha * (y - py))
+        out.append((px, py))
+    return out
+
+def run_filter(pf, raw, dt):
+    out = []
+    pf.reset(*raw[0])
+    for x, y in raw:
+        pf.step(x, y, dt)
+        out.append((round(pf.x), round(pf.y)))
+    return out
+
+def metrics(raw, out, dt):
+    n = len(raw)
+    speed = [0.0] + [math.dist(raw[i], raw[i-1]) / dt for i in range(1, n)]
+    moving = [i for i in range(n) if speed[i] > 200]          # touchpad units/s
+    resting = [i for i in range(5, n) if all(math.dist(raw[i], raw[j]) <= 3 for j in range(i-5, i))]
+    def mse(shift):
+        idx = [i for i in moving if 0 <= i - shift < n]
+        return sum(math.dist(out[i], raw[i - shift]) ** 2 for i in idx) / max(1, len(idx))
+    shifts = range(-15, 31)
+    errs = [mse(s) for s in shifts]
+    k = min(range(len(errs)), key=errs.__getitem__)
+    lag = shifts[k]
+    if 0 < k < len(errs) - 1:                                 # sub-tick: parabola through the minimum
+        a, b, c = errs[k-1], errs[k], errs[k+1]
+        den = a - 2*b + c
+        if den > 0: lag += 0.5 * (a - c) / den
+    jit = math.sqrt(sum(math.dist(out[i], out[i-1]) ** 2 for i in resting) / max(1, len(resting)))
+    err = math.sqrt(sum(math.dist(o, r) ** 2 for o, r in zip(out, raw)) / n)
+    return lag * dt * 1000, jit, err
+
+def main():
+    if len(sys.argv) > 1:
+        pts, screen, hz = session_trace(sys.argv[1])
+        src = sys.argv[1]
+    else:
+        pts, screen, hz = synthetic_trace()
+        src = "synthetic trace"
+    if len(pts) < 50:
+        print("trace too short")
+        sys.exit(1)
+    raw = to_tpad(pts, screen)
+    dt = 1.0 / hz
+    v = vw.DEFAULTS
+    smooth = v["smooth"]
+    d_cut = v["filter_d_cutoff"]
+    cases = [
+        ("legacy int EMA", lambda: legacy_ema(raw, smooth)),
+        ("none",           lambda: run_filter(vw.PointerFilter(), raw, dt)),
+        ("ema",            lambda: run_filter(vw.EmaFilter(alpha=smooth), raw, dt)),
+        ("one_euro",       lambda: run_filter(vw.OneEuroFilter(v["oe_min_cutoff"], v["oe_beta"], d_cutoff=d_cut), raw, dt)),
+        ("one_euro +16ms", lambda: run_filter(vw.OneEuroFilter(v["oe_min_cutoff"], v["oe_beta"], d_cutoff=d_cut, lead=0.016), raw, dt)),
+        ("ema +16ms",      lambda: run_filter(vw.EmaFilter(alpha=smooth, d_cutoff=d_cut, lead=0.016), raw, dt)),
+    ]
+    print(f"{src}: {len(raw)} ticks at {hz} Hz")
+    print(f"{'filter':<16} {'lag ms':>8} {'jitter':>8} {'error':>8}")
+    for name, fn in cases:
+        lag, jit, err = metrics(raw, fn(), dt)
+        print(f"{name:<16} {lag:>8.1f} {jit:>8.2f} {err:>8.2f}")
+
+if __name__ == "__main__":
+    main()
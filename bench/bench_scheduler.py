@@ -0,0 +1,58 @@
+# Tick scheduler jitter benchmark: deadline error and CPU cost per strategy.
+#
+#   py bench/bench_scheduler.py [hz] [seconds]
+#
+# Each strategy waits on an idle UDP socket (like the server loop) and records how
+# late every tick fires relative to its deadline. CPU% is process CPU time over
+# wall time for the run, i.e. what the wait loop itself costs.
+
+import os, sys, socket, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import vwiimote as vw
+
+def run(strategy, hz, seconds, catchup="skip", spin_us=1000):
+    sched = vw.make_scheduler(strategy, hz, catchup, spin_us)
+    if sched.name != strategy:
+        sched.close()
+        return None
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.bind(("127.0.0.1", 0))
+    late = vw.Histogram()
+    missed = 0
+    vw.timer_resolution(True)
+    try:
+        sched.set_hz(hz)
+        cpu0 = time.process_time()
+        t0 = time.perf_counter()
+        end = t0 + seconds
+        while True:
+            sched.wait([s])
+            now = time.perf_counter()
+            if sched.due(now):
+                late.add(int((now - sched.next_tick) * 1e6))
+                missed += sched.advance(now)
+                if now >= end: break
+        cpu = (time.process_time() - cpu0) / (time.perf_counter() - t0)
+    finally:
+        vw.timer_resolution(False)
+        sched.close()
+        s.close()
+    return late, missed, cpu
+
+def main():
+    hz = int(sys.argv[1]) if len(sys.argv) > 1 else 250
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    print(f"{hz} Hz, {seconds:.1f} s per strategy  (deadline error in us)")
+    print(f"{'strategy':<10} {'ticks':>7} {'p50':>7} {'p90':>7} {'p99':>7} {'max':>7} {'missed':>7} {'cpu%':>6}")
+    for strategy in vw.SCHED_STRATEGIES:
+        res = run(strategy, hz, seconds)
+        if res is None:
+            print(f"{strategy:<10} (unavailable on this platform)")
+            continue
+        late, missed, cpu = res
+        print(f"{strategy:<10} {late.n:>7} {late.percentile(50):>7} {late.percentile(90):>7} "
+              f"{late.percentile(99):>7} {late.max_us:>7} {missed:>7} {cpu*100:>6.1f}")
+
+if __name__ == "__main__":
+    main()
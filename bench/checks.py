@@ -0,0 +1,299 @@
+# Regression checks for fixed bugs, no test framework needed.
+#
+#   py bench/checks.py [name ...]
+#
+# Every check_* function is plain asserts against the synthetic backend or a
+# stub. Each one runs in its own interpreter (the module keeps global state:
+# config, backend, profiles), prints ok / FAIL and the script exits 1 if any
+# failed. `py bench/checks.py evdev` runs the checks whose name contains "evdev".
+
+import os, sys, subprocess, types, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import vwiimote as vw
+
+# ----- user-004: evdev backend -----
+
+class _StubDevice:
+    # python-evdev InputDevice: read() is a generator, so BlockingIOError /
+    # OSError only come out of the iteration, never from the call itself
+    def __init__(self, fd, events=(), error=None):
+        self.fd = fd
+        self.events = list(events)
+        self.error = error
+    def read(self):
+        # like device_read_many(): everything queued, or EAGAIN when idle
+        if self.error is not None: raise self.error
+        if not self.events: raise BlockingIOError(11, "Resource temporarily unavailable")
+        events, self.events = self.events, []
+        yield from events
+
+def check_evdev_idle_device():
+    ec = types.SimpleNamespace(EV_KEY=1, EV_REL=2, EV_ABS=3, REL_X=0, REL_Y=1,
+                               ABS_X=0, ABS_Y=1, ABS_RX=3, ABS_RY=4, ABS_HAT0X=16, ABS_HAT0Y=17)
+    be = object.__new__(vw.EvdevBackend)
+    be._ec = ec
+    be._key_vk = {30: 0x41}          # KEY_A -> VK 'A'
+    be._btn_x = {}
+    be._pad_of = {}
+    be._absinfo = {}
+    be.pads = [None]*vw.MAX_SLOTS
+    be.kb = 0
+    be.screen = (1920, 1080)
+    be.cursor = [960, 540]
+    key_a = types.SimpleNamespace(type=1, code=30, value=1)
+    be.devices = [_StubDevice(3),                                   # idle: raises on first next()
+                  _StubDevice(4, error=OSError(19, "No such device")),  # unplugged
+                  _StubDevice(5, [key_a])]
+    be.poll()
+    assert be.keys(1 << 0x41), "event from the busy device was lost"
+    be.poll()                        # every device idle now
+    assert be.keys(1 << 0x41), "key state lost on an idle poll"
+
+# ----- helpers -----
+
+import socket, struct, threading
+
+def data_request(slot=0):
+    payload = bytes([1, slot]) + b"\0" * 6
+    return (struct.pack("<4sHHII", b"DSUC", vw.PROTOCOL, len(payload) + 4, 0, 1)
+            + struct.pack("<I", 0x100002) + payload)
+
+# ----- user-010: rebind capture -----
+
+class _TickCountingBackend(vw.ScriptedBackend):
+    def __init__(self):
+        super().__init__()
+        self.widest = {}     # thread name -> most VKs asked for in one keys() call
+    def keys(self, mask):
+        name = threading.current_thread().name
+        n = bin(mask).count("1")
+        if n > self.widest.get(name, 0): self.widest[name] = n
+        return super().keys(mask)
+
+def check_rebind_capture_off_tick_path():
+    be = _TickCountingBackend()
+    vw.use_backend(be)
+    sock = vw.open_endpoint(vw.HOST, 0)
+    port = sock.getsockname()[1]
+    sock.close()
+    th = threading.Thread(target=vw.server_thread, args=([(vw.HOST, port)],), daemon=True, name="tick")
+    th.start()
+    while not vw.stats.ticks: time.sleep(0.005)    # bound and ticking
+    c = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    c.sendto(data_request(), (vw.HOST, port))
+    time.sleep(0.1)
+    assert vw.stats.packets_sent, "client not served"
+    vw.start_recording(os.path.join(os.path.dirname(os.path.abspath(__file__)), "_check_rebind.vwrec"))
+    rec = vw.recorder
+    recorded_from = set()
+    for name in ("keys", "pad"):
+        def spy(*a, _f=getattr(rec, name)):
+            recorded_from.add(threading.current_thread().name)
+            return _f(*a)
+        setattr(rec, name, spy)
+    try:
+        vw.rebind.start(0, "wm_a", 2)
+        time.sleep(0.1)
+        be.press(0x5A)                   # 'Z', bound to nothing
+        for _ in range(100):
+            if vw.config.rebind_target is None: break
+            time.sleep(0.01)
+        assert vw.config.bindings[0]["wm_a"] == (vw.BIND_VK, 0x5A), vw.config.bindings[0]["wm_a"]
+        bound = max(bin(cb.vk_mask).count("1") for cb in vw.config.snap.compiled)
+        assert be.widest.get("tick", 0) <= bound, f"tick read {be.widest['tick']} VKs, bindings have {bound}"
+        assert recorded_from == {"tick"}, f"recorded reads from {recorded_from}"
+    finally:
+        vw.config.want_stop = True
+        th.join(2)
+        c.close()
+        vw.stop_recording()
+        os.remove(rec.path)
+
+def check_win32_capture_leaves_hook_mask():
+    be = object.__new__(vw.Win32Backend)
+    be.hook = types.SimpleNamespace(ok=True, keys=1 << 0x41)
+    be._mask = 0
+    be._have = be._got = 0
+    be._xinput = None
+    calls = []
+    be._GetAsyncKeyState = lambda vk: calls.append(vk) or 0
+    assert be.capture_state(vw.CAPTURE_VK_MASK, 0) == (1 << 0x41, 0)
+    assert be._mask == 0 and not calls, "capture touched the hook check mask"
+    be.hook = None                   # polling fallback: the capture thread pays for it, nothing is cached
+    assert be.capture_state(vw.CAPTURE_VK_MASK, 0) == (0, 0)
+    assert len(calls) == bin(vw.CAPTURE_VK_MASK).count("1") and be._mask == 0 and not be._have
+
+# ----- user-008 / user-021: config publishing -----
+
+def check_publish_reads_files_outside_lock():
+    real = vw.macro_timelines
+    def slow_macros(path, hz):
+        if threading.current_thread().name == "slow-writer": time.sleep(0.3)   # a slow disk
+        return real(path, hz)
+    vw.macro_timelines = slow_macros
+    w = threading.Thread(target=vw.config.set_value, args=("hz", 100), name="slow-writer")
+    w.start()
+    time.sleep(0.05)                 # the slow writer is now inside the snapshot build
+    t0 = time.perf_counter()
+    with vw.config.lock: pass        # what the tick / capture paths contend on
+    waited = time.perf_counter() - t0
+    assert waited < 0.05, f"config.lock held {waited * 1000:.0f} ms during a file read"
+    vw.config.set_value("smooth", 0.5)   # staged later, published first
+    w.join()
+    snap = vw.config.snap
+    assert snap.hz == 100 and snap.smooth == 0.5, "an older snapshot replaced a newer one"
+
+# ----- user-023: profiles -----
+
+def _profile_dir():
+    import tempfile
+    d = tempfile.mkdtemp(prefix="vw_profiles_")
+    with open(os.path.join(d, "fast.json"), "w") as f:
+        f.write('{"values": {"hz": 250}}')
+    return d
+
+def _tick_alone(core, timeout=1.0):
+    # one ServerCore tick on its own thread: False if it blocked
+    th = threading.Thread(target=core.tick, args=(time.perf_counter(), vw.config.snap), daemon=True)
+    th.start()
+    th.join(timeout)
+    return not th.is_alive()
+
+def check_profile_hotkey_without_subscriber():
+    be = vw.use_backend(vw.ScriptedBackend())
+    vw.profiles.load(vw.config, _profile_dir())
+    core = vw.ServerCore()
+    assert not core.subs
+    f9 = vw.config.bindings[0]["profile_next"][1]
+    assert _tick_alone(core)
+    be.press(f9)
+    assert _tick_alone(core)
+    assert vw.config.profile == "fast" and vw.config.snap.hz == 250, vw.config.profile
+    assert _tick_alone(core)                 # still held: one press, one switch
+    be.release(f9); assert _tick_alone(core)
+    be.press(f9); assert _tick_alone(core)
+    assert vw.config.profile is None and vw.config.snap.hz == vw.DEFAULTS["hz"], vw.config.profile
+
+def check_profile_switch_never_blocks_tick():
+    be = vw.use_backend(vw.ScriptedBackend())
+    vw.profiles.load(vw.config, _profile_dir())
+    core = vw.ServerCore()
+    be.press(vw.config.bindings[0]["profile_next"][1])
+    with vw.config.lock:                     # a writer (GUI, loader) holds it
+        assert _tick_alone(core), "tick blocked on config.lock"
+        assert vw.config.snap.hz == 250, "snapshot not swapped while the lock was held"
+        assert vw.config.profile is None
+    assert _tick_alone(core)
+    assert vw.config.profile == "fast" and vw.profiles.adopting is None
+    assert vw.config.values["hz"] == 250, "writer-side state not brought along"
+
+def check_replay_leaves_profiles_alone():
+    be = vw.use_backend(vw.ScriptedBackend())
+    vw.profiles.load(vw.config, _profile_dir())
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_check_profile.vwrec")
+    f9 = vw.config.bindings[0]["profile_next"][1]
+    vw.start_recording(path)
+    st = vw.State(0)
+    for i in range(20):
+        (be.press if 5 <= i < 10 else be.release)(f9)
+        vw.backend.poll()
+        vw.resp_data(st)
+    vw.stop_recording()
+    try:
+        snap = vw.config.snap
+        assert vw.replay_session(path) == 20 * sum(snap.enabled)
+        assert vw.config.profile is None and vw.profiles.adopting is None, "replay switched the profile"
+        assert vw.config.snap is snap
+    finally:
+        os.remove(path)
+
+def check_profiles_listed_before_load():
+    got = []
+    assert vw.control_message(vw.CTL_MAGIC + b"profiles", ("127.0.0.1", 1), lambda pkt, a: got.append(pkt))
+    assert got == [("OK " + vw.BASE_PROFILE).encode()], got
+
+# ----- user-019: log writer -----
+
+def check_log_queue_bounded_when_writer_stalls():
+    w = vw.log_writer
+    w.flush()
+    extra = 500
+    with w.lock:                             # the writer is stuck (slow console, disk)
+        for i in range(vw.LOG_PENDING + extra):
+            vw.log(f"line {i}")
+        assert len(w.pending) == vw.LOG_PENDING, len(w.pending)
+        assert w.dropped == extra, w.dropped
+        assert w.pending[0][1] == f"line {extra}"
+    import io
+    out, sys.stdout = sys.stdout, io.StringIO()
+    try:
+        w.flush()
+        first = sys.stdout.getvalue().splitlines()[0]
+    finally:
+        sys.stdout = out
+    assert w.dropped == 0
+    assert f"{extra} log line(s) dropped" in first, first
+
+def check_log_file_rotates_on_bytes():
+    import tempfile
+    d = tempfile.mkdtemp(prefix="vw_log_")
+    path = os.path.join(d, "vw.log")
+    rf = vw.RotatingFile(path, 4096, 2)
+    line = "é漢" * 50 + "\n"        # 100 characters, 251+ bytes in UTF-8
+    for _ in range(60):
+        rf.write([line])
+    rf.close()
+    sizes = [os.path.getsize(f) for f in (path, path + ".1", path + ".2")]
+    assert max(sizes) <= 4096, f"files of {sizes} bytes, cap 4096"
+
+# ----- user-009: Win32 key reads -----
+
+def check_win32_reads_each_key_once_per_tick():
+    be = object.__new__(vw.Win32Backend)
+    be._screen_at = be._check_at = float("inf")   # no screen metrics refresh or hook check
+    be._mask = 0
+    be.hook = None                   # polling fallback
+    calls = []
+    down = {0x41}
+    be._GetAsyncKeyState = lambda vk: calls.append(vk) or (0x8000 if vk in down else 0)
+    a, b, f9 = 1 << 0x41, 1 << 0x42, 1 << 0x78
+    slot0, slot1 = a | b | f9, a | (1 << 0x43)
+    for _ in range(3):
+        be.poll()
+        calls.clear()
+        assert be.keys(slot0) == a and be.keys(slot1) == a
+        assert be.keys(f9) == 0 and be.keys(slot0) == a    # hotkey, repeated read
+        assert sorted(calls) == [0x41, 0x42, 0x43, 0x78], [hex(vk) for vk in calls]
+    be.hook = types.SimpleNamespace(ok=True, keys=b)
+    be.poll()
+    calls.clear()
+    assert be.keys(slot0) == b and be.keys(slot1) == 0 and not calls
+
+# -----
+
+def checks():
+    return {n[len("check_"):]: f for n,f in sorted(globals().items()) if n.startswith("check_") and callable(f)}
+
+def main():
+    all_checks = checks()
+    if len(sys.argv) == 3 and sys.argv[1] == "--one":
+        all_checks[sys.argv[2]]()
+        return
+    names = [n for n in all_checks if not sys.argv[1:] or any(a in n for a in sys.argv[1:])]
+    failed = 0
+    w = max(map(len, names), default=0)
+    for name in names:
+        t0 = time.perf_counter()
+        r = subprocess.run([sys.executable, os.path.abspath(__file__), "--one", name],
+                           capture_output=True, text=True, timeout=120)
+        ok = r.returncode == 0
+        failed += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name:<{w}} {(time.perf_counter() - t0) * 1000:6.0f} ms")
+        if not ok:
+            print("     " + (r.stderr.strip().splitlines() or ["(no output)"])[-1])
+    print(f"{len(names) - failed}/{len(names)} passed")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# Loopback DSU probe: end-to-end input -> packet latency.
+#
+#   py bench/dsu_probe.py [--hz 250] [--sched select|hybrid|timerfd] [--sampler HZ]
+#                         [--server thread|asyncio] [--delta] [-n 500]
+#
+# Runs the server in-process on the synthetic backend and a DSU client on a
+# free local port. The client subscribes to slot 1, decodes every data packet
+# and toggles Wiimote A at random moments (never phase-locked to the tick).
+# Latency is injection -> arrival of the first packet whose button byte shows
+# the new state. The server's own trace (input read -> first sendto) is
+# printed next to it, so the two halves of the pipeline can be told apart.
+
+import os, sys, socket, struct, threading, asyncio, random, time, argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import vwiimote as vw
+
+def request(msg_type, payload):
+    return struct.pack("<4sHHII", b"DSUC", vw.PROTOCOL, len(payload) + 4, 0, 1) + struct.pack("<I", msg_type) + payload
+
+DATA_REQ = request(0x100002, bytes([1, 0]) + b"\0" * 6)   # slot 0
+_PKT = struct.Struct("<B10xI")                            # slot @20, packet number @32
+
+class DSUProbe:
+    # Minimal DSU client: subscribe, keep the subscription alive, decode data
+    # packets. on_packet(recv_ns, slot, idx, face, tx, ty, ts_us) per packet.
+    def __init__(self, host, port, on_packet):
+        self.addr = (host, port)
+        self.on_packet = on_packet
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.settimeout(0.2)
+        self.stop = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        buf = bytearray(2048)
+        next_req = 0.0
+        while not self.stop:
+            now = time.perf_counter()
+            if now >= next_req:
+                self.sock.sendto(DATA_REQ, self.addr)
+                next_req = now + 1.0
+            try:
+                n, _ = self.sock.recvfrom_into(buf)
+            except socket.timeout:
+                continue
+            t = time.perf_counter_ns()
+            if n < 100 or buf[:4] != b"DSUS" or struct.unpack_from("<I", buf, 16)[0] != 0x100002:
+                continue
+            slot, idx = _PKT.unpack_from(buf, 20)
+            tx, ty = struct.unpack_from("<HH", buf, 58)
+            ts_us = struct.unpack_from("<Q", buf, 68)[0]
+            self.on_packet(t, slot, idx, buf[37], tx, ty, ts_us)
+
+    def close(self):
+        self.stop = True
+        self.thread.join(1.0)
+        self.sock.close()
+
+def free_port():
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.bind((vw.HOST, 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+def pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p / 100))] if xs else 0
+
+def main():
+    ap = argparse.ArgumentParser(description="Loopback DSU latency probe")
+    ap.add_argument("--hz", type=int, default=250)
+    ap.add_argument("--sched", default=vw.DEFAULTS["sched_strategy"], choices=vw.SCHED_STRATEGIES)
+    ap.add_argument("--sampler", type=int, default=0, help="input sampler Hz (0 = off)")
+    ap.add_argument("--server", default="thread", choices=vw.SERVER_MODES)
+    ap.add_argument("--delta", action="store_true", help="send-on-change mode")
+    ap.add_argument("-n", type=int, default=500, help="number of injected changes")
+    args = ap.parse_args()
+
+    be = vw.ScriptedBackend()
+    vw.use_backend(be)
+    for k, v in (("hz", args.hz), ("sched_strategy", args.sched), ("sampler_hz", args.sampler),
+                 ("delta_mode", args.delta), ("trace_latency", True)):
+        vw.config.set_value(k, v)
+    vk = vw.config.bindings[0]["wm_a"][1]
+    bit = vw.ACT_BITS["wm_a"]
+
+    port = free_port()
+    if args.server == "asyncio":
+        th = threading.Thread(target=lambda: asyncio.run(vw.serve_async(vw.HOST, port)), daemon=True)
+    else:
+        th = threading.Thread(target=vw.server_thread, args=([(vw.HOST, port)],), daemon=True)
+    th.start()
+
+    lock = threading.Lock()
+    pending = []          # (inject_ns, want_down)
+    lat = []              # us
+    got = threading.Event()
+    def on_packet(t, slot, idx, face, tx, ty, ts_us):
+        with lock:
+            if pending and bool(face & bit) == pending[0][1]:
+                lat.append((t - pending.pop(0)[0]) / 1000)
+                got.set()
+
+    probe = DSUProbe(vw.HOST, port, on_packet).start()
+    time.sleep(0.3)
+    vw.stats.reset()
+    rnd = random.Random(1)
+    period = 1.0 / args.hz
+    down = False
+    missed = 0
+    for _ in range(args.n):
+        time.sleep(period * (1 + rnd.random() * 2))      # random phase vs. the tick
+        got.clear()
+        down = not down
+        with lock:
+            pending.append((time.perf_counter_ns(), down))
+        (be.press if down else be.release)(vk)
+        if not got.wait(0.5):
+            missed += 1
+            with lock: pending.clear()
+    probe.close()
+    vw.config.want_stop = True
+    th.join(2.0)
+
+    tr = vw.stats.input_latency
+    print(f"{args.server} server, {args.hz} Hz, scheduler {args.sched}, sampler {args.sampler or 'off'}"
+          f"{', send-on-change' if args.delta else ''}: {len(lat)} changes, {missed} lost")
+    print(f"{'(us)':<24} {'mean':>7} {'p50':>7} {'p90':>7} {'p99':>7} {'max':>7}")
+    mean = sum(lat) / len(lat) if lat else 0
+    print(f"{'input -> packet (probe)':<24} {mean:>7.0f} {pct(lat, 50):>7.0f} {pct(lat, 90):>7.0f} {pct(lat, 99):>7.0f} {max(lat, default=0):>7.0f}")
+    # the server trace is a log2 histogram: percentiles are bucket bounds
+    print(f"{'read -> sendto (trace)':<24} {tr.sum_us / max(1, tr.n):>7.0f} {tr.percentile(50):>7} {tr.percentile(90):>7} {tr.percentile(99):>7} {tr.max_us:>7}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Time to first packet of a headless server.
+#
+#   py bench/ttfp.py [runs] [--backend synthetic] [--hz 200]
+#
+# A DSU client is already polling a free local port when the server process
+# is launched, as a kiosk front-end or a test harness would be. The time is
+# measured from Popen() (interpreter start included) to the arrival of the
+# first data packet, for both ways of launching:
+#   py -m vwiimote --headless    runs from the cached bytecode
+#   py vwiimote.py --headless    recompiles the whole file every start
+# Exits 1 if the slowest `-m` run is over BUDGET_MS.
+
+import os, sys, socket, struct, subprocess, tempfile, time, argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import vwiimote as vw
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+LAUNCH = {"-m vwiimote": ["-m", "vwiimote"], "vwiimote.py": ["vwiimote.py"]}
+BUDGET_MS = 100.0
+
+def request(msg_type, payload):
+    return struct.pack("<4sHHII", b"DSUC", vw.PROTOCOL, len(payload) + 4, 0, 1) + struct.pack("<I", msg_type) + payload
+
+DATA_REQ = request(0x100002, bytes([1, 0]) + b"\0" * 6)   # slot 0
+
+def free_port():
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.bind((vw.HOST, 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+def one_run(launch, backend, hz, config_path):
+    port = free_port()
+    c = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    c.settimeout(0.002)
+    cmd = [sys.executable, *launch, "--headless", "--port", str(port), "--backend", backend,
+           "--hz", str(hz), "--config", config_path]
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - t0 < 5.0:
+            c.sendto(DATA_REQ, (vw.HOST, port))     # re-sent every 2 ms until served
+            try:
+                data = c.recv(2048)
+            except OSError:                         # timeout / port not bound yet
+                continue
+            if len(data) >= 100 and struct.unpack_from("<I", data, 16)[0] == 0x100002:
+                return (time.perf_counter() - t0) * 1000
+        return None
+    finally:
+        proc.terminate()
+        proc.wait(5)
+        c.close()
+
+def main():
+    ap = argparse.ArgumentParser(description="time to first packet, --headless")
+    ap.add_argument("runs", type=int, nargs="?", default=10)
+    ap.add_argument("--backend", default="synthetic", choices=list(vw.INPUT_BACKENDS))
+    ap.add_argument("--hz", type=int, default=vw.DEFAULTS["hz"])
+    args = ap.parse_args()
+    # a missing config file: defaults, and nothing in the working directory is read
+    config_path = os.path.join(tempfile.gettempdir(), "vwiimote_ttfp_none.json")
+
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"])
+    bare = (time.perf_counter() - t0) * 1000
+
+    print(f"{args.runs} runs, backend {args.backend}, {args.hz} Hz (bare interpreter start {bare:.0f} ms)")
+    print(f"{'time to first packet':<22} {'min':>5} {'p50':>5} {'max':>5}  ms")
+    worst = {}
+    for name, launch in LAUNCH.items():
+        ms = []
+        for _ in range(args.runs):
+            t = one_run(launch, args.backend, args.hz, config_path)
+            if t is None:
+                print(f"{name}: no packet within 5 s")
+                sys.exit(1)
+            ms.append(t)
+        ms.sort()
+        worst[name] = ms[-1]
+        print(f"{name:<22} {ms[0]:>5.0f} {ms[len(ms)//2]:>5.0f} {ms[-1]:>5.0f}")
+    if worst["-m vwiimote"] > BUDGET_MS:
+        print(f"OVER BUDGET ({BUDGET_MS:.0f} ms)")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
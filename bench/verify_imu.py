@@ -0,0 +1,50 @@
+# IMU-mode consistency check on a recorded session.
+#
+#   py bench/verify_imu.py session.vwrec [slot]
+#
+# Replays the session with imu_mode on, then integrates the gyro the packets
+# carry with integrate_gyro_batch() and compares the predicted gravity with the
+# accel the packets carry. Outside of W/E shake pulses (linear accel on purpose)
+# the two must agree to float32 precision: a game fusing accel + gyro sees one
+# rigid, consistently rotating controller.
+
+import os, sys, struct, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import vwiimote as vw
+
+TOL = 1e-3   # m/s^2, float32 packing + gyro quantization
+
+def main():
+    if len(sys.argv) < 2:
+        print("usage: py bench/verify_imu.py session.vwrec [slot]")
+        sys.exit(2)
+    path = sys.argv[1]
+    slot = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    vw.config.set_value("imu_mode", True)
+    accel, gyro = [], []
+    def sink(s, pkt):
+        if s != slot: return
+        m = struct.unpack_from("<ffffff", pkt, 76)
+        accel.append(m[:3]); gyro.append(m[3:])
+    vw.replay_session(path, sink=sink)
+    if not gyro:
+        print(f"no packets for slot {slot + 1}")
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+    pred = vw.integrate_gyro_batch(gyro, vw.config.snap.period)
+    dt = time.perf_counter() - t0
+
+    worst = 0.0; off = 0
+    for p, a in zip(pred, accel):
+        e = max(abs(p[0] - a[0]), abs(p[1] - a[1]), abs(p[2] - a[2]))
+        if e > TOL: off += 1          # shake pulse frames
+        else: worst = max(worst, e)
+    n = len(gyro)
+    print(f"{n} ticks, batch integration {dt * 1e3:.1f} ms ({'numpy' if vw.load_numpy() is not None else 'pure python'})")
+    print(f"gravity residual (non-shake ticks): max {worst:.2e} m/s^2")
+    print(f"ticks with linear accel (shake pulses): {off} ({off / n * 100:.1f}%)")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,47 @@
 # Virtual WiiMote — DSU server (Cemuhook) + DearPyGui
 
-import socket, struct, time, random, zlib, select, threading, json, os
+import socket, struct, time, random, zlib, select, threading, json, os, sys, mmap, ctypes, math, itertools, atexit
+T_START = time.perf_counter()   # for the time-to-first-packet log line
 from collections import deque
-from ctypes import windll, byref, Structure
+from types import MappingProxyType, SimpleNamespace
+from ctypes import byref, Structure
 from ctypes import wintypes
 
-import dearpygui.dearpygui as dpg
+# Heavy or platform-specific modules load on first use, so a headless server
+# (and anything importing this file) only pays for what it runs:
+#   windll  -> win32()        Win32 input backend, timer resolution
+#   evdev   -> load_evdev()   evdev input backend
+#   numpy   -> load_numpy()   long waveform tables, batch IMU integration
+#   asyncio                   asyncio server mode
+#   dearpygui -> import_gui() the GUI
+IS_WINDOWS = sys.platform == "win32"
+np = None
+evdev = None
+_optional_tried = set()
+
+def win32():
+    from ctypes import windll
+    return windll
+
+def load_evdev():
+    global evdev
+    if "evdev" not in _optional_tried:
+        _optional_tried.add("evdev")
+        try:
+            import evdev
+        except ImportError:
+            pass
+    return evdev
+
+def load_numpy():
+    global np
+    if "numpy" not in _optional_tried:
+        _optional_tried.add("numpy")
+        try:
+            import numpy as np
+        except ImportError:   # pure Python fallbacks
+            pass
+    return np
 
 # ------------------------------ CONFIG & CONSTANTS ------------------------------
 
@@ -17,14 +53,23 @@ PORT = 26761
 
 POINTER_SOURCES = ["mouse", "xinput_rs", "xinput_ls"]
 
+# DSU exposes 4 controller slots; each one is an independent virtual Wiimote
+MAX_SLOTS = 4
+
 DEFAULTS = {
     "hz": 200,
     "tpad_w": 1920, "tpad_h": 942,
     "invert_y": False,
-    "smooth": 0.30,
+    "smooth": 0.30,                       # EMA factor (1 = no smoothing)
+
+    # Pointer filter (see POINTER FILTERS): none | ema | one_euro
+    "pointer_filter": "ema",
+    "oe_min_cutoff": 1.0,                 # Hz, One-Euro smoothing at rest
+    "oe_beta": 0.02,                      # One-Euro speed coefficient (less lag when moving)
+    "filter_d_cutoff": 5.0,               # Hz, velocity estimate (One-Euro speed, prediction)
+    "predict_ms": 0.0,                    # lead the pointer by this much pipeline latency
 
     # Stick-driven pointer
-    "pointer_source": "mouse",            # mouse | xinput_rs | xinput_ls
     "cursor_speed_px_s": 1600.0,          # px/sec at full deflection
     "stick_deadzone": 8000,               # 0..32767
 
@@ -36,15 +81,58 @@ DEFAULTS = {
     "pulse_az":   36.0,
     "pulse_ms":   64,
     "cooldown_ms": 20,
+    "pulse_shape": "rect",                # rect | half_sine | damped | custom
+    "pulse_curve_file": "pulse_curve.json",
+    "macros_file": "macros.json",         # see MACROS
 
     # NEW: Twist (gyro-only) speed while holding twist keys
     "twist_dps":   180.0,                 # deg/s applied when holding front/back/left/right twist
 
+    # IMU mode: integrate the gyro into an orientation and tilt gravity to match
+    "imu_mode": False,
+    "imu_auto_recenter": True,            # drift back to neutral when no rotation is held
+    "recenter_dps": 360.0,                # rate of the way back (reported as gyro too)
+
     # Synthetic LS magnitude for D-Pad mapping
     "lstick_magnitude": 255,
 
+    # DSU clients re-send data requests every few seconds; drop them when they stop
+    "sub_timeout_s": 5.0,
+
+    # Tick scheduler (see SCHEDULER section)
+    "sched_strategy": "select",           # select | hybrid | timerfd
+    "sched_catchup": "skip",              # skip | burst | stretch
+    "spin_us": 1000,                      # hybrid: busy-wait window before each deadline
+    "server_mode": "thread",              # thread | asyncio (applies on restart)
+    "listen": f"{HOST}:{PORT}",           # host:port, ... ([::1]:26760 for IPv6; applies on restart)
+    "rx_batch": 64,                       # max datagrams drained per wakeup
+    "rx_budget_us": 500,                  # max time spent draining per wakeup
+    "sampler_hz": 0,                      # >0: poll input on its own thread at this rate
+
+    # Send-on-change: skip packets while nothing changed, keepalive below Cemu's timeout
+    "delta_mode": False,
+    "keepalive_ms": 250,
+    "max_rate_hz": 0,                     # per subscriber and slot, 0 = every tick
+
+    # Diagnostics: input-change -> first sendto latency histogram
+    "trace_latency": False,
+
+    # Log file ("" = console and GUI only), rotated at log_file_kb
+    "log_file": "",
+    "log_file_kb": 1024,
+    "log_file_backups": 3,
+
+    # Profiles: every <name>.json in this folder, preloaded (see PROFILES)
+    "profiles_dir": "profiles",
+
+    # Persistence: write the config this long after the last change (background, atomic)
+    "autosave": True,
+    "autosave_ms": 1000,
+
     # UI helpers (not saved to bindings-only files)
     "bindings_filename": "bindings_user.json",
+    "session_filename": "session.vwrec",
+    "stats_filename": "vwiimote_stats.json",
 }
 
 # Binding types
@@ -77,8 +165,45 @@ DEFAULT_BINDINGS = {
     "mv_back":        (BIND_VK, ord('L')),    # pitch backward
     "mv_left":        (BIND_VK, ord('K')),    # roll left
     "mv_right":       (BIND_VK, 0xBA),        # roll right (';')
+    "recenter":       (BIND_VK, ord('R')),    # IMU mode: back to neutral
+    "profile_next":   (BIND_VK, 0x78),        # F9: cycle preloaded profiles
+}
+
+# Slots 2..4 default to their own XInput pad so they don't fight slot 1 over the keyboard
+DEFAULT_PAD_BINDINGS = {
+    "wm_a":           (BIND_XBTN, 0x1000),    # A
+    "wm_b":           (BIND_XBTN, 0x0200),    # RB
+    "wm_1":           (BIND_XBTN, 0x4000),    # X
+    "wm_2":           (BIND_XBTN, 0x8000),    # Y
+    "wm_plus":        (BIND_XBTN, 0x0010),    # START
+    "wm_minus":       (BIND_XBTN, 0x0020),    # BACK
+    "wm_home":        (BIND_XBTN, 0x0080),    # RS click
+    "wm_dpad_left":   (BIND_XBTN, 0x0004),
+    "wm_dpad_right":  (BIND_XBTN, 0x0008),
+    "wm_dpad_up":     (BIND_XBTN, 0x0001),
+    "wm_dpad_down":   (BIND_XBTN, 0x0002),
+    "spin_w":         (BIND_XBTN, 0x0100),    # LB
+    "spin_e":         (BIND_XBTN, 0x2000),    # B
+    "toggle_off":     (BIND_XBTN, 0x0040),    # LS click
+}
+
+def default_bindings(slot:int):
+    return dict(DEFAULT_BINDINGS if slot == 0 else DEFAULT_PAD_BINDINGS)
+
+# Per-slot input source (slot 1 is the only one enabled out of the box)
+DEFAULT_SLOT = {
+    "enabled": False,
+    "pointer_source": "mouse",            # mouse | xinput_rs | xinput_ls
+    "xinput_index": 0,                    # 0..3
 }
 
+def default_slot(slot:int):
+    d = dict(DEFAULT_SLOT)
+    d["enabled"] = (slot == 0)
+    d["xinput_index"] = slot
+    d["pointer_source"] = "mouse" if slot == 0 else "xinput_rs"
+    return d
+
 # Wiimote actions (for tables)
 ACTIONS_WIIMOTE = [
     ("wm_a",           "Wiimote A"),
@@ -97,6 +222,7 @@ ACTIONS_EXTRA = [
     ("spin_w",         "Shake/Twirl Z (W)"),
     ("spin_e",         "Shake/Spin  X (E)"),
     ("toggle_off",     "Toggle Offscreen"),
+    ("profile_next",   "Next Profile"),
 ]
 # NEW: Twist bindings (independent of D-Pad; these drive gyro only)
 ACTIONS_TWIST = [
@@ -104,14 +230,18 @@ ACTIONS_TWIST = [
     ("mv_back",        "Twist Back (pitch backward)"),
     ("mv_left",        "Twist Left (roll left)"),
     ("mv_right",       "Twist Right (roll right)"),
+    ("recenter",       "Recenter (IMU mode)"),
+]
+# Macro triggers: each plays the timeline macros_file defines for it
+ACTIONS_MACRO = [
+    ("macro_1",        "Macro 1"),
+    ("macro_2",        "Macro 2"),
+    ("macro_3",        "Macro 3"),
+    ("macro_4",        "Macro 4"),
 ]
 
 # ------------------------------ Win32 / XInput ------------------------------
 
-user32 = windll.user32
-winmm  = windll.winmm
-GetAsyncKeyState = user32.GetAsyncKeyState
-
 # VK names table (partial)
 VK_NAME = {
     0x24:"HOME", 0x25:"LEFT", 0x26:"UP", 0x27:"RIGHT", 0x28:"DOWN",
@@ -130,15 +260,6 @@ for c in range(ord('A'), ord('Z')+1):
 def vk_to_name(code:int)->str:
     return VK_NAME.get(code, f"VK_{code}")
 
-# XInput
-try:
-    _xinput = windll.xinput1_4
-except OSError:
-    try:
-        _xinput = windll.xinput1_3
-    except OSError:
-        _xinput = None
-
 class XINPUT_GAMEPAD(Structure):
     _fields_ = [("wButtons", wintypes.WORD),
                 ("bLeftTrigger", wintypes.BYTE),
@@ -159,13 +280,6 @@ XBTN = {
 }
 XBTN_NAME = {v:k for k,v in XBTN.items()}
 
-def xinput_get_state(idx=0):
-    if not _xinput: return None
-    st = XINPUT_STATE()
-    res = _xinput.XInputGetState(idx, byref(st))
-    if res != 0: return None
-    return st
-
 # DS4 (DSU) bits
 BTN_L1=0x01; BTN_R1=0x02; BTN_L2=0x04; BTN_R2=0x08
 BTN_SQUARE=0x10; BTN_CROSS=0x20; BTN_CIRCLE=0x40; BTN_TRIANGLE=0x80
@@ -176,83 +290,1406 @@ SM_CXSCREEN, SM_CYSCREEN = 0, 1
 class POINT(Structure):
     _fields_ = [("x", wintypes.LONG), ("y", wintypes.LONG)]
 
-def screen_size():
-    return user32.GetSystemMetrics(SM_CXSCREEN), user32.GetSystemMetrics(SM_CYSCREEN)
+def timer_resolution(begin:bool):
+    # 1 ms scheduler granularity on Windows; no-op elsewhere
+    if not IS_WINDOWS: return
+    if begin: win32().winmm.timeBeginPeriod(1)
+    else:     win32().winmm.timeEndPeriod(1)
+
+# ------------------------------ INPUT BACKENDS ------------------------------
+# The server loop and resp_data() only talk to `backend`; nothing else touches
+# the OS input APIs. poll() is called once per tick before any slot is sampled.
+
+class PadState:
+    # XInput-shaped pad: wButtons bitmask + thumbsticks (-32768..32767, +Y = up)
+    __slots__ = ("buttons","lx","ly","rx","ry")
+    def __init__(self, buttons=0, lx=0, ly=0, rx=0, ry=0):
+        self.buttons = buttons
+        self.lx = lx; self.ly = ly
+        self.rx = rx; self.ry = ry
+
+class InputBackend:
+    # keys(mask) is the bulk keyboard read: a 256-bit int with bit vk set for
+    # every pressed VK in `mask`. key_down(vk) is the single-key convenience.
+    # sample_ns() is when the current input was read (perf_counter_ns): backends
+    # set _read_ns when they read it, in poll() or on the first read after it.
+    name = "null"
+    _read_ns = 0
+    def poll(self): pass
+    def now_us(self)->int: return time.perf_counter_ns() // 1000
+    def sample_ns(self)->int: return self._read_ns or time.perf_counter_ns()
+    def keys(self, mask:int)->int: return 0
+    def key_down(self, vk:int)->bool: return self.keys(1 << vk) != 0
+    def pad(self, index:int): return None          # PadState or None if not connected
+    def capture_state(self, mask:int, index:int):
+        # -> (keys, pad buttons) for the rebind capture thread: safe off the tick
+        # thread and never recorded. This default suits backends whose state is
+        # plain ints refreshed in poll(); others bring their own buffers.
+        p = self.pad(index)
+        return self.keys(mask), p.buttons if p is not None else 0
+    def cursor_pos(self): return (0, 0)
+    def screen_size(self): return (1920, 1080)
+    def close(self): pass
+
+WH_KEYBOARD_LL = 13
+WM_KEYDOWN, WM_KEYUP, WM_SYSKEYDOWN, WM_SYSKEYUP, WM_QUIT = 0x100, 0x101, 0x104, 0x105, 0x12
+# generic modifier VK -> (left VK, right VK); the LL hook only reports the sided ones
+_VK_GENERIC = {0x10: (0xA0, 0xA1), 0x11: (0xA2, 0xA3), 0x12: (0xA4, 0xA5)}
+
+class KBDLLHOOKSTRUCT(Structure):
+    _fields_ = [("vkCode", wintypes.DWORD), ("scanCode", wintypes.DWORD),
+                ("flags", wintypes.DWORD), ("time", wintypes.DWORD),
+                ("dwExtraInfo", ctypes.c_size_t)]
+
+class KeyboardHook(threading.Thread):
+    # WH_KEYBOARD_LL hook on its own message-loop thread. Keeps `keys`, a
+    # 256-bit VK-down bitmap, current from key events, so reading the keyboard
+    # costs no ctypes call at all. on_press(vk), if set, runs on every fresh
+    # key-down (used by the rebind capture).
+    def __init__(self):
+        super().__init__(daemon=True, name="vwiimote-kbhook")
+        self.keys = 0
+        self.on_press = None
+        self.ready = threading.Event()
+        self.ok = False
+        self._tid = 0
+
+    def _set(self, vk, down):
+        bit = 1 << vk
+        if down:
+            fresh = not (self.keys & bit)
+            self.keys |= bit
+        else:
+            fresh = False
+            self.keys &= ~bit
+        for g,(l,r) in _VK_GENERIC.items():
+            if vk == l or vk == r:
+                if self.keys & ((1 << l) | (1 << r)): self.keys |= 1 << g
+                else:                                 self.keys &= ~(1 << g)
+        cb = self.on_press
+        if fresh and cb is not None: cb(vk)
+
+    def run(self):
+        user32 = ctypes.WinDLL("user32", use_last_error=True)
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        LRESULT = ctypes.c_ssize_t
+        HOOKPROC = ctypes.WINFUNCTYPE(LRESULT, ctypes.c_int, wintypes.WPARAM, wintypes.LPARAM)
+        user32.SetWindowsHookExW.argtypes = (ctypes.c_int, HOOKPROC, wintypes.HINSTANCE, wintypes.DWORD)
+        user32.SetWindowsHookExW.restype = wintypes.HHOOK
+        user32.CallNextHookEx.argtypes = (wintypes.HHOOK, ctypes.c_int, wintypes.WPARAM, wintypes.LPARAM)
+        user32.CallNextHookEx.restype = LRESULT
+        kernel32.GetModuleHandleW.restype = wintypes.HMODULE
+
+        def proc(n, wparam, lparam):
+            if n == 0:
+                vk = ctypes.cast(lparam, ctypes.POINTER(KBDLLHOOKSTRUCT)).contents.vkCode & 0xFF
+                if wparam == WM_KEYDOWN or wparam == WM_SYSKEYDOWN:
+                    self._set(vk, True)
+                elif wparam == WM_KEYUP or wparam == WM_SYSKEYUP:
+                    self._set(vk, False)
+            return user32.CallNextHookEx(None, n, wparam, lparam)
+
+        self._proc = HOOKPROC(proc)   # keep the callback alive
+        hook = user32.SetWindowsHookExW(WH_KEYBOARD_LL, self._proc, kernel32.GetModuleHandleW(None), 0)
+        self._tid = kernel32.GetCurrentThreadId()
+        self.ok = bool(hook)
+        self.ready.set()
+        if not hook: return
+        msg = wintypes.MSG()
+        try:
+            while user32.GetMessageW(byref(msg), None, 0, 0) > 0:
+                pass
+        finally:
+            user32.UnhookWindowsHookEx(hook)
+            self.ok = False
+
+    def stop(self):
+        if self._tid:
+            win32().user32.PostThreadMessageW(self._tid, WM_QUIT, 0, 0)
+
+class Win32Backend(InputBackend):
+    # Keyboard from a KeyboardHook when it can be installed; otherwise keys()
+    # polls GetAsyncKeyState for just the VKs in the mask, once per poll().
+    # Screen metrics are refreshed once a second, so a tick costs one
+    # XInputGetState per active slot plus GetCursorPos for mouse pointers.
+    # Every HOOK_CHECK_S the hook's bitmap is checked against GetAsyncKeyState
+    # (see _check_hook); if it has drifted, the backend goes back to polling.
+    name = "win32"
+    HOOK_CHECK_S = 0.5
+    def __init__(self, hook=True):
+        if not IS_WINDOWS:
+            raise OSError("win32 input backend needs Windows")
+        windll = win32()
+        user32 = windll.user32
+        self._GetAsyncKeyState = user32.GetAsyncKeyState
+        self._GetCursorPos = user32.GetCursorPos
+        self._GetSystemMetrics = user32.GetSystemMetrics
+        try:
+            self._xinput = windll.xinput1_4
+        except OSError:
+            try:
+                self._xinput = windll.xinput1_3
+            except OSError:
+                self._xinput = None
+        self._xs = [XINPUT_STATE() for _ in range(MAX_SLOTS)]
+        self._pads = [PadState() for _ in range(MAX_SLOTS)]
+        self._pt = POINT()
+        self._screen = (1920, 1080)
+        self._screen_at = 0.0
+        self._have = 0      # fallback path: VKs already read this tick...
+        self._got = 0       # ...and which of them were down
+        self._mask = 0      # every mask keys() was asked for: what the hook check covers
+        self._check_at = 0.0
+        self._drift = 0
+        self.hook = None
+        if hook:
+            h = KeyboardHook()
+            h.start()
+            h.ready.wait(1.0)
+            if h.ok: self.hook = h
+            else:    log("Keyboard hook unavailable; polling bound keys instead.")
+
+    def poll(self):
+        self._have = self._got = 0
+        self._read_ns = 0
+        now = time.perf_counter()
+        if now - self._screen_at >= 1.0:
+            self._screen = (self._GetSystemMetrics(SM_CXSCREEN), self._GetSystemMetrics(SM_CYSCREEN))
+            self._screen_at = now
+        if self.hook is not None and now - self._check_at >= self.HOOK_CHECK_S:
+            self._check_at = now
+            self._check_hook()
+
+    def _check_hook(self):
+        # The hook never hears about a key-up that happens in an elevated window
+        # or on the secure desktop, nor anything after Windows silently drops it
+        # (LowLevelHooksTimeout), so a binding could stay held forever. Compare
+        # its bitmap with GetAsyncKeyState for the bound keys and whatever it
+        # holds down. Only a mismatch seen by two checks in a row counts: events
+        # still in flight between the two reads are not drift.
+        hook = self.hook
+        held = hook.keys
+        m = want = held | self._mask
+        real = 0
+        while m:
+            low = m & -m
+            if self._GetAsyncKeyState(low.bit_length() - 1) & 0x8000: real |= low
+            m ^= low
+        drift = (held ^ real) & want
+        if drift & self._drift:
+            log("Keyboard hook out of sync with the keyboard; polling bound keys instead.")
+            hook.stop()
+            self.hook = None
+        self._drift = drift
+
+    def keys(self, mask):
+        if not self._read_ns: self._read_ns = time.perf_counter_ns()
+        hook = self.hook
+        if hook is not None and hook.ok:
+            self._mask |= mask
+            return hook.keys & mask
+        # Without the hook: one GetAsyncKeyState per bound VK per tick, however
+        # many slots or reads share it. There is no global batch read:
+        # GetKeyboardState only tracks the calling thread's own message queue.
+        m = mask & ~self._have
+        if m:
+            self._have |= m
+            got = self._got
+            while m:
+                low = m & -m
+                if self._GetAsyncKeyState(low.bit_length() - 1) & 0x8000: got |= low
+                m ^= low
+            self._got = got
+        return self._got & mask
+
+    def key_down(self, vk):
+        return (self._GetAsyncKeyState(vk) & 0x8000) != 0
+
+    def capture_state(self, mask, index):
+        # rebind capture thread: its own XINPUT_STATE, and none of the tick's
+        # bookkeeping (_have/_got, _mask, _read_ns)
+        hook = self.hook
+        if hook is not None and hook.ok:
+            keys = hook.keys & mask
+        else:
+            keys = 0; m = mask
+            while m:
+                low = m & -m
+                if self._GetAsyncKeyState(low.bit_length() - 1) & 0x8000: keys |= low
+                m ^= low
+        btn = 0
+        if self._xinput:
+            xs = XINPUT_STATE()
+            if self._xinput.XInputGetState(index, byref(xs)) == 0: btn = xs.Gamepad.wButtons
+        return keys, btn
+
+    def pad(self, index):
+        if not self._xinput: return None
+        if not self._read_ns: self._read_ns = time.perf_counter_ns()
+        xs = self._xs[index]
+        if self._xinput.XInputGetState(index, byref(xs)) != 0: return None
+        g = xs.Gamepad; p = self._pads[index]
+        p.buttons = g.wButtons
+        p.lx = g.sThumbLX; p.ly = g.sThumbLY
+        p.rx = g.sThumbRX; p.ry = g.sThumbRY
+        return p
+
+    def cursor_pos(self):
+        if not self._read_ns: self._read_ns = time.perf_counter_ns()
+        self._GetCursorPos(byref(self._pt))
+        return self._pt.x, self._pt.y
+
+    def screen_size(self):
+        return self._screen
+
+    def close(self):
+        if self.hook is not None:
+            self.hook.stop(); self.hook = None
+
+class ScriptedBackend(InputBackend):
+    # Headless synthetic input. State is driven either directly (press/release/
+    # set_pad/move_cursor, e.g. from a test harness) or by a timed script of
+    # events, each (t_seconds, kind, *args):
+    #   (t, "key", vk, down)   (t, "pad", index, buttons, lx, ly, rx, ry)   (t, "cursor", x, y)
+    # Times are relative to the first poll(); loop=True repeats the script.
+    name = "synthetic"
+    def __init__(self, script=(), screen=(1920, 1080), loop=False):
+        self.kb = 0      # VK-down bitmap
+        self.pads = [None]*MAX_SLOTS
+        self.cursor = (screen[0]//2, screen[1]//2)
+        self.screen = tuple(screen)
+        self.script = sorted((tuple(ev) for ev in script), key=lambda ev: ev[0])
+        self.loop = loop
+        self._pos = 0
+        self._t0 = None
+
+    @classmethod
+    def from_file(cls, path, **kw):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        kw.setdefault("loop", bool(data.get("loop", False)))
+        if "screen" in data: kw.setdefault("screen", tuple(data["screen"]))
+        return cls(data.get("events", []), **kw)
+
+    def press(self, vk):   self.kb |= 1 << vk
+    def release(self, vk): self.kb &= ~(1 << vk)
+    def set_pad(self, index, buttons=0, lx=0, ly=0, rx=0, ry=0):
+        self.pads[index] = PadState(buttons, lx, ly, rx, ry)
+    def move_cursor(self, x, y):
+        self.cursor = (int(x), int(y))
+
+    def _apply(self, ev):
+        kind = ev[1]
+        if kind == "key":
+            (self.press if ev[3] else self.release)(int(ev[2]))
+        elif kind == "pad":
+            self.set_pad(int(ev[2]), *(int(v) for v in ev[3:8]))
+        elif kind == "cursor":
+            self.move_cursor(ev[2], ev[3])
+
+    def poll(self):
+        self._read_ns = time.perf_counter_ns()
+        if not self.script: return
+        now = time.perf_counter()
+        if self._t0 is None: self._t0 = now
+        t = now - self._t0
+        while self._pos < len(self.script) and self.script[self._pos][0] <= t:
+            self._apply(self.script[self._pos])
+            self._pos += 1
+        if self._pos == len(self.script) and self.loop:
+            self._t0 = now; self._pos = 0
+
+    def keys(self, mask):    return self.kb & mask
+    def pad(self, index):    return self.pads[index]
+    def cursor_pos(self):    return self.cursor
+    def screen_size(self):   return self.screen
+
+# evdev key names -> Win32 VK codes, so bindings and config files stay portable
+_EVDEV_VK_NAMES = {
+    "KEY_HOME":0x24, "KEY_LEFT":0x25, "KEY_UP":0x26, "KEY_RIGHT":0x27, "KEY_DOWN":0x28,
+    "KEY_SPACE":0x20, "KEY_TAB":0x09, "KEY_ESC":0x1B, "KEY_ENTER":0x0D,
+    "KEY_LEFTSHIFT":0xA0, "KEY_RIGHTSHIFT":0xA1, "KEY_LEFTCTRL":0xA2, "KEY_RIGHTCTRL":0xA3,
+    "KEY_LEFTALT":0xA4, "KEY_RIGHTALT":0xA5,
+    "KEY_EQUAL":0xBB, "KEY_MINUS":0xBD, "KEY_SEMICOLON":0xBA,
+}
+for c in "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789":
+    _EVDEV_VK_NAMES["KEY_"+c] = ord(c)
+for n in range(1, 13):
+    _EVDEV_VK_NAMES[f"KEY_F{n}"] = 0x6F + n
+
+# evdev gamepad buttons (xpad naming) -> XInput wButtons bits
+_EVDEV_XBTN_NAMES = {
+    "BTN_SOUTH":0x1000, "BTN_EAST":0x2000, "BTN_NORTH":0x4000, "BTN_WEST":0x8000,
+    "BTN_TL":0x0100, "BTN_TR":0x0200, "BTN_SELECT":0x0020, "BTN_START":0x0010,
+    "BTN_THUMBL":0x0040, "BTN_THUMBR":0x0080,
+}
+
+class EvdevBackend(InputBackend):
+    # Linux input via /dev/input/event* (python-evdev). Works with real devices
+    # and with uinput virtual devices created by a test/load harness. The pointer
+    # integrates relative mouse motion inside a virtual screen of `screen` pixels.
+    # Gamepads are assigned to pad indices in device-path order.
+    name = "evdev"
+    def __init__(self, paths=None, screen=(1920, 1080)):
+        if load_evdev() is None:
+            raise OSError("evdev input backend needs the 'evdev' package")
+        ec = evdev.ecodes
+        self._key_vk = {ec.ecodes[n]:vk for n,vk in _EVDEV_VK_NAMES.items() if n in ec.ecodes}
+        self._btn_x = {ec.ecodes[n]:b for n,b in _EVDEV_XBTN_NAMES.items() if n in ec.ecodes}
+        self._ec = ec
+        self.screen = tuple(screen)
+        self.cursor = [screen[0]//2, screen[1]//2]
+        self.kb = 0      # VK-down bitmap
+        self.devices = []
+        self._pad_of = {}       # device fd -> pad index
+        self._absinfo = {}      # (fd, code) -> (min, max)
+        self.pads = [None]*MAX_SLOTS
+        for path in sorted(paths if paths is not None else evdev.list_devices()):
+            try:
+                dev = evdev.InputDevice(path)
+            except OSError:
+                continue
+            caps = dev.capabilities()
+            keys = set(caps.get(ec.EV_KEY, ()))
+            is_pad = ec.BTN_SOUTH in keys and ec.EV_ABS in caps
+            if not (is_pad or ec.KEY_A in keys or ec.EV_REL in caps):
+                dev.close(); continue
+            if is_pad:
+                idx = len(self._pad_of)
+                if idx >= MAX_SLOTS:
+                    dev.close(); continue
+                self._pad_of[dev.fd] = idx
+                self.pads[idx] = PadState()
+                for code,info in caps[ec.EV_ABS]:
+                    self._absinfo[(dev.fd, code)] = (info.min, info.max)
+            self.devices.append(dev)
+        log(f"evdev backend: {len(self.devices)} device(s), {len(self._pad_of)} pad(s)")
+
+    def _norm(self, fd, code, v):
+        lo, hi = self._absinfo.get((fd, code), (-32768, 32767))
+        if hi <= lo: return 0
+        return int(max(-32768, min(32767, (v - lo) * 65535 // (hi - lo) - 32768)))
+
+    def poll(self):
+        self._read_ns = time.perf_counter_ns()
+        ec = self._ec
+        for dev in self.devices:
+            try:
+                # read() is a generator: the errors come out of the iteration
+                events = list(dev.read())
+            except BlockingIOError:
+                continue   # idle, nothing queued
+            except OSError:
+                continue   # unplugged; keep last state
+            pad_idx = self._pad_of.get(dev.fd)
+            pad = self.pads[pad_idx] if pad_idx is not None else None
+            for e in events:
+                if e.type == ec.EV_KEY:
+                    vk = self._key_vk.get(e.code)
+                    if vk is not None:
+                        if e.value: self.kb |= 1 << vk
+                        else:       self.kb &= ~(1 << vk)
+                    elif pad is not None and e.code in self._btn_x:
+                        bit = self._btn_x[e.code]
+                        pad.buttons = (pad.buttons | bit) if e.value else (pad.buttons & ~bit)
+                elif e.type == ec.EV_REL:
+                    if e.code == ec.REL_X:
+                        self.cursor[0] = max(0, min(self.screen[0]-1, self.cursor[0] + e.value))
+                    elif e.code == ec.REL_Y:
+                        self.cursor[1] = max(0, min(self.screen[1]-1, self.cursor[1] + e.value))
+                elif e.type == ec.EV_ABS and pad is not None:
+                    c = e.code
+                    if c == ec.ABS_X:    pad.lx = self._norm(dev.fd, c, e.value)
+                    elif c == ec.ABS_Y:  pad.ly = -1 - self._norm(dev.fd, c, e.value)   # evdev +Y is down
+                    elif c == ec.ABS_RX: pad.rx = self._norm(dev.fd, c, e.value)
+                    elif c == ec.ABS_RY: pad.ry = -1 - self._norm(dev.fd, c, e.value)
+                    elif c == ec.ABS_HAT0X:
+                        pad.buttons &= ~0x000C
+                        if e.value < 0: pad.buttons |= 0x0004
+                        elif e.value > 0: pad.buttons |= 0x0008
+                    elif c == ec.ABS_HAT0Y:
+                        pad.buttons &= ~0x0003
+                        if e.value < 0: pad.buttons |= 0x0001
+                        elif e.value > 0: pad.buttons |= 0x0002
+
+    def keys(self, mask):    return self.kb & mask
+    def pad(self, index):    return self.pads[index]
+    def cursor_pos(self):    return self.cursor[0], self.cursor[1]
+    def screen_size(self):   return self.screen
+
+    def close(self):
+        for dev in self.devices:
+            try: dev.close()
+            except OSError: pass
+        self.devices = []
+
+# ------------------------------ RECORD / REPLAY ------------------------------
+# Session file: 16-byte header, then one fixed-width record per backend poll():
+#   ts_us, 256-bit VK-down bitmap, cursor x/y, screen w/h, pad-present mask,
+#   4 x (buttons, lx, ly, rx, ry)
+# Keys are recorded as observed through keys()/key_down(), i.e. exactly what
+# the bindings read that tick, so replay with the same bindings is deterministic.
+
+REC_MAGIC = b"VWRC"
+REC_VERSION = 1
+_REC_HDR = struct.Struct("<4sHHII")                       # magic, version, record size, hz, reserved
+_REC = struct.Struct("<Q32siiHHB3x" + "Hhhhh"*MAX_SLOTS)  # 96 bytes
+
+class InputRecorder(InputBackend):
+    # Pass-through backend that logs what the wrapped backend reported each tick
+    name = "record"
+    def __init__(self, inner, path, hz=0):
+        self.inner = inner
+        self.path = path
+        self.frames = 0
+        self._f = open(path, "wb")
+        self._f.write(_REC_HDR.pack(REC_MAGIC, REC_VERSION, _REC.size, int(hz), 0))
+        self._open = False
+        self._reset(0)
+
+    def _reset(self, ts_us):
+        self._ts = ts_us
+        self._keys = 0
+        self._cursor = (0, 0)
+        self._screen = (0, 0)
+        self._pads = [None]*MAX_SLOTS
+
+    def _flush(self):
+        if not self._open: return
+        mask = 0; flat = []
+        for i,p in enumerate(self._pads):
+            if p is None:
+                flat += (0, 0, 0, 0, 0)
+            else:
+                mask |= 1 << i
+                flat += (p[0], p[1], p[2], p[3], p[4])
+        self._f.write(_REC.pack(self._ts, self._keys.to_bytes(32, "little"),
+                                self._cursor[0], self._cursor[1], self._screen[0], self._screen[1],
+                                mask, *flat))
+        self.frames += 1
+
+    def poll(self):
+        self._flush()
+        self.inner.poll()
+        self._reset(self.inner.now_us())
+        self._open = True
+
+    def now_us(self):
+        return self._ts if self._open else self.inner.now_us()
+
+    def sample_ns(self):
+        return self.inner.sample_ns()
+
+    def capture_state(self, mask, index):
+        return self.inner.capture_state(mask, index)   # not part of the session
+
+    def keys(self, mask):
+        got = self.inner.keys(mask)
+        self._keys |= got
+        return got
+
+    def key_down(self, vk):
+        down = self.inner.key_down(vk)
+        if down and 0 <= vk < 256: self._keys |= 1 << vk
+        return down
+
+    def pad(self, index):
+        p = self.inner.pad(index)
+        self._pads[index] = None if p is None else (p.buttons, p.lx, p.ly, p.rx, p.ry)
+        return p
+
+    def cursor_pos(self):
+        self._cursor = self.inner.cursor_pos()
+        return self._cursor
+
+    def screen_size(self):
+        self._screen = self.inner.screen_size()
+        return self._screen
+
+    def close(self):
+        # finishes the session file; the wrapped backend stays open
+        if self._f is None: return
+        self._flush()
+        self._open = False
+        self._f.close(); self._f = None
+
+class ReplayBackend(InputBackend):
+    # Plays a session file back one record per poll(). The file is memory-mapped,
+    # so hour-long sessions are never loaded into RAM. now_us() returns the
+    # recorded timestamp, which makes resp_data() output reproducible.
+    name = "replay"
+    def __init__(self, path, loop=False):
+        self.path = path
+        self.loop = loop
+        self._f = open(path, "rb")
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, ver, size, self.hz, _ = _REC_HDR.unpack_from(self._mm, 0)
+        if magic != REC_MAGIC or ver != REC_VERSION or size != _REC.size:
+            self.close()
+            raise ValueError(f"'{path}' is not a v{REC_VERSION} session file")
+        self.frames = (len(self._mm) - _REC_HDR.size) // _REC.size
+        self.pos = -1
+        self.done = self.frames == 0
+        self._ts = 0
+        self._keys = 0
+        self._cursor = (0, 0)
+        self._screen = (1920, 1080)
+        self._pads = [None]*MAX_SLOTS
+        self._pad_obj = [PadState() for _ in range(MAX_SLOTS)]
+
+    def ts_at(self, i):
+        return struct.unpack_from("<Q", self._mm, _REC_HDR.size + i*_REC.size)[0]
+
+    def poll(self):
+        self._read_ns = time.perf_counter_ns()
+        if self.done: return
+        self.pos += 1
+        if self.pos >= self.frames:
+            if not self.loop:
+                self.done = True; self.pos = self.frames - 1
+                return
+            self.pos = 0
+        r = _REC.unpack_from(self._mm, _REC_HDR.size + self.pos*_REC.size)
+        self._ts = r[0]
+        self._keys = int.from_bytes(r[1], "little")
+        self._cursor = (r[2], r[3])
+        self._screen = (r[4], r[5])
+        mask = r[6]
+        for i in range(MAX_SLOTS):
+            if mask & (1 << i):
+                p = self._pad_obj[i]
+                p.buttons, p.lx, p.ly, p.rx, p.ry = r[7+5*i:12+5*i]
+                self._pads[i] = p
+            else:
+                self._pads[i] = None
+
+    def now_us(self):        return self._ts
+    def keys(self, mask):    return self._keys & mask
+    def pad(self, index):    return self._pads[index]
+    def cursor_pos(self):    return self._cursor
+    def screen_size(self):   return self._screen
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close(); self._mm = None
+        if self._f is not None:
+            self._f.close(); self._f = None
+
+class InputSample:
+    __slots__ = ("seq","t_us","change_ns","keys","pads","cursor","screen")
+    def __init__(self, seq, t_us, change_ns, keys, pads, cursor, screen):
+        self.seq = seq; self.t_us = t_us
+        self.change_ns = change_ns   # perf_counter_ns when the oldest unconsumed change was seen
+        self.keys = keys; self.pads = pads
+        self.cursor = cursor; self.screen = screen
+
+class InputSampler(InputBackend):
+    # Polls `inner` on its own thread at `hz` (typically well above the packet
+    # rate) and publishes an immutable InputSample by plain attribute
+    # assignment: a single-writer slot, so the tick never takes a lock.
+    # Key and pad-button presses are latched: each sample carries the OR of
+    # every raw sample the tick hasn't consumed yet, so a tap shorter than a
+    # tick still reads as down for one tick, and a release shows up on the
+    # first tick after it. The tick acknowledges by writing the consumed seq
+    # to `_ack` (its own single-writer slot); the sampler drops history up to it.
+    name = "sampler"
+    def __init__(self, inner, hz=1000):
+        self.inner = inner
+        self.set_hz(hz)
+        self._ack = 0
+        self._sample = self._cur = InputSample(0, inner.now_us(), time.perf_counter_ns(), 0, (None,)*MAX_SLOTS,
+                                               inner.cursor_pos(), inner.screen_size())
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, daemon=True, name="vwiimote-sampler")
+        self._thread.start()
+
+    def set_hz(self, hz):
+        self.hz = max(1, int(hz))
+        self.period = 1.0 / self.hz
+
+    def _run(self):
+        inner = self.inner
+        seq = 0
+        hist = deque(maxlen=256)   # (seq, keys, buttons per pad, change_ns) newer than the ack
+        snap = None
+        mask = 0; pads = ()
+        prev_sig = None
+        next_t = time.perf_counter()
+        while not self._stop:
+            if config.snap is not snap:
+                snap = config.snap
+                mask = 0
+                for cb in snap.compiled: mask |= cb.vk_mask
+                pads = tuple(sorted(set(snap.pads)))
+            inner.poll()
+            keys = inner.keys(mask)
+            btn = [0]*MAX_SLOTS
+            axes = [None]*MAX_SLOTS
+            for i in pads:
+                p = inner.pad(i)
+                if p is not None:
+                    btn[i] = p.buttons
+                    axes[i] = (p.lx, p.ly, p.rx, p.ry)
+            cursor = inner.cursor_pos()
+            now_ns = time.perf_counter_ns()
+            sig = (keys, cursor, btn, axes)
+            seq += 1
+            hist.append((seq, keys, btn, now_ns if sig != prev_sig else 0))
+            prev_sig = sig
+            ack = self._ack
+            while hist[0][0] <= ack:
+                hist.popleft()
+            lat_keys = 0
+            lat_btn = [0]*MAX_SLOTS
+            change_ns = 0
+            for _, k, b, c in hist:
+                lat_keys |= k
+                for i in pads: lat_btn[i] |= b[i]
+                if c and not change_ns: change_ns = c
+            out = [None]*MAX_SLOTS
+            for i in pads:
+                if axes[i] is not None:
+                    out[i] = PadState(lat_btn[i], *axes[i])
+            self._sample = InputSample(seq, inner.now_us(), change_ns or now_ns, lat_keys, tuple(out),
+                                       cursor, inner.screen_size())
+            next_t += self.period
+            delay = next_t - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_t = time.perf_counter()   # fell behind: don't burst
+
+    def poll(self):
+        cur = self._sample
+        self._cur = cur
+        self._ack = cur.seq
+        stats.input_age.add(self.inner.now_us() - cur.t_us)
+
+    def now_us(self): return self.inner.now_us()
+    def sample_ns(self): return self._cur.change_ns
+    def capture_state(self, mask, index): return self.inner.capture_state(mask, index)
+    def keys(self, mask): return self._cur.keys & mask
+    def pad(self, index):
+        return self._cur.pads[index] if 0 <= index < MAX_SLOTS else None
+    def cursor_pos(self): return self._cur.cursor
+    def screen_size(self): return self._cur.screen
+
+    def close(self):
+        # stops the sampler thread; the wrapped backend stays open
+        self._stop = True
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(1.0)
+
+INPUT_BACKENDS = {
+    "win32":     Win32Backend,
+    "synthetic": ScriptedBackend,
+    "evdev":     EvdevBackend,
+    "replay":    ReplayBackend,
+}
 
-def mouse_pos():
-    p = POINT()
-    user32.GetCursorPos(byref(p))
-    return p.x, p.y
+def default_backend_name():
+    if IS_WINDOWS: return "win32"
+    if load_evdev() is not None: return "evdev"
+    return "synthetic"
+
+backend = None   # active InputBackend (see use_backend)
+recorder = None  # InputRecorder wrapping `backend` while a session is being recorded
+sampler = None   # InputSampler under the recorder (if any) while sampler_hz > 0
+
+def use_backend(b=None, **kw):
+    # b: backend instance, registered name, or None for the platform default
+    global backend
+    if b is None: b = default_backend_name()
+    if isinstance(b, str): b = INPUT_BACKENDS[b](**kw)
+    if backend is not None and backend is not b: backend.close()
+    backend = b
+    log(f"Input backend: {b.name}")
+    return b
+
+def start_recording(path, hz=0):
+    global backend, recorder
+    if recorder is not None: stop_recording()
+    if backend is None: use_backend()
+    recorder = InputRecorder(backend, path, hz)
+    backend = recorder
+    log(f"Recording input to '{path}'")
+
+def stop_recording():
+    global backend, recorder
+    rec = recorder
+    if rec is None: return
+    backend = rec.inner
+    recorder = None
+    rec.close()
+    log(f"Recording stopped: {rec.frames} frames in '{rec.path}'")
+
+def start_sampler(hz):
+    # The sampler goes under the recorder, which then records what the tick
+    # actually consumed (latched samples), keeping replays faithful.
+    global backend, sampler
+    if sampler is not None:
+        sampler.set_hz(hz)
+        return
+    if backend is None: use_backend()
+    if recorder is not None:
+        sampler = recorder.inner = InputSampler(recorder.inner, hz)
+    else:
+        sampler = backend = InputSampler(backend, hz)
+    log(f"Input sampler: {hz} Hz")
+
+def stop_sampler():
+    global backend, sampler
+    smp = sampler
+    if smp is None: return
+    if recorder is not None: recorder.inner = smp.inner
+    else: backend = smp.inner
+    sampler = None
+    smp.close()
+    log("Input sampler stopped.")
 
 # ------------------------------ LOG ------------------------------
 
-log_queue = deque(maxlen=500)
+# log() only stamps the line and appends it to a deque: the server and input
+# threads never wait on the console, a file or the GUI. A writer thread drains
+# it every LOG_FLUSH_S to stdout, the optional rotating file ("log_file") and
+# a bounded buffer of the last LOG_KEEP lines the GUI window renders from.
+# If the writer falls behind by LOG_PENDING lines, the oldest are dropped and
+# counted instead of growing the queue.
+
+LOG_KEEP = 1000        # lines the GUI can scroll back through
+LOG_PENDING = 10000    # lines queued for the writer, at most
+LOG_FLUSH_S = 0.05
+
+class RotatingFile:
+    # Size-capped append file: path, path.1 .. path.<backups>, newest first.
+    # Binary, so the size is counted in the bytes actually written (UTF-8,
+    # platform line endings), not characters.
+    def __init__(self, path, max_bytes, backups):
+        self.path = path
+        self.max_bytes = max(4096, int(max_bytes))
+        self.backups = max(0, int(backups))
+        self.f = open(path, "ab")
+        self.size = self.f.tell()
+
+    def write(self, lines):
+        for line in lines:
+            data = line.replace("\n", os.linesep).encode("utf-8", "replace")
+            if self.size and self.size + len(data) > self.max_bytes:
+                self.rotate()
+            self.f.write(data)
+            self.size += len(data)
+        self.f.flush()
+
+    def rotate(self):
+        self.f.close()
+        if self.backups:
+            for i in range(self.backups - 1, 0, -1):
+                src = f"{self.path}.{i}"
+                if os.path.exists(src): os.replace(src, f"{self.path}.{i+1}")
+            os.replace(self.path, f"{self.path}.1")
+        self.f = open(self.path, "wb")
+        self.size = 0
+
+    def close(self):
+        self.f.close()
+
+class LogWriter:
+    def __init__(self):
+        self.pending = deque(maxlen=LOG_PENDING)   # (ts, msg), appended by any thread
+        self.dropped = 0                       # lines pushed out of a full `pending`
+        self.lines = deque(maxlen=LOG_KEEP)    # rendered lines for the GUI
+        self.seq = 0                           # lines ever written; GUI redraws on change
+        self.sink = None
+        self.sink_key = None
+        self.lock = threading.Lock()           # writer thread vs. flush() at exit
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True, name="log")
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(LOG_FLUSH_S)
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if not self.pending: return
+            out = []
+            lost = self.dropped
+            if lost:
+                self.dropped -= lost
+                msg = f"{lost} log line(s) dropped, the log writer fell behind"
+                out.append((f"[{time.strftime('%H:%M:%S')}] {msg}", msg))
+            while self.pending:
+                ts, msg = self.pending.popleft()
+                out.append((f"[{ts}] {msg}", msg))
+            try:
+                sys.stdout.write("".join(f"[{APP_TITLE}] {msg}\n" for _, msg in out))
+                sys.stdout.flush()
+            except (OSError, ValueError, AttributeError):
+                pass                            # no console (pythonw) or closed at exit
+            self.lines.extend(line for line, _ in out)
+            self.seq += len(out)
+            self._file([line + "\n" for line, _ in out])
+
+    def _file(self, lines):
+        try:
+            v = config.snap.values
+        except NameError:
+            return                               # config is still loading
+        key = (v.get("log_file", ""), v.get("log_file_kb", 1024), v.get("log_file_backups", 3))
+        if key != self.sink_key:
+            if self.sink is not None: self.sink.close()
+            self.sink = None
+            self.sink_key = key
+            if key[0]:
+                try:
+                    self.sink = RotatingFile(key[0], key[1] * 1024, key[2])
+                except OSError as e:
+                    self.pending.append((time.strftime("%H:%M:%S"), f"Log file '{key[0]}' unavailable: {e}"))
+        if self.sink is not None:
+            try:
+                self.sink.write(lines)
+            except OSError:
+                pass
+
+    def view(self, rows, back=0):
+        # `rows` lines ending `back` lines above the newest
+        n = len(self.lines)
+        end = max(0, n - back)
+        start = max(0, end - rows)
+        return list(itertools.islice(self.lines, start, end))
+
+log_writer = LogWriter()
+log_writer.start()
+atexit.register(log_writer.flush)
+
 def log(msg:str):
-    ts = time.strftime("%H:%M:%S")
-    log_queue.append(f"[{ts}] {msg}")
-    print(f"[{APP_TITLE}] {msg}")
+    w = log_writer
+    if len(w.pending) == LOG_PENDING: w.dropped += 1   # append() pushes the oldest out
+    w.pending.append((time.strftime("%H:%M:%S"), msg))
+
+# ------------------------------ MOTION WAVEFORMS ------------------------------
+# A held W/E key steps through a precomputed per-tick table instead of
+# juggling pulse/cooldown counters. For P pulse frames and C cooldown frames:
+#   [pulse P] then loop [pulse P, rest C]      (the old counter behaviour)
+# Entries are (accel, accel_z, gyro) before the +-1 shake direction:
+# W -> (ax, az, gz), E -> (ay, az, gx). Tables are cached by their parameters,
+# so config changes that don't touch motion reuse them.
+
+PULSE_SHAPES = ["rect", "half_sine", "damped", "custom"]
+WAVE_CACHE_SIZE = 32
+_wave_cache = {}
+
+def load_curve(path):
+    # JSON list of numbers, or numbers separated by whitespace/commas;
+    # normalized to a peak of 1
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    try:
+        pts = [float(x) for x in json.loads(text)]
+    except (ValueError, TypeError):
+        pts = [float(x) for x in text.replace(",", " ").split()]
+    peak = max((abs(x) for x in pts), default=0.0)
+    return tuple(x / peak for x in pts) if peak else ()
+
+NUMPY_MIN_FRAMES = 256   # shorter tables are quicker in pure Python (no import either)
+
+def pulse_shape(shape, n, curve=()):
+    # n per-frame gains in [-1, 1], sampled at frame centres
+    m = len(curve)
+    if shape == "rect": return [1.0] * n
+    if n >= NUMPY_MIN_FRAMES and load_numpy() is not None:
+        k = (np.arange(n) + 0.5) / n
+        if shape == "half_sine":
+            g = np.sin(np.pi * k)
+        elif shape == "damped":
+            g = np.exp(-4.0 * k) * np.cos(3.0 * np.pi * k)
+        elif shape == "custom" and m > 1:
+            g = np.interp(k, np.linspace(0.0, 1.0, m), curve)
+        elif shape == "custom" and m == 1:
+            g = np.full(n, curve[0])
+        else:
+            return [1.0] * n
+        return g.tolist()
+    out = []
+    for i in range(n):
+        k = (i + 0.5) / n
+        if shape == "half_sine":
+            g = math.sin(math.pi * k)
+        elif shape == "damped":
+            g = math.exp(-4.0 * k) * math.cos(3.0 * math.pi * k)
+        elif shape == "custom" and m > 1:
+            x = k * (m - 1)
+            j = min(int(x), m - 2)
+            g = curve[j] + (curve[j+1] - curve[j]) * (x - j)
+        elif shape == "custom" and m == 1:
+            g = curve[0]
+        else:
+            g = 1.0
+        out.append(g)
+    return out
+
+def motion_table(shape, hz, pulse_ms, cooldown_ms, amp, amp_z, gyro, curve_file=""):
+    # -> (frames, intro): frames[i] for the i-th tick of a hold; after the
+    # last frame playback continues at index `intro`
+    mtime = 0
+    if shape == "custom":
+        try: mtime = os.path.getmtime(curve_file)
+        except OSError: mtime = -1
+    key = (shape, hz, pulse_ms, cooldown_ms, amp, amp_z, gyro, curve_file if shape == "custom" else "", mtime)
+    tab = _wave_cache.pop(key, None)
+    if tab is None:
+        curve = ()
+        if shape == "custom":
+            try:
+                curve = load_curve(curve_file)
+            except (OSError, ValueError) as e:
+                log(f"Pulse curve '{curve_file}' unusable ({e}); using rect.")
+                shape = "rect"
+        p = frames_for_ms(pulse_ms, hz)
+        c = frames_for_ms(cooldown_ms, hz)
+        pulse = [(g * amp, g * amp_z, gyro) for g in pulse_shape(shape, p, curve)]
+        tab = (tuple(pulse + pulse + [(0.0, 0.0, gyro)] * c), p)
+        if len(_wave_cache) >= WAVE_CACHE_SIZE:
+            del _wave_cache[next(iter(_wave_cache))]   # least recently used
+    _wave_cache[key] = tab
+    return tab
+
+# ------------------------------ MACROS ------------------------------
+# macros_file maps macro_1..macro_4 to a list of steps played one after the
+# other. A step lasts "ms" (0 = only change held buttons) and may set:
+#   "buttons": [action, ...]    down for this step (any bindable action)
+#   "hold" / "release": [...]   down from this step on / up again
+#   "pointer": [x, y]           touchpad position, 0..1 of its width/height
+#   "accel": [x, y, z]          m/s^2 added to the live accel (like a W/E pulse)
+#   "gyro": [x, y, z]           deg/s added to the live gyro
+# e.g. "hold B, twirl for 300 ms, then A":
+#   {"macro_1": [{"hold": ["wm_b"]}, {"ms": 300, "gyro": [0, 0, 800]},
+#                {"ms": 60, "buttons": ["wm_a"]}]}
+# Steps compile to one frame per tick at the current hz, (act, pointer,
+# accel, gyro); resp_data reads frame[i] and ORs / adds it over live input.
+# Timelines are cached by file, mtime and hz, like the pulse tables.
+
+MACRO_CACHE_SIZE = 16
+MACRO_MAX_STEP_MS = 60000      # one step
+MACRO_MAX_S = 300              # whole timeline, so a typo can't allocate gigabytes
+_macro_cache = {}
+
+def _vec(v, n, lo=None, hi=None):
+    if v is None: return None
+    if not isinstance(v, (list, tuple)) or len(v) != n: raise ValueError(f"expected {n} numbers")
+    out = tuple(float(x) for x in v)
+    if not all(math.isfinite(x) and (lo is None or lo <= x <= hi) for x in out):
+        raise ValueError(f"out of range: {v}")
+    return out
+
+def _actions(names):
+    bits = 0
+    for a in names or ():
+        bit = ACT_BITS.get(a)
+        if bit is None or bit & ACT_MACROS: raise ValueError(f"unknown action '{a}'")
+        bits |= bit
+    return bits
+
+def compile_macro(steps, hz):
+    # -> tuple of per-tick frames (act, pointer, accel, gyro)
+    if not isinstance(steps, list) or not all(isinstance(step, dict) for step in steps):
+        raise ValueError("expected a list of steps ({...} objects)")
+    frames = []
+    held = 0
+    t_ms = 0.0
+    for step in steps:
+        held |= _actions(step.get("hold"))
+        held &= ~_actions(step.get("release"))
+        ms = float(step.get("ms", 0))
+        if not (math.isfinite(ms) and ms <= MACRO_MAX_STEP_MS):
+            raise ValueError(f"ms must be a number up to {MACRO_MAX_STEP_MS}")
+        if not ms > 0: continue
+        t_ms += ms
+        if t_ms > MACRO_MAX_S * 1000:
+            raise ValueError(f"longer than {MACRO_MAX_S} s")
+        n = max(1, round(t_ms * hz / 1000.0) - len(frames))   # no drift over long macros
+        frame = (held | _actions(step.get("buttons")), _vec(step.get("pointer"), 2, 0.0, 1.0),
+                 _vec(step.get("accel"), 3), _vec(step.get("gyro"), 3))
+        frames.extend([frame] * n)
+    return tuple(frames)
+
+def macro_timelines(path, hz):
+    # -> one timeline (or None) per ACTIONS_MACRO entry
+    try: mtime = os.path.getmtime(path)
+    except OSError: return (None,) * len(ACTIONS_MACRO)
+    key = (path, mtime, hz)
+    tls = _macro_cache.pop(key, None)
+    if tls is None:
+        out = []
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            log(f"Macros file '{path}' unusable: {e}")
+            data = {}
+        if not isinstance(data, dict):
+            log(f"Macros file '{path}' unusable: expected a {{...}} object")
+            data = {}
+        for k,_ in ACTIONS_MACRO:
+            tl = None
+            if k in data:
+                try:
+                    tl = compile_macro(data[k], hz) or None
+                except (TypeError, ValueError, OverflowError, MemoryError) as e:
+                    log(f"Macro '{k}' in '{path}' skipped: {e or type(e).__name__}")
+            out.append(tl)
+        tls = tuple(out)
+        if len(_macro_cache) >= MACRO_CACHE_SIZE:
+            del _macro_cache[next(iter(_macro_cache))]
+    _macro_cache[key] = tls
+    return tls
 
 # ------------------------------ CONFIG RUNTIME ------------------------------
 
+def _update_bindings(dst:dict, loaded:dict):
+    # only known actions bound to a valid key / XInput button; returns the rejects
+    bad = []
+    for k,v in loaded.items():
+        try:
+            kind, code = v
+            code = int(code)
+        except (TypeError, ValueError):
+            bad.append(k)
+            continue
+        if k not in ACT_BITS or not ((kind == BIND_VK and 0 < code < 0x100) or (kind == BIND_XBTN and code in XBTN_NAME)):
+            bad.append(k)
+            continue
+        dst[k] = (kind, code)
+    return bad
+
+def frames_for_ms(ms, hz):
+    return max(2, int(hz * (ms/1000.0)))
+
+# Logical action bits. Face and PS actions sit on their DS4 bit positions, so
+# the packet bytes fall straight out of the action word: face = a & 0xFF,
+# ps = (a >> 8) & 0xFF.
+ACT_DPAD_LEFT, ACT_DPAD_RIGHT, ACT_DPAD_UP, ACT_DPAD_DOWN = 1<<16, 1<<17, 1<<18, 1<<19
+ACT_SPIN_W, ACT_SPIN_E, ACT_TOGGLE_OFF = 1<<20, 1<<21, 1<<22
+ACT_MV_FRONT, ACT_MV_BACK, ACT_MV_LEFT, ACT_MV_RIGHT = 1<<23, 1<<24, 1<<25, 1<<26
+ACT_RECENTER = 1<<27
+ACT_PROFILE_NEXT = 1<<28
+ACT_MACRO = [1 << (29 + i) for i in range(len(ACTIONS_MACRO))]
+ACT_MACROS = sum(ACT_MACRO)
+MACRO_OF_BIT = {bit: i for i,bit in enumerate(ACT_MACRO)}
+ACT_BITS = {
+    "wm_a": BTN_CROSS, "wm_b": BTN_CIRCLE, "wm_1": BTN_SQUARE, "wm_2": BTN_TRIANGLE,
+    "wm_plus": OPTIONS_BTN << 8, "wm_minus": SHARE_BTN << 8, "wm_home": PS_BTN << 8,
+    "wm_dpad_left": ACT_DPAD_LEFT, "wm_dpad_right": ACT_DPAD_RIGHT,
+    "wm_dpad_up": ACT_DPAD_UP, "wm_dpad_down": ACT_DPAD_DOWN,
+    "spin_w": ACT_SPIN_W, "spin_e": ACT_SPIN_E, "toggle_off": ACT_TOGGLE_OFF,
+    "mv_front": ACT_MV_FRONT, "mv_back": ACT_MV_BACK, "mv_left": ACT_MV_LEFT, "mv_right": ACT_MV_RIGHT,
+    "recenter": ACT_RECENTER, "profile_next": ACT_PROFILE_NEXT,
+    **{k: ACT_MACRO[i] for i,(k,_) in enumerate(ACTIONS_MACRO)},
+}
+
+class CompiledBindings:
+    # One slot's bindings as dispatch tables: VK -> action bits for the keys
+    # in vk_mask, and two 256-entry tables for the low/high byte of the XInput
+    # button word. actions() costs two lookups plus one step per pressed key.
+    __slots__ = ("vk_mask","vk_bits","xb_lo","xb_hi")
+    def __init__(self, binds):
+        vk_bits = [0]*256
+        xb = [0]*16
+        mask = 0
+        for action,b in binds.items():
+            bit = ACT_BITS.get(action)
+            if not bit or not b: continue
+            kind, code = b
+            if kind == BIND_VK and 0 <= code < 256:
+                vk_bits[code] |= bit
+                mask |= 1 << code
+            elif kind == BIND_XBTN:
+                for i in range(16):
+                    if code & (1 << i): xb[i] |= bit
+        self.vk_mask = mask
+        self.vk_bits = tuple(vk_bits)
+        self.xb_lo = tuple(self._fold(xb[:8], v) for v in range(256))
+        self.xb_hi = tuple(self._fold(xb[8:], v) for v in range(256))
+
+    @staticmethod
+    def _fold(bits, v):
+        a = 0
+        for i in range(8):
+            if v & (1 << i): a |= bits[i]
+        return a
+
+    def actions(self, keys, buttons):
+        a = self.xb_lo[buttons & 0xFF] | self.xb_hi[(buttons >> 8) & 0xFF]
+        k = keys & self.vk_mask
+        vk_bits = self.vk_bits
+        while k:
+            low = k & -k
+            a |= vk_bits[low.bit_length() - 1]
+            k ^= low
+        return a
+
+class ConfigSnapshot:
+    # Immutable, versioned view of Config. Writers build a new one under
+    # config.lock and swap config.snap; the tick path just reads config.snap
+    # (a single attribute load) and uses the pre-parsed fields below.
+    __slots__ = ("version","values","slots","bindings","compiled",
+                 "enabled","pads","pointer_sources","profile_keys",
+                 "hz","period","smooth","pointer_filter","tpad_w","tpad_h","invert_y",
+                 "cursor_speed","deadzone","dpad_half",
+                 "twirl_z_dps","spin_x_dps","w_pulse_ax","e_pulse_ay","pulse_az",
+                 "w_wave","e_wave","wave_intro","twist_dps","macros",
+                 "imu_mode","imu_auto_recenter","recenter_dps","trace_latency",
+                 "sub_timeout","sched_key","rx_batch","rx_budget","sampler_hz",
+                 "keepalive_us","min_send_interval")
+    def __init__(self, cfg, version, compiled, files=True):
+        # files=False: nothing is read from disk (the import-time default snapshot)
+        v = cfg.values
+        self.version = version
+        self.values = MappingProxyType(dict(v))
+        self.slots = tuple(MappingProxyType(dict(sc)) for sc in cfg.slots)
+        self.bindings = tuple(MappingProxyType(dict(b)) for b in cfg.bindings)
+        self.compiled = compiled
+        self.enabled = tuple(bool(sc["enabled"]) for sc in cfg.slots)
+        self.pads = tuple(int(sc["xinput_index"]) for sc in cfg.slots)
+        self.pointer_sources = tuple(str(sc["pointer_source"]) for sc in cfg.slots)
+        # "Next Profile" of every enabled slot: (VK mask, ((pad, XInput mask), ...)),
+        # read by the server tick itself, subscribed or not
+        pk_vk, pk_pads = 0, []
+        for on, pad, b in zip(self.enabled, self.pads, cfg.bindings):
+            pb = b.get("profile_next") if on else None
+            if not pb: continue
+            kind, code = pb
+            if kind == BIND_VK and 0 <= code < 256: pk_vk |= 1 << code
+            elif kind == BIND_XBTN and code: pk_pads.append((pad, code))
+        self.profile_keys = (pk_vk, tuple(pk_pads))
+
+        self.hz = max(1, int(v["hz"]))
+        self.period = 1.0 / self.hz
+        self.smooth = float(v["smooth"])
+        self.pointer_filter = (str(v["pointer_filter"]), self.smooth, float(v["oe_min_cutoff"]), float(v["oe_beta"]),
+                               max(0.01, float(v["filter_d_cutoff"])), max(0.0, float(v["predict_ms"])) / 1000.0)
+        self.tpad_w = int(v["tpad_w"]); self.tpad_h = int(v["tpad_h"])
+        self.invert_y = bool(v["invert_y"])
+        self.cursor_speed = float(v["cursor_speed_px_s"])
+        self.deadzone = int(v["stick_deadzone"])
+        self.dpad_half = int(max(0, min(255, v["lstick_magnitude"]))) // 2
+        self.twirl_z_dps = float(v["twirl_z_dps"])
+        self.spin_x_dps = float(v["spin_x_dps"])
+        self.w_pulse_ax = float(v["w_pulse_ax"])
+        self.e_pulse_ay = float(v["e_pulse_ay"])
+        self.pulse_az = float(v["pulse_az"])
+        shape, curve_file = str(v["pulse_shape"]), str(v["pulse_curve_file"])
+        pulse_ms, cooldown_ms = v["pulse_ms"], v["cooldown_ms"]
+        self.w_wave, self.wave_intro = motion_table(shape, self.hz, pulse_ms, cooldown_ms,
+                                                    self.w_pulse_ax, self.pulse_az, self.twirl_z_dps, curve_file)
+        self.e_wave, _ = motion_table(shape, self.hz, pulse_ms, cooldown_ms,
+                                      self.e_pulse_ay, self.pulse_az, self.spin_x_dps, curve_file)
+        self.twist_dps = float(v["twist_dps"])
+        self.macros = macro_timelines(str(v["macros_file"]), self.hz) if files else (None,) * len(ACTIONS_MACRO)
+        self.imu_mode = bool(v["imu_mode"])
+        self.trace_latency = bool(v["trace_latency"])
+        self.imu_auto_recenter = bool(v["imu_auto_recenter"])
+        self.recenter_dps = max(1.0, float(v["recenter_dps"]))
+        self.sub_timeout = float(v["sub_timeout_s"])
+        self.sched_key = (str(v["sched_strategy"]), str(v["sched_catchup"]), int(v["spin_us"]))
+        self.rx_batch = max(1, int(v["rx_batch"]))
+        self.rx_budget = max(0, int(v["rx_budget_us"])) / 1e6
+        self.sampler_hz = max(0, int(v["sampler_hz"]))
+        self.keepalive_us = max(1, int(v["keepalive_ms"])) * 1000 if v["delta_mode"] else 0
+        rate = int(v["max_rate_hz"])
+        self.min_send_interval = 1.0 / rate if rate > 0 else 0.0
+
+    def with_version(self, version):
+        # same contents, new version: preloaded snapshots are shared, never mutated
+        new = object.__new__(ConfigSnapshot)
+        for k in ConfigSnapshot.__slots__:
+            setattr(new, k, getattr(self, k))
+        new.version = version
+        return new
+
+# Change topics for observers (the GUI): each has a counter bumped on every
+# change, so a reader compares against the count it last rendered instead of
+# polling the values themselves or taking the lock.
+CONFIG_TOPICS = ("values", "slots", "bindings", "rebind", "subs")
+
 class Config:
+    # values/slots/bindings are the writer-side state (GUI, loaders, rebind);
+    # every mutation goes through a method that republishes `snap`. Writers
+    # only copy their state under the lock (_stage); the snapshot, which may
+    # read files (pulse curve, macros), is built after it is released and
+    # swapped in by _publish, newest staging wins.
     def __init__(self):
+        self.changes = dict.fromkeys(CONFIG_TOPICS + ("profile",), 0)
+        self.profile = None      # name of the active profile, None = the config file's state
         self.lock = threading.Lock()
+        self.save_lock = threading.Lock()   # Save button vs. ConfigSaver: one write at a time, in order
         self.values = dict(DEFAULTS)
-        self.bindings = dict(DEFAULT_BINDINGS)
-        self.rebind_target = None
+        self.slots = [default_slot(i) for i in range(MAX_SLOTS)]
+        self.bindings = [default_bindings(i) for i in range(MAX_SLOTS)]
+        self.rebind_target = None  # (slot, action)
         self.rebind_deadline = 0.0
         self.want_stop = False
+        self.path = CONFIG_FILE  # file load() read; save() and autosave write it back
         self.subs_count = 0  # for UI
+        self._compiled = {}  # frozen bindings -> CompiledBindings
+        self._staged = 0     # stagings handed out / the newest one published
+        self._published = 0
+        self.snap = ConfigSnapshot(self, 0, self._compile(), files=False)
+
+    def _compile(self):
+        # recompile only slots whose bindings actually changed
+        out = []
+        cache = {}
+        for b in self.bindings:
+            key = tuple(sorted(b.items()))
+            cb = self._compiled.get(key) or cache.get(key)
+            if cb is None: cb = CompiledBindings(b)
+            cache[key] = cb
+            out.append(cb)
+        self._compiled = cache
+        return tuple(out)
+
+    def _stage(self):
+        # caller holds self.lock: copies only (bindings compile from a cache)
+        self._staged += 1
+        state = SimpleNamespace(values=dict(self.values), slots=[dict(sc) for sc in self.slots],
+                                bindings=[dict(b) for b in self.bindings])
+        return self._staged, state, self._compile()
+
+    def _publish(self, staged, *topics):
+        # caller must NOT hold self.lock; no topics = everything may have changed
+        gen, state, compiled = staged
+        snap = ConfigSnapshot(state, 0, compiled)
+        with self.lock:
+            if gen > self._published:      # else a newer state (or a profile) is already live
+                self._published = gen
+                snap.version = self.snap.version + 1
+                self.snap = snap
+        self.notify(*(topics or CONFIG_TOPICS))
+
+    def notify(self, *topics):
+        for t in topics:
+            self.changes[t] += 1
+
+    def set_value(self, key, value):
+        with self.lock:
+            self.values[key] = value
+            staged = self._stage()
+        self._publish(staged, "values")
+
+    def set_slot(self, slot, key, value):
+        with self.lock:
+            self.slots[slot][key] = value
+            staged = self._stage()
+        self._publish(staged, "slots")
+
+    def set_binding(self, slot, action, b):
+        with self.lock:
+            self.bindings[slot][action] = b
+            staged = self._stage()
+        self._publish(staged, "bindings")
+
+    def refresh(self):
+        # rebuild the snapshot: files it reads (pulse curve, macros) may have changed
+        with self.lock:
+            staged = self._stage()
+        self._publish(staged, "values")
+
+    def set_subs(self, n):
+        # called every tick by the server: only a real change wakes the GUI
+        if n != self.subs_count:
+            self.subs_count = n
+            self.notify("subs")
 
     def load(self, path=CONFIG_FILE):
+        self.path = path
         if not os.path.isfile(path): return
         try:
             with open(path, "r", encoding="utf-8") as f:
                 data = json.load(f)
+            bad = []
+            values, slots, bindings = self.copy_state()
+            overlay_config(data, values, slots, bindings, bad)
             with self.lock:
-                self.values.update(data.get("values", {}))
-                loaded = data.get("bindings", {})
-                for k,v in loaded.items():
-                    if isinstance(v, list) and len(v)==2:
-                        self.bindings[k] = (v[0], int(v[1]))
+                self.values, self.slots, self.bindings = values, slots, bindings
+                staged = self._stage()
+            self._publish(staged)
+            if bad:
+                log(f"Config: ignored invalid entries (defaults kept): {', '.join(map(str, bad))}")
             log("Config loaded.")
         except Exception as e:
             log(f"Error loading config: {e}")
 
-    def save(self, path=CONFIG_FILE):
+    def copy_state(self):
+        # -> (values, slots, bindings), private copies of the live state
+        with self.lock:
+            return dict(self.values), [dict(sc) for sc in self.slots], [dict(b) for b in self.bindings]
+
+    def use_state(self, values, slots, bindings, snap, profile=None, blocking=True):
+        # Switch to a state whose snapshot was built ahead of time (PROFILES):
+        # reference swaps and shallow copies only, nothing is parsed or compiled.
+        # blocking=False (tick thread): returns False if the lock is busy.
+        if not self.lock.acquire(blocking): return False
         try:
-            with self.lock:
-                data = {"values": self.values, "bindings": self.bindings}
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2)
-            log("Config saved.")
+            self.values = dict(values)
+            self.slots = [dict(sc) for sc in slots]
+            self.bindings = [dict(b) for b in bindings]
+            self._compiled = {tuple(sorted(b.items())): cb for b, cb in zip(bindings, snap.compiled)}
+            self.snap = snap.with_version(self.snap.version + 1)
+            self._published = self._staged   # snapshots still being built are older than this
+            self.profile = profile
+            self.notify(*CONFIG_TOPICS, "profile")
+        finally:
+            self.lock.release()
+        return True
+
+    def swap_snap(self, snap):
+        # Lock-free, for the tick thread: a prebuilt snapshot goes live ahead of
+        # the use_state() that brings the writer-side state along.
+        self._published = self._staged
+        self.snap = snap.with_version(self.snap.version + 1)
+
+    def save(self, path=None, quiet=False):
+        # copy under the lock, serialize and write outside it
+        path = path or self.path
+        try:
+            with self.save_lock:
+                with self.lock:
+                    data = {"values": dict(self.values), "bindings": dict(self.bindings[0]),
+                            "slots": [dict(self.slots[i], bindings=dict(self.bindings[i])) for i in range(MAX_SLOTS)]}
+                write_json_atomic(path, data)
+            if not quiet: log(f"Config saved to '{path}'.")
         except Exception as e:
             log(f"Error saving config: {e}")
 
     # --- bindings-only save/load ---
-    def save_bindings_only(self, path:str):
+    def save_bindings_only(self, path:str, slot=0):
         try:
             with self.lock:
-                data = {"bindings": self.bindings}
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2)
+                data = {"bindings": dict(self.bindings[slot])}
+            write_json_atomic(path, data)
             log(f"Bindings saved to '{path}'.")
         except Exception as e:
             log(f"Error saving bindings: {e}")
 
-    def load_bindings_only(self, path:str):
+    def load_bindings_only(self, path:str, slot=0):
         try:
             if not os.path.isfile(path):
                 log(f"Bindings file not found: '{path}'")
                 return
             with open(path, "r", encoding="utf-8") as f:
                 data = json.load(f)
-            loaded = data.get("bindings", {})
             with self.lock:
-                for k,v in loaded.items():
-                    if isinstance(v, list) and len(v)==2:
-                        self.bindings[k] = (v[0], int(v[1]))
-            log(f"Bindings loaded from '{path}'.")
+                bad = _update_bindings(self.bindings[slot], data.get("bindings", {}))
+                staged = self._stage()
+            self._publish(staged, "bindings")
+            if bad:
+                log(f"Bindings: ignored invalid entries: {', '.join(bad)}")
+            log(f"Bindings loaded from '{path}' into slot {slot+1}.")
         except Exception as e:
             log(f"Error loading bindings: {e}")
 
@@ -260,47 +1697,52 @@ class Config:
     def reset_to_defaults(self, delete_config_file=True):
         with self.lock:
             self.values = dict(DEFAULTS)
-            self.bindings = dict(DEFAULT_BINDINGS)
+            self.slots = [default_slot(i) for i in range(MAX_SLOTS)]
+            self.bindings = [default_bindings(i) for i in range(MAX_SLOTS)]
             self.rebind_target = None
             self.rebind_deadline = 0.0
-        if delete_config_file and os.path.isfile(CONFIG_FILE):
+            self.profile = None
+            staged = self._stage()
+        self._publish(staged)
+        self.notify("profile")
+        if delete_config_file and os.path.isfile(self.path):
             try:
-                os.remove(CONFIG_FILE)
+                os.remove(self.path)
                 log("Deleted existing config file.")
             except Exception as e:
                 log(f"Could not delete config file: {e}")
-        self.save(CONFIG_FILE)
+        self.save()
         log("Reset to defaults completed.")
 
-    def begin_rebind(self, action:str, seconds=5):
+    def begin_rebind(self, action:str, slot=0, seconds=5):
         with self.lock:
-            self.rebind_target = action
             self.rebind_deadline = time.time() + seconds
+            self.rebind_target = (slot, action)
+            self.notify("rebind")
 
     def cancel_rebind(self):
         with self.lock:
             self.rebind_target = None
             self.rebind_deadline = 0.0
+            self.notify("rebind")
 
 config = Config()
-config.load()
 
 # ------------------------------ DSU PROTOCOL ------------------------------
 
 PROTOCOL = 1001
 MAGIC_S = b"DSUS"
 MAGIC_C = b"DSUC"
-SLOT = 0
+STATE_DISCONNECTED = 0
 STATE_CONNECTED = 2
 MODEL_FULL_GYRO = 2
 CONN_BT = 2
-MAC = random.randrange(1<<48).to_bytes(6, "big")
+
+def random_mac():
+    return random.randrange(1<<48).to_bytes(6, "big")
 BAT_FULL = 0x05
 G = 9.81
 
-def frames_for_ms(ms, hz):
-    return max(2, int(hz * (ms/1000.0)))
-
 def pack_header(msg_type, payload, server_id=0x12345678):
     base = struct.pack("<4sHHI", MAGIC_S, PROTOCOL, len(payload)+4, 0) + struct.pack("<I", server_id) + struct.pack("<I", msg_type)
     crc = zlib.crc32(base[:8] + b"\x00\x00\x00\x00" + base[12:] + payload) & 0xFFFFFFFF
@@ -310,13 +1752,55 @@ def resp_version():
     payload = struct.pack("<H", PROTOCOL)
     return pack_header(0x100000, payload)
 
-def common_begin():
-    return struct.pack("<BBBB6sB", SLOT, STATE_CONNECTED, MODEL_FULL_GYRO, CONN_BT, MAC, BAT_FULL)
+def common_begin(slot, mac, connected=True):
+    if not connected:
+        return struct.pack("<BBBB6sB", slot, STATE_DISCONNECTED, 0, 0, b"\x00"*6, 0)
+    return struct.pack("<BBBB6sB", slot, STATE_CONNECTED, MODEL_FULL_GYRO, CONN_BT, mac, BAT_FULL)
 
-def resp_list_ports():
-    payload = common_begin() + b"\x01"
+def resp_port_info(slot, mac, connected=True):
+    payload = common_begin(slot, mac, connected) + b"\x01"
     return pack_header(0x100001, payload)
 
+def parse_port_request(data):
+    # 0x100001: int32 count, then one byte per requested slot
+    if len(data) < 24: return ()
+    n = max(0, min(MAX_SLOTS, struct.unpack_from("<i", data, 20)[0]))
+    return tuple(b for b in data[24:24+n] if b < MAX_SLOTS)
+
+# Data packet (0x100002) layout, offsets into the full 100-byte datagram:
+#   0 header (magic, protocol, length, crc, server id)   16 msg type
+#  20 slot/state/model/conn/mac/battery   31 is_active   32 packet num
+#  36 0x00   37 face   38 ps   39 touch   40 LX LY RX RY   44 analog (12x 0)
+#  56 finger 1   62 finger 2   68 timestamp   76 accel   88 gyro   100 end
+DATA_PKT_SIZE = 100
+_HDR_STRUCT    = struct.Struct("<4sHHIII")
+_COMMON_STRUCT = struct.Struct("<BBBB6sBB")
+_BTN_STRUCT    = struct.Struct("<IxBBBBB")
+_F1_STRUCT     = struct.Struct("<BBHH")
+_MOTION_STRUCT = struct.Struct("<Qffffff")
+_CRC_STRUCT    = struct.Struct("<I")
+
+class DataPacketEncoder:
+    # One preallocated datagram per slot; static fields are written once and
+    # every encode() only patches the changing fields and the CRC in place.
+    # The returned buffer is reused: send it before the next encode().
+    __slots__ = ("buf",)
+    def __init__(self, slot, mac, server_id=0x12345678):
+        self.buf = bytearray(DATA_PKT_SIZE)
+        _HDR_STRUCT.pack_into(self.buf, 0, MAGIC_S, PROTOCOL, DATA_PKT_SIZE - 16, 0, server_id, 0x100002)
+        _COMMON_STRUCT.pack_into(self.buf, 20, slot, STATE_CONNECTED, MODEL_FULL_GYRO, CONN_BT, mac, BAT_FULL, 1)
+        self.buf[42] = 0x80; self.buf[43] = 0x80   # RX, RY centered
+        # analog block (44..55) and finger 2 (62..67) stay zeroed
+
+    def encode(self, idx, face, ps, active, lx, ly, tx, ty, ts_us, ax, ay, az, gx, gy, gz):
+        buf = self.buf
+        _BTN_STRUCT.pack_into(buf, 32, idx & 0xFFFFFFFF, face, ps, 1 if active else 0, lx, ly)
+        _F1_STRUCT.pack_into(buf, 56, 1 if active else 0, 1, tx, ty)
+        _MOTION_STRUCT.pack_into(buf, 68, ts_us, ax, ay, az, gx, gy, gz)
+        _CRC_STRUCT.pack_into(buf, 8, 0)
+        _CRC_STRUCT.pack_into(buf, 8, zlib.crc32(buf) & 0xFFFFFFFF)
+        return buf
+
 # ------------------------------ INPUT HELPERS ------------------------------
 
 def binding_name(b):
@@ -328,31 +1812,75 @@ def binding_name(b):
         return XBTN_NAME.get(code, f"XBTN_{code}")
     return "?"
 
-def is_binding_down(b, xinput_state):
-    if not b: return False
-    kind, code = b
-    if kind == BIND_VK:
-        return (GetAsyncKeyState(code) & 0x8000) != 0
-    elif kind == BIND_XBTN:
-        if xinput_state is None: return False
-        return (xinput_state.Gamepad.wButtons & code) != 0
-    return False
-
-def scan_next_pressed(xinput_state):
-    # Keyboard: scan VKs
-    for vk in range(0x08, 0xFE):
+# Keys a rebind may capture (0x01..0x07 are mouse buttons / cancel)
+CAPTURE_VK_MASK = sum(1 << vk for vk in range(0x08, 0xFE))
+
+class RebindCapture:
+    # Rebind capture on its own short-lived thread, never on the tick path.
+    # Only *new* presses count: whatever is already held when the capture
+    # starts is the baseline. Key-downs arrive straight from the keyboard hook
+    # when the backend has one; otherwise (and for XInput buttons, which have
+    # no events) the thread diffs backend.capture_state() every `interval`
+    # seconds. That read has its own buffers and is never recorded, so the
+    # tick thread's reads and the recorded session are left alone.
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self._token = 0
+        self._hooked = deque()
+
+    def start(self, slot, action, seconds=5):
+        config.begin_rebind(action, slot, seconds)
+        self._token += 1
+        self._hooked.clear()
+        threading.Thread(target=self._run, args=(slot, action, self._token),
+                         daemon=True, name="vwiimote-rebind").start()
+
+    def cancel(self):
+        self._token += 1
+        config.cancel_rebind()
+
+    def _on_hook_press(self, vk):
+        if (CAPTURE_VK_MASK >> vk) & 1: self._hooked.append(vk)
+
+    def _run(self, slot, action, token):
+        be = backend
+        inner = be
+        while not hasattr(inner, "hook") and hasattr(inner, "inner"):
+            inner = inner.inner    # under the recorder / sampler
+        hook = getattr(inner, "hook", None)
+        if hook is not None: hook.on_press = self._on_hook_press
         try:
-            if GetAsyncKeyState(vk) & 0x8000:
-                return (BIND_VK, vk)
-        except Exception:
-            pass
-    # XInput buttons
-    if xinput_state is not None:
-        w = xinput_state.Gamepad.wButtons
-        if w:
-            for _,mask in XBTN.items():
-                if (w & mask): return (BIND_XBTN, mask)
-    return None
+            pad_idx = config.snap.pads[slot]
+            prev = be.capture_state(CAPTURE_VK_MASK, pad_idx)
+            while token == self._token and config.rebind_target == (slot, action):
+                got = None
+                if self._hooked:
+                    got = (BIND_VK, self._hooked.popleft())
+                else:
+                    cur = be.capture_state(CAPTURE_VK_MASK, pad_idx)
+                    new = cur[0] & ~prev[0]
+                    if new:
+                        got = (BIND_VK, (new & -new).bit_length() - 1)
+                    else:
+                        new = cur[1] & ~prev[1]
+                        if new:
+                            got = (BIND_XBTN, new & -new)
+                    prev = cur
+                if got:
+                    config.set_binding(slot, action, got)
+                    config.cancel_rebind()
+                    log(f"Rebind slot {slot+1} '{action}' -> {binding_name(got)}")
+                    return
+                if time.time() > config.rebind_deadline:
+                    config.cancel_rebind()
+                    log(f"Rebind slot {slot+1} '{action}' canceled (timeout).")
+                    return
+                time.sleep(self.interval)
+        finally:
+            if hook is not None and hook.on_press == self._on_hook_press:
+                hook.on_press = None
+
+rebind = RebindCapture()
 
 def norm_axis(v, dz):
     v = int(v)
@@ -361,313 +1889,1479 @@ def norm_axis(v, dz):
     sign = 1.0 if v > 0 else -1.0
     return sign * (abs(v) - dz) / (32767.0 - dz)
 
+# ------------------------------ SUBSCRIBERS ------------------------------
+
+REG_ALL, REG_SLOT, REG_MAC = 0, 1, 2   # 0x100002 request flags
+
+class Subscriber:
+    __slots__ = ("addr","send","seen","sent","next_send")
+    def __init__(self, addr, send):
+        self.addr = addr
+        self.send = send               # sendto of the socket the request came in on
+        self.seen = [None]*MAX_SLOTS   # last request time per slot (None = never asked)
+        self.sent = [0]*MAX_SLOTS      # packet number last sent per slot (delta / rate limit)
+        self.next_send = [0.0]*MAX_SLOTS
+
+class SubscriberRegistry:
+    # Per-(addr, slot) registrations that lapse after `timeout` seconds without a
+    # re-request. Fan-out reads the cached per-slot target tuples, which are only
+    # rebuilt when coverage changes or something expires. Subscribers are keyed
+    # by (send, addr): the same client on two endpoints is two subscribers, each
+    # answered from the socket it asked on.
+    def __init__(self, timeout=5.0):
+        self.timeout = timeout
+        self.subs = {}
+        self.targets = [() for _ in range(MAX_SLOTS)]
+        self.next_expiry = float("inf")
+
+    def __len__(self):
+        return len(self.subs)
+
+    def register(self, data, addr, send, slot_macs, now):
+        # data: raw 0x100002 request -> flags u8 @20, slot u8 @21, mac 6s @22
+        if len(data) < 28: return False
+        flags, req_slot = data[20], data[21]
+        if flags & REG_SLOT:
+            wanted = (req_slot,) if req_slot < MAX_SLOTS else ()
+        elif flags & REG_MAC:
+            mac = bytes(data[22:28])
+            wanted = tuple(i for i,m in enumerate(slot_macs) if m == mac)
+        else:
+            wanted = range(MAX_SLOTS)
+        key = (send, addr)
+        sub = self.subs.get(key)
+        is_new = sub is None
+        if is_new and not wanted:
+            # e.g. a MAC from before our restart (MACs are random per run):
+            # nothing would ever expire it
+            return False
+        if is_new:
+            sub = self.subs[key] = Subscriber(addr, send)
+        changed = is_new
+        for i in wanted:
+            if sub.seen[i] is None: changed = True
+            sub.seen[i] = now
+        if changed:
+            self._rebuild()
+        return is_new
+
+    def remove(self, key):
+        if self.subs.pop(key, None) is not None:
+            self._rebuild()
+
+    def expire(self, now):
+        if now < self.next_expiry: return ()
+        gone = []
+        limit = now - self.timeout
+        for key,sub in tuple(self.subs.items()):
+            seen = sub.seen
+            for i in range(MAX_SLOTS):
+                if seen[i] is not None and seen[i] < limit:
+                    seen[i] = None
+            if all(t is None for t in seen):
+                del self.subs[key]
+                gone.append(key)
+        self._rebuild()
+        return gone
+
+    def _rebuild(self):
+        targets = [[] for _ in range(MAX_SLOTS)]
+        oldest = float("inf")
+        for key,sub in self.subs.items():
+            for i,t in enumerate(sub.seen):
+                if t is not None:
+                    targets[i].append(key)
+                    if t < oldest: oldest = t
+        self.targets = [tuple(t) for t in targets]
+        self.next_expiry = oldest + self.timeout
+
+# ------------------------------ STATS ------------------------------
+# Always-on tick instrumentation. Everything is preallocated; the tick thread
+# only bumps integers, the GUI/export side reads them without locking.
+
+class Histogram:
+    # Bucket b counts samples in [2^(b-1), 2^b) microseconds; bucket 0 is < 1 us
+    # and the last bucket is open-ended (>= ~0.5 s).
+    NBUCKETS = 21
+    __slots__ = ("counts","n","sum_us","max_us")
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.counts = [0]*self.NBUCKETS
+        self.n = 0
+        self.sum_us = 0
+        self.max_us = 0
+
+    def add(self, us:int):
+        if us < 0: us = 0
+        b = us.bit_length()
+        self.counts[b if b < self.NBUCKETS else self.NBUCKETS-1] += 1
+        self.n += 1
+        self.sum_us += us
+        if us > self.max_us: self.max_us = us
+
+    def percentile(self, p:float)->int:
+        # upper edge of the bucket holding the p-th percentile, in us
+        if not self.n: return 0
+        want = self.n * p / 100.0
+        acc = 0
+        for b,c in enumerate(self.counts):
+            acc += c
+            if acc >= want:
+                return min(1 << b, self.max_us) if b else 0
+        return self.max_us
+
+    def to_dict(self):
+        return {"n": self.n, "mean_us": (self.sum_us / self.n) if self.n else 0.0,
+                "p50_us": self.percentile(50), "p90_us": self.percentile(90),
+                "p99_us": self.percentile(99), "max_us": self.max_us,
+                "buckets_le_us": [1 << b for b in range(self.NBUCKETS)],
+                "counts": list(self.counts)}
+
+class ServerStats:
+    HISTOGRAMS = ("lateness", "encode", "send", "input_age", "input_latency")
+    COUNTERS = ("ticks", "missed_ticks", "packets_sent", "packets_suppressed", "send_errors", "rx_drained", "rx_dropped")
+    def __init__(self):
+        self.lateness = Histogram()   # how late each tick fired vs. its deadline
+        self.encode = Histogram()     # resp_data() per slot
+        self.send = Histogram()       # sendto fan-out per slot
+        self.input_age = Histogram()  # sampler: input sample age when the tick reads it
+        self.input_latency = Histogram()   # tracing: input change seen -> first sendto carrying it
+        self.reset()
+
+    def reset(self):
+        for h in self.HISTOGRAMS: getattr(self, h).reset()
+        for c in self.COUNTERS: setattr(self, c, 0)
+        self.since = time.time()
+
+    def to_dict(self):
+        d = {"since": self.since, "uptime_s": time.time() - self.since}
+        for c in self.COUNTERS: d[c] = getattr(self, c)
+        for h in self.HISTOGRAMS: d[h] = getattr(self, h).to_dict()
+        return d
+
+    def to_json(self, path=None):
+        text = json.dumps(self.to_dict(), indent=2)
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+    def suppression_ratio(self):
+        # share of (subscriber, tick) packets skipped by delta mode / rate limit
+        total = self.packets_sent + self.packets_suppressed
+        return self.packets_suppressed / total if total else 0.0
+
+    def summary(self):
+        L, E, S, A, T = self.lateness, self.encode, self.send, self.input_age, self.input_latency
+        return (f"ticks {self.ticks}  missed {self.missed_ticks}  sent {self.packets_sent}  send errors {self.send_errors}\n"
+                f"suppressed {self.packets_suppressed} ({self.suppression_ratio()*100:.1f}%)\n"
+                f"rx {self.rx_drained}  dropped {self.rx_dropped}\n"
+                f"late   p50 {L.percentile(50)} us  p99 {L.percentile(99)} us  max {L.max_us} us\n"
+                f"encode p50 {E.percentile(50)} us  p99 {E.percentile(99)} us  max {E.max_us} us\n"
+                f"send   p50 {S.percentile(50)} us  p99 {S.percentile(99)} us  max {S.max_us} us"
+                + (f"\ninput  p50 {A.percentile(50)} us  p99 {A.percentile(99)} us  max {A.max_us} us" if A.n else "")
+                + (f"\ntrace  p50 {T.percentile(50)} us  p99 {T.percentile(99)} us  max {T.max_us} us" if T.n else ""))
+
+stats = ServerStats()
+
+# ------------------------------ SCHEDULER ------------------------------
+# Deadlines live on the perf_counter() timeline. wait(socks) blocks until the
+# next deadline or until a socket is readable and returns the readable ones;
+# advance(now) moves to the next deadline according to the catch-up policy and
+# returns how many ticks were dropped.
+#   skip    - drop missed ticks and stay on the original grid (previous behaviour)
+#   burst   - emit missed ticks back-to-back (at most max_burst), then skip the rest
+#   stretch - restart the grid one period after the late tick
+
+SCHED_STRATEGIES = ["select", "hybrid", "timerfd"]
+SCHED_CATCHUP = ["skip", "burst", "stretch"]
+
+class TickScheduler:
+    name = "select"
+    def __init__(self, hz, catchup="skip", max_burst=4):
+        self.catchup = catchup if catchup in SCHED_CATCHUP else "skip"
+        self.max_burst = max_burst
+        self.set_hz(hz)
+
+    def set_hz(self, hz):
+        self.hz = max(1, int(hz))
+        self.period = 1.0 / self.hz
+        self.next_tick = time.perf_counter() + self.period
+
+    def due(self, now):
+        return now >= self.next_tick
+
+    def advance(self, now):
+        period = self.period
+        missed = int((now - self.next_tick) / period)
+        if self.catchup == "burst":
+            if missed > self.max_burst:
+                self.next_tick += (missed - self.max_burst) * period
+                missed -= self.max_burst
+            else:
+                missed = 0
+            self.next_tick += period
+        elif self.catchup == "stretch":
+            self.next_tick = now + period
+        else:
+            self.next_tick += (missed + 1) * period
+        return missed
+
+    def _select(self, socks, timeout):
+        if not socks:
+            if timeout > 0: time.sleep(timeout)
+            return []
+        try:
+            return select.select(socks, [], [], timeout)[0]
+        except OSError:
+            return []
+
+    def wait(self, socks):
+        return self._select(socks, max(0.0, self.next_tick - time.perf_counter()))
+
+    def close(self): pass
+
+class HybridScheduler(TickScheduler):
+    # Block in select() until spin_us before the deadline, then busy-wait on
+    # perf_counter(). Trades a little CPU for sub-ms deadline accuracy without
+    # depending on the OS timer resolution.
+    name = "hybrid"
+    def __init__(self, hz, catchup="skip", spin_us=1000, **kw):
+        self.spin = max(0, spin_us) / 1e6
+        super().__init__(hz, catchup, **kw)
+
+    def wait(self, socks):
+        deadline = self.next_tick
+        coarse = deadline - self.spin - time.perf_counter()
+        if coarse > 0:
+            r = self._select(socks, coarse)
+            if r: return r
+        while time.perf_counter() < deadline:
+            pass
+        return []
+
+class _timespec(Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+class _itimerspec(Structure):
+    _fields_ = [("it_interval", _timespec), ("it_value", _timespec)]
+
+class TimerfdScheduler(TickScheduler):
+    # Linux: absolute CLOCK_MONOTONIC deadline armed on a timerfd that is
+    # select()ed together with the sockets, so the kernel's hrtimer wakes the
+    # loop exactly at the deadline (no relative-timeout drift).
+    name = "timerfd"
+    CLOCK_MONOTONIC = 1
+    TFD_TIMER_ABSTIME = 1
+    TFD_NONBLOCK_CLOEXEC = 0o4000 | 0o2000000
+    def __init__(self, hz, catchup="skip", **kw):
+        if not hasattr(time, "CLOCK_MONOTONIC"):
+            raise OSError("timerfd scheduler needs Linux")
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self._libc.timerfd_create(self.CLOCK_MONOTONIC, self.TFD_NONBLOCK_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "timerfd_create failed")
+        # perf_counter -> CLOCK_MONOTONIC offset (zero on Linux, measured anyway)
+        self._offset_ns = time.clock_gettime_ns(time.CLOCK_MONOTONIC) - time.perf_counter_ns()
+        self._spec = _itimerspec()
+        self._armed = None
+        super().__init__(hz, catchup, **kw)
+
+    def _arm(self, deadline):
+        ns = int(deadline * 1e9) + self._offset_ns
+        v = self._spec.it_value
+        v.tv_sec, v.tv_nsec = divmod(ns, 1_000_000_000)
+        if self._libc.timerfd_settime(self.fd, self.TFD_TIMER_ABSTIME, byref(self._spec), None) != 0:
+            raise OSError(ctypes.get_errno(), "timerfd_settime failed")
+        self._armed = deadline
+
+    def wait(self, socks):
+        deadline = self.next_tick
+        if self._armed != deadline:
+            self._arm(deadline)
+        r = self._select(list(socks) + [self.fd], None if time.perf_counter() < deadline else 0)
+        if self.fd in r:
+            try: os.read(self.fd, 8)
+            except BlockingIOError: pass
+            r.remove(self.fd)
+        return r
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd); self.fd = -1
+
+_SCHEDULERS = {"select": TickScheduler, "hybrid": HybridScheduler, "timerfd": TimerfdScheduler}
+
+def make_scheduler(strategy, hz, catchup="skip", spin_us=1000):
+    cls = _SCHEDULERS.get(strategy, TickScheduler)
+    kw = {"spin_us": spin_us} if cls is HybridScheduler else {}
+    try:
+        return cls(hz, catchup, **kw)
+    except OSError as e:
+        log(f"Scheduler '{strategy}' unavailable ({e}); using select.")
+        return TickScheduler(hz, catchup)
+
+# ------------------------------ IMU ------------------------------
+# Orientation of the virtual controller as a unit quaternion (controller ->
+# world), integrated from the synthesized gyro. Gyro axes are the accel axes
+# (right-handed, deg/s); gravity reads (0, 0, G) at neutral, as before.
+# Returning to neutral is itself a rotation reported on the gyro, so a game
+# fusing accel and gyro always sees the two agree.
+
+class Orientation:
+    __slots__ = ("w","x","y","z","ax","ay","az","recentering")
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.w = 1.0; self.x = 0.0; self.y = 0.0; self.z = 0.0
+        self.ax = 0.0; self.ay = 0.0; self.az = G
+        self.recentering = False
+
+    def recenter_rate(self, max_dps, dt):
+        # gyro (deg/s, controller frame) that rotates toward neutral this tick,
+        # capped at max_dps; (0, 0, 0) once there (recentering ends)
+        w, x, y, z = self.w, self.x, self.y, self.z
+        if w < 0.0: w, x, y, z = -w, -x, -y, -z   # shortest way back
+        s = math.sqrt(x*x + y*y + z*z)
+        if s < 1e-9:
+            self.recentering = False
+            return 0.0, 0.0, 0.0
+        angle = 2.0 * math.atan2(s, w)
+        rate = min(math.radians(max_dps), angle / dt)
+        k = -math.degrees(rate) / s
+        return x * k, y * k, z * k
+
+    def step(self, gx, gy, gz, dt):
+        # q <- q * exp(omega dt / 2): exact for a rate held over the tick
+        rx = math.radians(gx); ry = math.radians(gy); rz = math.radians(gz)
+        n = math.sqrt(rx*rx + ry*ry + rz*rz)
+        if n > 0.0:
+            h = 0.5 * n * dt
+            c = math.cos(h); k = math.sin(h) / n
+            bx = rx * k; by = ry * k; bz = rz * k
+            w, x, y, z = self.w, self.x, self.y, self.z
+            w, x, y, z = (w*c - x*bx - y*by - z*bz,
+                          w*bx + x*c + y*bz - z*by,
+                          w*by - x*bz + y*c + z*bx,
+                          w*bz + x*by - y*bx + z*c)
+            inv = 1.0 / math.sqrt(w*w + x*x + y*y + z*z)
+            self.w = w*inv; self.x = x*inv; self.y = y*inv; self.z = z*inv
+        # gravity in the controller frame: third row of R(q)
+        w, x, y, z = self.w, self.x, self.y, self.z
+        self.ax = G * 2.0 * (x*z - w*y)
+        self.ay = G * 2.0 * (y*z + w*x)
+        self.az = G * (1.0 - 2.0 * (x*x + y*y))
+
+def integrate_gyro_batch(gyro_dps, dt, q0=(1.0, 0.0, 0.0, 0.0)):
+    # Offline counterpart of Orientation.step over a whole recording:
+    # gyro_dps is N x 3 (deg/s per tick), returns the N x 3 gravity accel each
+    # tick would report. The per-tick rotations and the gravity projection are
+    # vectorized with NumPy when available; only the quaternion product chain
+    # is a sequential scan.
+    if load_numpy() is None:
+        o = Orientation()
+        o.w, o.x, o.y, o.z = q0
+        out = []
+        for gx, gy, gz in gyro_dps:
+            o.step(gx, gy, gz, dt)
+            out.append((o.ax, o.ay, o.az))
+        return out
+    r = np.radians(np.asarray(gyro_dps, dtype=np.float64).reshape(-1, 3))
+    n = np.linalg.norm(r, axis=1)
+    h = 0.5 * n * dt
+    k = np.divide(np.sin(h), n, out=np.zeros_like(n), where=n > 0)
+    dq = np.empty((len(r), 4))
+    dq[:, 0] = np.cos(h)
+    dq[:, 1:] = r * k[:, None]
+    q = np.empty_like(dq)
+    w, x, y, z = q0
+    for i, (c, bx, by, bz) in enumerate(dq.tolist()):
+        w, x, y, z = (w*c - x*bx - y*by - z*bz,
+                      w*bx + x*c + y*bz - z*by,
+                      w*by - x*bz + y*c + z*bx,
+                      w*bz + x*by - y*bx + z*c)
+        inv = 1.0 / math.sqrt(w*w + x*x + y*y + z*z)
+        w *= inv; x *= inv; y *= inv; z *= inv
+        q[i] = (w, x, y, z)
+    w, x, y, z = q.T
+    return np.stack((G * 2.0 * (x*z - w*y), G * 2.0 * (y*z + w*x), G * (1.0 - 2.0 * (x*x + y*y))), axis=1)
+
+# ------------------------------ POINTER FILTERS ------------------------------
+# Float in, float out, one filter per slot. step(x, y, dt) updates .x/.y; the
+# caller rounds only when packing, so sub-pixel motion is never lost. With
+# lead > 0 the output is pushed ahead along the filtered velocity to cancel
+# known pipeline latency (Cemu + display), at the cost of some overshoot.
+
+def _alpha(cutoff_hz, dt):
+    r = 2.0 * math.pi * cutoff_hz * dt
+    return r / (r + 1.0)
+
+class PointerFilter:
+    name = "none"
+    __slots__ = ("x","y","fx","fy","vx","vy","lead","d_cutoff")
+    def __init__(self, lead=0.0, d_cutoff=5.0, **kw):
+        self.lead = lead
+        self.d_cutoff = d_cutoff
+        self.reset(0.0, 0.0)
+
+    def reset(self, x, y):
+        self.x = self.fx = x
+        self.y = self.fy = y
+        self.vx = self.vy = 0.0
+
+    def _filter(self, x, y, dt):
+        self.fx = x; self.fy = y
+
+    def step(self, x, y, dt):
+        px, py = self.fx, self.fy
+        self._filter(x, y, dt)
+        if self.lead:
+            a = _alpha(self.d_cutoff, dt)
+            self.vx += a * ((self.fx - px) / dt - self.vx)
+            self.vy += a * ((self.fy - py) / dt - self.vy)
+            self.x = self.fx + self.vx * self.lead
+            self.y = self.fy + self.vy * self.lead
+        else:
+            self.x = self.fx; self.y = self.fy
+
+class EmaFilter(PointerFilter):
+    # the classic fixed-factor smoothing (previously done on ints)
+    name = "ema"
+    __slots__ = ("alpha",)
+    def __init__(self, alpha=0.3, **kw):
+        self.alpha = alpha
+        super().__init__(**kw)
+
+    def _filter(self, x, y, dt):
+        a = self.alpha
+        self.fx += a * (x - self.fx)
+        self.fy += a * (y - self.fy)
+
+class OneEuroFilter(PointerFilter):
+    # Casiez et al. 2012: the cutoff rises with speed, so the pointer is
+    # steady at rest and lags little when it moves.
+    name = "one_euro"
+    __slots__ = ("min_cutoff","beta","rx","ry","dx","dy")
+    def __init__(self, min_cutoff=1.0, beta=0.02, **kw):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        super().__init__(**kw)
+
+    def reset(self, x, y):
+        super().reset(x, y)
+        self.rx = x; self.ry = y
+        self.dx = self.dy = 0.0
+
+    def _filter(self, x, y, dt):
+        ad = _alpha(self.d_cutoff, dt)
+        self.dx += ad * ((x - self.rx) / dt - self.dx)
+        self.dy += ad * ((y - self.ry) / dt - self.dy)
+        self.rx = x; self.ry = y
+        speed = math.sqrt(self.dx * self.dx + self.dy * self.dy)
+        a = _alpha(self.min_cutoff + self.beta * speed, dt)
+        self.fx += a * (x - self.fx)
+        self.fy += a * (y - self.fy)
+
+POINTER_FILTERS = {"none": PointerFilter, "ema": EmaFilter, "one_euro": OneEuroFilter}
+
+def make_pointer_filter(key):
+    # key: ConfigSnapshot.pointer_filter
+    kind, alpha, min_cutoff, beta, d_cutoff, lead = key
+    cls = POINTER_FILTERS.get(kind, EmaFilter)
+    return cls(alpha=alpha, min_cutoff=min_cutoff, beta=beta, d_cutoff=d_cutoff, lead=lead)
+
 # ------------------------------ SERVER ------------------------------
 
 class State:
-    __slots__ = ("idx","tx_prev","ty_prev","offscreen",
+    __slots__ = ("idx","px","py","pf","pf_key","offscreen",
                  "prev_w","prev_e","dir_w","dir_e",
-                 "w_pulse_left","e_pulse_left","w_cooldown","e_cooldown",
-                 "last_toggle_us")
-    def __init__(self):
+                 "w_phase","e_phase","imu","trace_sig","trace_ns",
+                 "last_toggle_us","macro","macro_i","prev_macro",
+                 "slot","mac","enc","sent_state","sent_us")
+    def __init__(self, slot=0, mac=None):
         self.idx = 0
-        self.tx_prev = None
-        self.ty_prev = None
+        self.px = None            # raw pointer position (float, touchpad units)
+        self.py = None
+        self.pf = None            # PointerFilter, rebuilt when its settings change
+        self.pf_key = None
         self.offscreen = False
         self.prev_w = False
         self.prev_e = False
         self.dir_w = 1.0
         self.dir_e = 1.0
-        self.w_pulse_left = 0
-        self.e_pulse_left = 0
-        self.w_cooldown = 0
-        self.e_cooldown = 0
+        self.w_phase = 0
+        self.e_phase = 0
+        self.imu = Orientation()
+        self.trace_sig = None     # tracing: last (actions, raw pointer) seen
+        self.trace_ns = None      # tracing: when the oldest unsent input change was read
         self.last_toggle_us = 0
+        self.macro = None         # timeline being played (MACROS)
+        self.macro_i = 0
+        self.prev_macro = 0       # macro trigger bits last tick
+        self.slot = slot
+        self.mac = mac or random_mac()
+        self.enc = DataPacketEncoder(slot, self.mac)
+        self.sent_state = None   # logical state of the last encoded packet (delta mode)
+        self.sent_us = 0
 
-def resp_data(st: State):
-    with config.lock:
-        vals = dict(config.values)
-        binds = dict(config.bindings)
+def resp_data(st: State, keepalive_us=0):
+    # keepalive_us > 0 is delta mode: returns None (nothing encoded) while the
+    # logical state matches the last packet and that packet is younger than
+    # keepalive_us. A keepalive re-encodes with a fresh timestamp.
+    snap = config.snap
 
-    hz = max(1, int(vals["hz"]))
-    smooth = float(vals["smooth"])
+    hz = snap.hz
 
-    st.idx += 1
-    xi = xinput_get_state(0)
+    xi = backend.pad(snap.pads[st.slot])
 
     # ----- Pointer (touch) -----
-    tpad_w = int(vals["tpad_w"]); tpad_h = int(vals["tpad_h"])
-    pointer_source = vals.get("pointer_source","mouse")
+    tpad_w = snap.tpad_w; tpad_h = snap.tpad_h
+    pointer_source = snap.pointer_sources[st.slot]
 
     if pointer_source == "mouse":
-        w, h = screen_size()
-        mx, my = mouse_pos()
-        if vals["invert_y"]:
+        w, h = backend.screen_size()
+        mx, my = backend.cursor_pos()
+        if snap.invert_y:
             my = h - 1 - my
-        tx_raw = int(max(0, min(tpad_w-1, mx * (tpad_w-1) // max(1, w-1))))
-        ty_raw = int(max(0, min(tpad_h-1, my * (tpad_h-1) // max(1, h-1))))
+        px = max(0.0, min(tpad_w-1, mx * (tpad_w-1) / max(1, w-1)))
+        py = max(0.0, min(tpad_h-1, my * (tpad_h-1) / max(1, h-1)))
     else:
-        # Stick-relative pointer
-        dz = int(vals["stick_deadzone"])
-        spx = float(vals["cursor_speed_px_s"])
+        # Stick-relative pointer, integrated in float so slow sticks still move
+        dz = snap.deadzone
+        spx = snap.cursor_speed
         ax_x = 0; ax_y = 0
         if xi is not None:
             if pointer_source == "xinput_rs":
-                ax_x = xi.Gamepad.sThumbRX
-                ax_y = xi.Gamepad.sThumbRY
+                ax_x = xi.rx
+                ax_y = xi.ry
             else:
-                ax_x = xi.Gamepad.sThumbLX
-                ax_y = xi.Gamepad.sThumbLY
+                ax_x = xi.lx
+                ax_y = xi.ly
         nx = norm_axis(ax_x, dz)
         ny = norm_axis(ax_y, dz)
-        if vals["invert_y"]:
+        if snap.invert_y:
             ny = -ny
-        px = spx / hz
-        move_x = nx * px
-        move_y = -ny * px  # up is negative
-        if st.tx_prev is None:
-            st.tx_prev, st.ty_prev = tpad_w // 2, tpad_h // 2
-        tx_raw = int(max(0, min(tpad_w-1, (st.tx_prev if st.tx_prev is not None else 0) + move_x)))
-        ty_raw = int(max(0, min(tpad_h-1, (st.ty_prev if st.ty_prev is not None else 0) + move_y)))
-
-    if st.tx_prev is None:
-        tx, ty = tx_raw, ty_raw
+        step = spx / hz
+        if st.px is None:
+            st.px, st.py = tpad_w / 2, tpad_h / 2
+        px = max(0.0, min(tpad_w-1, st.px + nx * step))
+        py = max(0.0, min(tpad_h-1, st.py - ny * step))   # up is negative
+
+    pf = st.pf
+    if st.pf_key != snap.pointer_filter:
+        pf = st.pf = make_pointer_filter(snap.pointer_filter)
+        st.pf_key = snap.pointer_filter
+        pf.reset(px, py)
     else:
-        tx = int(st.tx_prev + smooth*(tx_raw - st.tx_prev))
-        ty = int(st.ty_prev + smooth*(ty_raw - st.ty_prev))
-    st.tx_prev, st.ty_prev = tx, ty
+        pf.step(px, py, snap.period)
+    st.px, st.py = px, py
+    tx = int(max(0, min(tpad_w-1, round(pf.x))))
+    ty = int(max(0, min(tpad_h-1, round(pf.y))))
 
     # ----- Wiimote mapping -> DS4 bits -----
-    face = 0
-    ps = 0
-
-    # A/B/1/2 -> Cross/Circle/Square/Triangle
-    if is_binding_down(binds.get("wm_a"), xi): face |= BTN_CROSS
-    if is_binding_down(binds.get("wm_b"), xi): face |= BTN_CIRCLE
-    if is_binding_down(binds.get("wm_1"), xi): face |= BTN_SQUARE
-    if is_binding_down(binds.get("wm_2"), xi): face |= BTN_TRIANGLE
-
-    # + / − / Home -> Options / Share / PS
-    if is_binding_down(binds.get("wm_plus"), xi):  ps |= OPTIONS_BTN
-    if is_binding_down(binds.get("wm_minus"), xi): ps |= SHARE_BTN
-    if is_binding_down(binds.get("wm_home"), xi):  ps |= PS_BTN
+    cb = snap.compiled[st.slot]
+    act = cb.actions(backend.keys(cb.vk_mask), xi.buttons if xi is not None else 0)
+
+    # ----- Macros: a trigger's key-down (re)starts its timeline; one frame per tick -----
+    trig = act & ACT_MACROS
+    new = trig & ~st.prev_macro
+    st.prev_macro = trig
+    if new:
+        tl = snap.macros[MACRO_OF_BIT[new & -new]]
+        if tl is not None: st.macro, st.macro_i = tl, 0
+    mf = None
+    if st.macro is not None:
+        mf = st.macro[st.macro_i]
+        st.macro_i += 1
+        if st.macro_i >= len(st.macro): st.macro = None
+        act |= mf[0]
+        if mf[1] is not None:
+            tx = round(mf[1][0] * (tpad_w-1))
+            ty = round(mf[1][1] * (tpad_h-1))
+
+    # A/B/1/2 -> Cross/Circle/Square/Triangle, + / − / Home -> Options / Share / PS
+    face = act & 0xFF
+    ps = (act >> 8) & 0xFF
 
     # Toggle offscreen (debounce 150 ms)
-    if is_binding_down(binds.get("toggle_off"), xi):
-        now_us = time.perf_counter_ns() // 1000
+    if act & ACT_TOGGLE_OFF:
+        now_us = backend.now_us()
         if now_us - st.last_toggle_us >= 150_000:
             st.offscreen = not st.offscreen
             st.last_toggle_us = now_us
     active = 0 if st.offscreen else 1
 
     # D-Pad via synthetic LS (easy to bind in Cemu)
-    mag = int(max(0, min(255, vals["lstick_magnitude"])))
+    half = snap.dpad_half
     lx = 128; ly = 128
-    if is_binding_down(binds.get("wm_dpad_left"), xi):  lx = 128 - mag//2
-    if is_binding_down(binds.get("wm_dpad_right"), xi): lx = 128 + mag//2
-    if is_binding_down(binds.get("wm_dpad_up"), xi):    ly = 128 - mag//2
-    if is_binding_down(binds.get("wm_dpad_down"), xi):  ly = 128 + mag//2
-
-    # ----- Shake/spins (W/E) with adjustable speeds -----
-    w_down = is_binding_down(binds.get("spin_w"), xi)
-    e_down = is_binding_down(binds.get("spin_e"), xi)
-
-    # pulse bookkeeping
-    if not hasattr(st, "prev_w"): st.prev_w = False
-    if not hasattr(st, "prev_e"): st.prev_e = False
-    if not hasattr(st, "dir_w"):  st.dir_w = 1.0
-    if not hasattr(st, "dir_e"):  st.dir_e = 1.0
-    if not hasattr(st, "w_pulse_left"): st.w_pulse_left = 0
-    if not hasattr(st, "e_pulse_left"): st.e_pulse_left = 0
-    if not hasattr(st, "w_cooldown"):   st.w_cooldown = 0
-    if not hasattr(st, "e_cooldown"):   st.e_cooldown = 0
-
-    if w_down and not st.prev_w:
-        st.dir_w *= -1.0
-        st.w_pulse_left = frames_for_ms(vals["pulse_ms"], hz)
-        st.w_cooldown = 0
-    if e_down and not st.prev_e:
-        st.dir_e *= -1.0
-        st.e_pulse_left = frames_for_ms(vals["pulse_ms"], hz)
-        st.e_cooldown = 0
-    st.prev_w = w_down
-    st.prev_e = e_down
+    if act & ACT_DPAD_LEFT:  lx = 128 - half
+    if act & ACT_DPAD_RIGHT: lx = 128 + half
+    if act & ACT_DPAD_UP:    ly = 128 - half
+    if act & ACT_DPAD_DOWN:  ly = 128 + half
 
-    if w_down:
-        if st.w_pulse_left == 0:
-            if st.w_cooldown > 0:
-                st.w_cooldown -= 1
-            else:
-                st.w_pulse_left = frames_for_ms(vals["pulse_ms"], hz)
-                st.w_cooldown = frames_for_ms(vals["cooldown_ms"], hz)
-    else:
-        st.w_pulse_left = 0; st.w_cooldown = 0
+    # ----- Shake/spins (W/E): one step through the precomputed waveform -----
+    w_down = (act & ACT_SPIN_W) != 0
+    e_down = (act & ACT_SPIN_E) != 0
 
-    if e_down:
-        if st.e_pulse_left == 0:
-            if st.e_cooldown > 0:
-                st.e_cooldown -= 1
-            else:
-                st.e_pulse_left = frames_for_ms(vals["pulse_ms"], hz)
-                st.e_cooldown = frames_for_ms(vals["cooldown_ms"], hz)
-    else:
-        st.e_pulse_left = 0; st.e_cooldown = 0
-
-    # base accel/gyro
     ax = 0.0; ay = 0.0; az = G
-    if st.w_pulse_left > 0:
-        ax += st.dir_w * float(vals["w_pulse_ax"])
-        az += st.dir_w * float(vals["pulse_az"])
-        st.w_pulse_left -= 1
-    if st.e_pulse_left > 0:
-        ay += st.dir_e * float(vals["e_pulse_ay"])
-        az += st.dir_e * float(vals["pulse_az"])
-        st.e_pulse_left -= 1
-
-    gx = (st.dir_e * float(vals["spin_x_dps"])) if e_down else 0.0
-    gy = 0.0
-    gz = (st.dir_w * float(vals["twirl_z_dps"])) if w_down else 0.0
+    gx = 0.0; gy = 0.0; gz = 0.0
+    if w_down:
+        if not st.prev_w:
+            st.dir_w *= -1.0
+            st.w_phase = 0
+        tab = snap.w_wave
+        i = st.w_phase % len(tab)
+        a, z, g = tab[i]
+        d = st.dir_w
+        ax += d * a; az += d * z; gz = d * g
+        i += 1
+        st.w_phase = i if i < len(tab) else snap.wave_intro
+    if e_down:
+        if not st.prev_e:
+            st.dir_e *= -1.0
+            st.e_phase = 0
+        tab = snap.e_wave
+        i = st.e_phase % len(tab)
+        a, z, g = tab[i]
+        d = st.dir_e
+        ay += d * a; az += d * z; gx = d * g
+        i += 1
+        st.e_phase = i if i < len(tab) else snap.wave_intro
+    st.prev_w = w_down
+    st.prev_e = e_down
 
     # ----- NEW: Twist keys (gyro-only, no linear accel) -----
-    twist = float(vals["twist_dps"])
-    if is_binding_down(binds.get("mv_front"), xi):
+    twist = snap.twist_dps
+    if act & ACT_MV_FRONT:
         gx += twist      # pitch forward
-    if is_binding_down(binds.get("mv_back"), xi):
+    if act & ACT_MV_BACK:
         gx -= twist      # pitch backward
-    if is_binding_down(binds.get("mv_left"), xi):
+    if act & ACT_MV_LEFT:
         gy -= twist      # roll left
-    if is_binding_down(binds.get("mv_right"), xi):
+    if act & ACT_MV_RIGHT:
         gy += twist      # roll right
 
-    ts_us = time.perf_counter_ns() // 1000
-
-    payload = bytearray()
-    payload += common_begin()
-    payload += b"\x01"                           # is_active
-    payload += struct.pack("<I", st.idx)         # packet num
-    payload += b"\x00"
-    payload += struct.pack("<B", face)           # face buttons
-    payload += struct.pack("<B", ps)             # PS/share/options
-    payload += (b"\x01" if active else b"\x00")  # touch active
-    payload += bytes([lx, ly, 0x80, 0x80])       # sticks (LX,LY,RX,RY)
-    payload += b"\x00"*12
-    payload += struct.pack("<BBHH", 1 if active else 0, 1, tx, ty)  # finger 1
-    payload += struct.pack("<BBHH", 0, 0, 0, 0)                     # finger 2
-    payload += struct.pack("<Q", ts_us)          # timestamp
-    payload += struct.pack("<fff", ax, ay, az)   # accel
-    payload += struct.pack("<fff", gx, gy, gz)   # gyro
-    return pack_header(0x100002, bytes(payload))
-
-def server_thread():
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    s.bind((HOST, PORT))
+    if mf is not None:
+        if mf[2] is not None:
+            ax += mf[2][0]; ay += mf[2][1]; az += mf[2][2]
+        if mf[3] is not None:
+            gx += mf[3][0]; gy += mf[3][1]; gz += mf[3][2]
+
+    # ----- IMU mode: integrate the gyro, tilt gravity to match -----
+    if snap.imu_mode:
+        imu = st.imu
+        if act & ACT_RECENTER or (snap.imu_auto_recenter and gx == 0.0 and gy == 0.0 and gz == 0.0):
+            imu.recentering = True
+        elif gx or gy or gz:
+            imu.recentering = False   # new input takes over
+        if imu.recentering:
+            rx, ry, rz = imu.recenter_rate(snap.recenter_dps, snap.period)
+            gx += rx; gy += ry; gz += rz
+        imu.step(gx, gy, gz, snap.period)
+        ax += imu.ax; ay += imu.ay; az += imu.az - G
+
+    if snap.trace_latency:
+        sig = (act, st.px, st.py)
+        if sig != st.trace_sig:
+            st.trace_sig = sig
+            if st.trace_ns is None: st.trace_ns = backend.sample_ns()
+
+    ts_us = backend.now_us()
+
+    if keepalive_us:
+        state = (face, ps, active, lx, ly, tx, ty, ax, ay, az, gx, gy, gz)
+        if state == st.sent_state and ts_us - st.sent_us < keepalive_us:
+            return None
+        st.sent_state = state
+        st.sent_us = ts_us
+
+    st.idx += 1
+    return st.enc.encode(st.idx, face, ps, active, lx, ly, tx, ty, ts_us, ax, ay, az, gx, gy, gz)
+
+def replay_session(path, sink=None, realtime=False):
+    # Feed a recorded session through resp_data() with fresh per-slot State and
+    # fixed MACs, so the same file + config always yields the same packets.
+    # sink(slot, packet) receives every packet (the buffer is reused: copy it
+    # to keep it). realtime=True paces frames by their recorded timestamps.
+    global backend
+    rb = ReplayBackend(path)
+    prev = backend
+    backend = rb
+    try:
+        snap = config.snap
+        hz, enabled = snap.hz, snap.enabled
+        if rb.hz and rb.hz != hz:
+            log(f"Replay: session recorded at {rb.hz} Hz, replaying with hz={hz}")
+        slots = [State(i, mac=bytes((0x02, 0, 0, 0, 0, i))) for i in range(MAX_SLOTS)]
+        t0 = time.perf_counter()
+        ts0 = rb.ts_at(0) if rb.frames else 0
+        n = 0
+        while True:
+            rb.poll()
+            if rb.done: break
+            if realtime:
+                delay = (rb.now_us() - ts0) / 1e6 - (time.perf_counter() - t0)
+                if delay > 0: time.sleep(delay)
+            for st in slots:
+                if not enabled[st.slot]: continue
+                pkt = resp_data(st)
+                n += 1
+                if sink is not None: sink(st.slot, pkt)
+        return n
+    finally:
+        backend = prev
+        rb.close()
+
+class ServerCore:
+    # Protocol state and per-tick work shared by the threaded and asyncio servers.
+    # Transport-agnostic: every reply goes through send(pkt, addr), where send is
+    # the sendto of the endpoint the request arrived on. Input is sampled and
+    # each slot encoded once per tick, whatever the number of endpoints.
+    def __init__(self, make_sched=make_scheduler):
+        self.slots = [State(i) for i in range(MAX_SLOTS)]
+        self.slot_macs = [st.mac for st in self.slots]
+        snap = config.snap
+        self.subs = SubscriberRegistry(snap.sub_timeout)
+        self.make_sched = make_sched
+        self.hz = snap.hz
+        self.sched_key = snap.sched_key
+        k = self.sched_key
+        self.sched = make_sched(k[0], self.hz, k[1], k[2])
+        self.sampler_hz = 0
+        self.first_packet = False
+        self.profile_down = False
+        self.rx_buf = bytearray(2048)
+        self.rx_view = memoryview(self.rx_buf)
+
+    def sync(self, snap):
+        # Live HZ / scheduler update
+        if snap.sched_key != self.sched_key:
+            self.sched.close()
+            self.sched_key = k = snap.sched_key
+            self.hz = snap.hz
+            self.sched = self.make_sched(k[0], self.hz, k[1], k[2])
+            log(f"Scheduler: {self.sched.name}, catch-up {self.sched.catchup}")
+        if snap.hz != self.hz:
+            self.hz = snap.hz
+            self.sched.set_hz(self.hz)
+            log(f"HZ updated to {self.hz}")
+        if snap.sampler_hz != self.sampler_hz:
+            self.sampler_hz = snap.sampler_hz
+            if self.sampler_hz: start_sampler(self.sampler_hz)
+            else: stop_sampler()
+
+    def handle(self, data, addr, send):
+        # data: bytes or a memoryview into the receive buffer. False = dropped.
+        if data[:len(CTL_MAGIC)] == CTL_MAGIC:
+            return control_message(bytes(data), addr, send)
+        if len(data) < 20 or data[:4] != MAGIC_C: return False
+        msg_type = struct.unpack_from("<I", data, 16)[0]
+        if msg_type == 0x100000:
+            send(resp_version(), addr)
+        elif msg_type == 0x100001:
+            enabled = config.snap.enabled
+            for i in parse_port_request(data):
+                send(resp_port_info(i, self.slots[i].mac, enabled[i]), addr)
+        elif msg_type == 0x100002 and len(data) >= 28:
+            if self.subs.register(data, addr, send, self.slot_macs, time.perf_counter()):
+                log(f"Subscriber: {addr[0]}:{addr[1]}")
+            config.set_subs(len(self.subs))
+        else:
+            return False
+        return True
+
+    def drain(self, sock, send, snap):
+        # Handle every pending request up to rx_batch datagrams / rx_budget
+        # seconds, and never past the next tick deadline, so a connect burst
+        # (port info + data requests from every pad) can't push ticks late.
+        recv = sock.recvfrom_into
+        buf, view = self.rx_buf, self.rx_view
+        stop = min(time.perf_counter() + snap.rx_budget, self.sched.next_tick)
+        n = dropped = 0
+        while n < snap.rx_batch:
+            try:
+                nbytes, addr = recv(buf)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                # ICMP reset from a vanished client / oversized datagram
+                n += 1; dropped += 1
+                continue
+            n += 1
+            try:
+                if not self.handle(view[:nbytes], addr, send): dropped += 1
+            except OSError:
+                dropped += 1
+            if time.perf_counter() >= stop: break
+        stats.rx_drained += n
+        stats.rx_dropped += dropped
+        return n
+
+    def tick(self, now, snap):
+        sched = self.sched
+        subs = self.subs
+        stats.ticks += 1
+        stats.lateness.add(int((now - sched.next_tick) * 1e6))
+        subs.timeout = snap.sub_timeout
+        for _,a in subs.expire(now):
+            log(f"Subscriber expired: {a[0]}:{a[1]}")
+        backend.poll()   # every tick, so off-thread readers (rebind capture) see fresh input
+        if subs:
+            enabled = snap.enabled
+            keepalive = snap.keepalive_us
+            min_gap = snap.min_send_interval
+            for st in self.slots:
+                slot = st.slot
+                targets = subs.targets[slot]
+                if not targets or not enabled[slot]: continue
+                t0 = time.perf_counter_ns()
+                pkt = resp_data(st, keepalive)
+                t1 = time.perf_counter_ns()
+                stats.encode.add((t1 - t0) // 1000)
+                if not (keepalive or min_gap):
+                    for send,a in targets:
+                        try:
+                            send(pkt, a)
+                            stats.packets_sent += 1
+                            if st.trace_ns is not None: self._traced(st)
+                        except OSError:
+                            stats.send_errors += 1
+                            subs.remove((send, a))
+                else:
+                    # Every subscriber gets the newest packet once, no more often
+                    # than min_gap; rate-limited ones catch up on a later tick from
+                    # the encoder's buffer, which still holds packet st.idx.
+                    pkt = st.enc.buf
+                    idx = st.idx
+                    for key in targets:
+                        sub = subs.subs[key]
+                        if sub.sent[slot] == idx or now < sub.next_send[slot]:
+                            stats.packets_suppressed += 1
+                            continue
+                        try:
+                            sub.send(pkt, sub.addr)
+                            stats.packets_sent += 1
+                            sub.sent[slot] = idx
+                            sub.next_send[slot] = now + min_gap
+                            if st.trace_ns is not None: self._traced(st)
+                        except OSError:
+                            stats.send_errors += 1
+                            subs.remove(key)
+                stats.send.add((time.perf_counter_ns() - t1) // 1000)
+            if not self.first_packet and stats.packets_sent:
+                self.first_packet = True
+                log(f"First data packet {(time.perf_counter() - T_START) * 1000:.0f} ms after start")
+        # Next Profile, on the key-down edge, from the input polled above (after
+        # the encoders, whose reads cover the key): the next tick already runs
+        # on the new snapshot
+        vk, pads = snap.profile_keys
+        down = bool(vk and backend.keys(vk))
+        for index, m in pads:
+            p = backend.pad(index)
+            if p is not None and p.buttons & m: down = True
+        if down and not self.profile_down: profiles.step(config)
+        self.profile_down = down
+        if profiles.adopting is not None: profiles.adopt(config)
+        config.set_subs(len(subs))
+        stats.missed_ticks += sched.advance(now)
+
+    def _traced(self, st):
+        stats.input_latency.add((time.perf_counter_ns() - st.trace_ns) // 1000)
+        st.trace_ns = None
+
+    def close(self):
+        self.sched.close()
+
+# Endpoints: main() sets ENDPOINTS from --listen / --host / --port, else from
+# the "listen" setting. HOST/PORT stay the first one (GUI, --switch).
+ENDPOINTS = [(HOST, PORT)]
+
+def parse_endpoints(text, port=PORT):
+    # "127.0.0.1:26760, [::1]:26761, 0.0.0.0" -> [(host, port), ...]; a bare host
+    # listens on `port`. ValueError on anything else.
+    out = []
+    for item in text.split(","):
+        item = item.strip()
+        if not item: continue
+        host, p = item, port
+        if item.startswith("["):
+            host, sep, rest = item[1:].partition("]")
+            if not sep or (rest and rest[0] != ":"): raise ValueError(f"bad endpoint '{item}'")
+            if rest: p = rest[1:]
+        elif item.count(":") == 1:
+            host, p = item.split(":")
+        try:
+            p = int(p)
+        except ValueError:
+            raise ValueError(f"bad port in '{item}'") from None
+        if not host or not 0 <= p <= 65535: raise ValueError(f"bad endpoint '{item}'")
+        if (host, p) not in out: out.append((host, p))
+    if not out: raise ValueError("no endpoints")
+    return out
+
+def format_endpoint(host, port):
+    return f"[{host}]:{port}" if ":" in host else f"{host}:{port}"
+
+def open_endpoint(host, port):
+    # -> non-blocking UDP socket bound to (host, port). IPv6 sockets are v6-only,
+    # so 0.0.0.0 and :: can both be listed on the same port.
+    family, _, _, _, sockaddr = socket.getaddrinfo(host, port, 0, socket.SOCK_DGRAM)[0]
+    s = socket.socket(family, socket.SOCK_DGRAM)
+    try:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if family == socket.AF_INET6:
+            s.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+        s.bind(sockaddr)
+    except OSError:
+        s.close()
+        raise
     try:
         s.ioctl(socket.SIO_UDP_CONNRESET, b'\x00\x00\x00\x00')
     except (AttributeError, OSError):
         pass
     s.setblocking(False)
+    return s
 
-    log(f"Listening on udp://{HOST}:{PORT}")
+def open_endpoints(endpoints):
+    # one socket per endpoint that could be bound; the others are logged
+    socks = []
+    for host, port in endpoints:
+        try:
+            s = open_endpoint(host, port)
+        except OSError as e:
+            log(f"Can't listen on udp://{format_endpoint(host, port)}: {e}")
+            continue
+        log(f"Listening on udp://{format_endpoint(host, s.getsockname()[1])}")
+        socks.append(s)
+    return socks
+
+def server_thread(endpoints=None):
+    socks = open_endpoints(endpoints or ENDPOINTS)
+    if not socks:
+        log("Server not started: no endpoint to listen on.")
+        return
+
+    if backend is None:
+        use_backend()
+    core = ServerCore()
+    sends = {s: s.sendto for s in socks}
+
+    timer_resolution(True)
+    try:
+        while not config.want_stop:
+            snap = config.snap
+            core.sync(snap)
+
+            for s in core.sched.wait(socks):
+                core.drain(s, sends[s], snap)
+
+            now = time.perf_counter()
+            if core.sched.due(now):
+                core.tick(now, snap)
+    finally:
+        core.close()
+        timer_resolution(False)
+        stop_recording()
+        stop_sampler()
+        for s in socks: s.close()
+        log("Server stopped.")
 
-    subs = set()
-    st = State()
+# ------------------------------ ASYNCIO SERVER ------------------------------
 
-    with config.lock:
-        hz = max(1, int(config.values["hz"]))
-    period = 1.0 / hz
-    next_tick = time.perf_counter() + period
+SERVER_MODES = ["thread", "asyncio"]
 
-    winmm.timeBeginPeriod(1)
+def _async_sched(strategy, hz, catchup="skip", spin_us=1000):
+    # The event loop does the waiting, so only deadline/catch-up bookkeeping is
+    # needed. asyncio timers are millisecond-granular (epoll/IOCP), so "select"
+    # becomes a timerfd where there is one; "hybrid" keeps its spin window.
+    if strategy == "hybrid": return HybridScheduler(hz, catchup, spin_us)
     try:
-        while not config.want_stop:
-            # Rebind capture
-            with config.lock:
-                target = config.rebind_target
-                deadline = config.rebind_deadline
-            if target:
-                xi = xinput_get_state(0)
-                got = scan_next_pressed(xi)
-                if got:
-                    kind, code = got
-                    with config.lock:
-                        config.bindings[target] = (kind, int(code))
-                        config.rebind_target = None
-                        config.rebind_deadline = 0.0
-                    log(f"Rebind '{target}' -> {binding_name((kind,code))}")
-                elif time.time() > deadline:
-                    config.cancel_rebind()
-                    log(f"Rebind '{target}' canceled (timeout).")
-
-            # Live HZ update
-            with config.lock:
-                hz_now = max(1, int(config.values["hz"]))
-            if hz_now != hz:
-                hz = hz_now
-                period = 1.0 / hz
-                next_tick = time.perf_counter() + period
-                log(f"HZ updated to {hz}")
-
-            timeout = max(0.0, next_tick - time.perf_counter())
+        return TimerfdScheduler(hz, catchup)
+    except OSError:
+        return TickScheduler(hz, catchup)
+
+class DSUProtocol:
+    # asyncio.DatagramProtocol by duck typing, so this module doesn't import
+    # asyncio unless the asyncio server is actually used
+    def __init__(self, core):
+        self.core = core
+        self.transport = None
+        self.send = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.send = transport.sendto     # one bound method: it is part of the subscriber key
+
+    def datagram_received(self, data, addr):
+        # one datagram per loop iteration, interleaved with the emit task
+        stats.rx_drained += 1
+        if not self.core.handle(data, addr, self.send):
+            stats.rx_dropped += 1
+
+    def error_received(self, exc):
+        # ICMP port-unreachable from a client that went away; expiry handles it
+        stats.send_errors += 1
+
+    def connection_lost(self, exc): pass
+    def pause_writing(self): pass
+    def resume_writing(self): pass
+
+class AsyncDSUServer:
+    # Embeddable DSU server for an existing asyncio loop:
+    #
+    #   srv = AsyncDSUServer(port=0)         # or endpoints=[(host, port), ...]
+    #   await srv.start()          # srv.port is the (first) bound port
+    #   ...
+    #   await srv.close()
+    #
+    # Requests go through DSUProtocol; packets come from one deadline-scheduled
+    # emit task that shares ServerCore (and its catch-up policy) with the
+    # threaded server. The loop stops on close() or config.want_stop.
+    def __init__(self, host=HOST, port=PORT, endpoints=None):
+        self.endpoints = endpoints or [(host, port)]
+        self.host, self.port = self.endpoints[0]
+        self.core = None
+        self.transports = []
+        self._task = None
+
+    async def start(self):
+        import asyncio
+        if backend is None:
+            use_backend()
+        loop = asyncio.get_running_loop()
+        socks = open_endpoints(self.endpoints)
+        if not socks:
+            raise OSError("no endpoint to listen on")
+        self.core = ServerCore(_async_sched)
+        for s in socks:
+            tr, _ = await loop.create_datagram_endpoint(lambda: DSUProtocol(self.core), sock=s)
+            self.transports.append(tr)
+        self.port = socks[0].getsockname()[1]
+        timer_resolution(True)
+        self._task = loop.create_task(self._emit())
+        return self
+
+    def _on_timer(self, fd):
+        try: os.read(fd, 8)
+        except OSError: pass
+        self._timer.set()
+
+    async def _emit(self):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        core = self.core
+        sleep = asyncio.sleep
+        self._timer = asyncio.Event()
+        fd = -1
+        try:
+            while not config.want_stop:
+                snap = config.snap
+                core.sync(snap)
+                sched = core.sched
+                if getattr(sched, "fd", -1) != fd:
+                    if fd >= 0: loop.remove_reader(fd)
+                    fd = getattr(sched, "fd", -1)
+                    if fd >= 0: loop.add_reader(fd, self._on_timer, fd)
+                deadline = sched.next_tick
+                if fd >= 0:
+                    if time.perf_counter() < deadline:
+                        if sched._armed != deadline: sched._arm(deadline)
+                        self._timer.clear()
+                        await self._timer.wait()
+                        continue
+                else:
+                    delay = deadline - time.perf_counter() - getattr(sched, "spin", 0.0)
+                    if delay > 0:
+                        await sleep(delay)
+                        continue
+                    while time.perf_counter() < deadline:
+                        pass
+                now = time.perf_counter()
+                core.tick(now, snap)
+                await sleep(0)   # let pending datagrams in between ticks
+        finally:
+            if fd >= 0: loop.remove_reader(fd)
+
+    async def serve_forever(self):
+        await self._task
+
+    async def close(self):
+        import asyncio
+        if self._task is not None:
+            self._task.cancel()
             try:
-                r, _, _ = select.select([s], [], [], timeout)
-            except OSError:
-                r = []
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.transports:
+            for tr in self.transports: tr.close()
+            self.transports = []
+            self.core.close()
+            timer_resolution(False)
+            stop_recording()
+            stop_sampler()
+            log("Server stopped.")
+
+async def serve_async(host=HOST, port=PORT, endpoints=None):
+    srv = await AsyncDSUServer(host, port, endpoints).start()
+    try:
+        await srv.serve_forever()
+    finally:
+        await srv.close()
+
+def server_asyncio_thread():
+    import asyncio
+    asyncio.run(serve_async(endpoints=ENDPOINTS))
+
+# ------------------------------ CONFIG PERSISTENCE ------------------------------
+# Schema: a setting's type is its default's type; CONFIG_CHOICES,
+# CONFIG_PARSERS and CONFIG_LIMITS narrow it further. check_settings() runs once per load and
+# coerces (1 -> 1.0, 1.0 -> 1, clamps ranges) or drops entries; nothing past
+# Config.load has to guard against a malformed file.
+
+CONFIG_CHOICES = {
+    "pointer_filter": list(POINTER_FILTERS),
+    "pulse_shape": PULSE_SHAPES,
+    "sched_strategy": SCHED_STRATEGIES,
+    "sched_catchup": SCHED_CATCHUP,
+    "server_mode": SERVER_MODES,
+    "pointer_source": POINTER_SOURCES,
+}
 
-            if r:
-                try:
-                    data, addr = s.recvfrom(2048)
-                except (BlockingIOError, ConnectionResetError, OSError):
-                    data = None
-                if data and data[:4] == MAGIC_C:
-                    msg_type = struct.unpack_from("<I", data, 16)[0]
-                    if msg_type == 0x100000:
-                        s.sendto(resp_version(), addr)
-                    elif msg_type == 0x100001:
-                        s.sendto(resp_list_ports(), addr)
-                    elif msg_type == 0x100002:
-                        if addr not in subs:
-                            subs.add(addr)
-                            log(f"Subscriber: {addr[0]}:{addr[1]}")
-                        with config.lock:
-                            config.subs_count = len(subs)
+# settings with a syntax of their own: a parser that raises ValueError
+CONFIG_PARSERS = {
+    "listen": parse_endpoints,
+}
+
+CONFIG_LIMITS = {
+    "hz": (1, 1000),
+    "tpad_w": (2, 65535), "tpad_h": (2, 65535),
+    "smooth": (0.0, 1.0),
+    "stick_deadzone": (0, 32766),
+    "pulse_ms": (1, 5000), "cooldown_ms": (0, 5000),
+    "lstick_magnitude": (0, 255),
+    "sub_timeout_s": (0.5, 3600.0),
+    "spin_us": (0, 100000),
+    "rx_batch": (1, 4096), "rx_budget_us": (0, 1000000),
+    "sampler_hz": (0, 8000),
+    "keepalive_ms": (1, 60000), "max_rate_hz": (0, 1000),
+    "log_file_kb": (4, 1 << 20), "log_file_backups": (0, 99),
+    "autosave_ms": (0, 600000),
+    "xinput_index": (0, 3),
+}
 
+def coerce_setting(key, value, default):
+    t = type(default)
+    if t is bool:
+        if isinstance(value, bool): return value
+        if isinstance(value, (int, float)) and value in (0, 1): return bool(value)
+        raise TypeError("expected true/false")
+    if t is str:
+        if not isinstance(value, str): raise TypeError("expected a string")
+        choices = CONFIG_CHOICES.get(key)
+        if choices is not None and value not in choices:
+            raise ValueError(f"expected one of {', '.join(choices)}")
+        parse = CONFIG_PARSERS.get(key)
+        if parse is not None: parse(value)
+        return value
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError("expected a number")
+    if not math.isfinite(value): raise ValueError("not finite")
+    if t is int:
+        if value != int(value): raise ValueError("expected an integer")
+        value = int(value)
+    else:
+        value = float(value)
+    lim = CONFIG_LIMITS.get(key)
+    if lim is not None:
+        value = min(max(value, t(lim[0])), t(lim[1]))
+    return value
+
+def check_settings(loaded, schema, bad, prefix=""):
+    # -> the valid subset of `loaded` (coerced); rejects are appended to `bad`
+    out = {}
+    for k,v in loaded.items():
+        if k not in schema:
+            bad.append(f"{prefix}{k} (unknown)")
+            continue
+        try:
+            out[k] = coerce_setting(k, v, schema[k])
+        except (TypeError, ValueError) as e:
+            bad.append(f"{prefix}{k}={v!r} ({e})")
+    return out
+
+def overlay_config(data, values, slots, bindings, bad):
+    # Apply a config/profile file's contents onto (values, slots, bindings) in
+    # place. Everything is validated and coerced here, so the snapshot and the
+    # tick path only ever see well-typed, in-range values.
+    vals = dict(data.get("values", {}))
+    # pre multi-slot configs kept the pointer source in values
+    legacy_src = vals.pop("pointer_source", None)
+    values.update(check_settings(vals, DEFAULTS, bad))
+    if legacy_src is not None:
+        slots[0].update(check_settings({"pointer_source": legacy_src}, DEFAULT_SLOT, bad))
+    bad += _update_bindings(bindings[0], data.get("bindings", {}))
+    for i,sd in enumerate(data.get("slots", [])[:MAX_SLOTS]):
+        sd = dict(sd)
+        bad += _update_bindings(bindings[i], sd.pop("bindings", {}))
+        slots[i].update(check_settings(sd, DEFAULT_SLOT, bad, f"slot {i+1} "))
+
+def write_json_atomic(path, data):
+    # write a uniquely named sibling temp file, fsync, then rename over the
+    # target: a crash leaves either the old file or the new one, never half of
+    # each, and concurrent writers never share a temp file
+    import tempfile
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                               dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try: os.unlink(tmp)
+        except OSError: pass
+        raise
+
+class ConfigSaver:
+    # Debounced autosave on its own thread: once values, slots and bindings have
+    # been quiet for autosave_ms, Config.save() the lot. The GUI thread only
+    # bumps change counters; it never serializes or touches the disk.
+    def __init__(self, cfg, path=None, poll=0.1):
+        self.cfg = cfg
+        self.path = path
+        self.poll = poll
+        self.seen = self._changes()
+        self.due = 0.0
+        self.stop = False
+        self.thread = threading.Thread(target=self._run, daemon=True, name="autosave")
+
+    def _changes(self):
+        c = self.cfg.changes
+        return (c["values"], c["slots"], c["bindings"])
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while not self.stop:
+            time.sleep(self.poll)
+            v = self.cfg.snap.values
+            n = self._changes()
             now = time.perf_counter()
-            if now >= next_tick:
-                if subs:
-                    pkt = resp_data(st)
-                    for a in tuple(subs):
-                        try:
-                            s.sendto(pkt, a)
-                        except OSError:
-                            subs.discard(a)
-                    with config.lock:
-                        config.subs_count = len(subs)
-                missed = int((now - next_tick) / period)
-                next_tick += (missed + 1) * period
-    finally:
-        winmm.timeEndPeriod(1)
-        s.close()
-        log("Server stopped.")
+            if n != self.seen:
+                self.seen = n
+                self.due = now + v["autosave_ms"] / 1000.0
+            elif self.due and now >= self.due:
+                self.due = 0.0
+                # a profile's state is not the config file's: don't save it over it
+                if v["autosave"] and self.cfg.profile is None: self.cfg.save(self.path, quiet=True)
+
+    def close(self):
+        # stop and write anything still pending
+        self.stop = True
+        self.thread.join(1.0)
+        if (self.due or self._changes() != self.seen) and self.cfg.snap.values["autosave"] and self.cfg.profile is None:
+            self.cfg.save(self.path, quiet=True)
+
+# ------------------------------ PROFILES ------------------------------
+# Per-game setups: every <name>.json in profiles_dir, in the config file's
+# format (any subset of "values", "bindings", "slots"), laid over the config
+# file's state. All are validated and compiled into ConfigSnapshots when they
+# are (re)loaded, so a switch is a reference swap the tick thread never waits
+# on. Switching: the "Next Profile" binding, the GUI, --profile NAME, or a
+# loopback datagram to the DSU port:
+#   VWCTL profile <name|next|prev>   -> "OK <active>" / "ERR <reason>"
+#   VWCTL profile                    -> "OK <active>"
+#   VWCTL profiles                   -> "OK <name> <name> ..."
+# While a profile is active, edits are live but not autosaved; switching back
+# to BASE_PROFILE returns to the config file's state.
+
+BASE_PROFILE = "(config)"
+CTL_MAGIC = b"VWCTL "
+
+class Profile:
+    __slots__ = ("name", "values", "slots", "bindings", "snap")
+    def __init__(self, name, values, slots, bindings, snap=None):
+        self.name = name
+        self.values = values
+        self.slots = slots
+        self.bindings = bindings
+        self.snap = snap or ConfigSnapshot(self, 0, tuple(CompiledBindings(b) for b in bindings))
+
+class ProfileSet:
+    def __init__(self):
+        self.profiles = {BASE_PROFILE: None}   # name -> Profile, BASE_PROFILE first
+        self.adopting = None    # Profile step() made live whose use_state() is still due
+        self.overrides = {}     # values forced on every profile (command line)
+        self.lock = threading.Lock()
+
+    def load(self, cfg, directory):
+        # (re)build every profile on top of cfg's current state
+        if cfg.profile is not None: self.switch(cfg, BASE_PROFILE)
+        base = cfg.copy_state()
+        out = {BASE_PROFILE: None}
+        try:
+            files = sorted(f for f in os.listdir(directory) if f.lower().endswith(".json"))
+        except OSError:
+            files = []
+        for fn in files:
+            name = fn[:-5]
+            try:
+                with open(os.path.join(directory, fn), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                values, slots, bindings = dict(base[0]), [dict(sc) for sc in base[1]], [dict(b) for b in base[2]]
+                bad = []
+                overlay_config(data, values, slots, bindings, bad)
+                values.update(self.overrides)
+                out[name] = Profile(name, values, slots, bindings)
+                if bad: log(f"Profile '{name}': ignored invalid entries: {', '.join(map(str, bad))}")
+            except Exception as e:
+                log(f"Profile '{name}' not loaded: {e}")
+        with self.lock:
+            self.profiles = out
+        if len(out) > 1:
+            log(f"Profiles: {', '.join(list(out)[1:])}")
+        return list(out)
+
+    def names(self):
+        return list(self.profiles)
+
+    def switch(self, cfg, name):
+        with self.lock:
+            if name not in self.profiles: return False
+            cur = self._current(cfg)
+            if name == cur and self.adopting is None: return True
+            if cur == BASE_PROFILE: self.profiles[BASE_PROFILE] = self._base(cfg)
+            self.adopting = None
+            p = self.profiles[name]
+            cfg.use_state(p.values, p.slots, p.bindings, p.snap, None if name == BASE_PROFILE else name)
+        log(f"Profile: {name}")
+        return True
+
+    def _current(self, cfg):
+        p = self.adopting
+        return p.name if p is not None else (cfg.profile or BASE_PROFILE)
+
+    @staticmethod
+    def _base(cfg):
+        # keep the config file's state, edits included, to come back to: the
+        # live snapshot holds a copy of it, no lock needed
+        s = cfg.snap
+        return Profile(BASE_PROFILE, dict(s.values), [dict(sc) for sc in s.slots],
+                       [dict(b) for b in s.bindings], snap=s)
+
+    def cycle(self, cfg, step=1):
+        names = self.names()
+        if len(names) < 2: return
+        i = names.index(self._current(cfg))
+        self.switch(cfg, names[(i + step) % len(names)])
+
+    def step(self, cfg, n=1):
+        # "Next Profile" from the tick thread, which never waits on a lock: the
+        # target's prebuilt snapshot is swapped in right away, adopt() brings
+        # the writer-side state along once config.lock is free (this tick or a
+        # later one).
+        profs = self.profiles
+        names = list(profs)
+        if len(names) < 2: return
+        cur = self._current(cfg)
+        i = names.index(cur) if cur in profs else 0
+        name = names[(i + n) % len(names)]
+        if cur == BASE_PROFILE: profs[BASE_PROFILE] = self._base(cfg)
+        p = profs[name]
+        cfg.swap_snap(p.snap)
+        self.adopting = p
+        log(f"Profile: {name}")
+        self.adopt(cfg)
+
+    def adopt(self, cfg):
+        p = self.adopting
+        if p is None: return
+        if cfg.use_state(p.values, p.slots, p.bindings, p.snap,
+                         None if p.name == BASE_PROFILE else p.name, blocking=False):
+            if self.adopting is p: self.adopting = None
+
+profiles = ProfileSet()
+
+def is_loopback(host):
+    return host == "::1" or host.startswith("127.") or host.startswith("::ffff:127.")
+
+def control_message(data, addr, send):
+    # VWCTL commands (see PROFILES); loopback senders only. False = dropped.
+    if not is_loopback(addr[0]): return False
+    args = data[len(CTL_MAGIC):].decode("utf-8", "replace").split()
+    if args == ["profiles"]:
+        reply = "OK " + " ".join(profiles.names())
+    elif args[:1] == ["profile"] and len(args) <= 2:
+        arg = args[1] if len(args) == 2 else None
+        if arg == "next": profiles.cycle(config, 1)
+        elif arg == "prev": profiles.cycle(config, -1)
+        elif arg is not None and not profiles.switch(config, arg):
+            send(f"ERR unknown profile '{arg}'".encode(), addr)
+            return True
+        reply = f"OK {config.profile or BASE_PROFILE}"
+    else:
+        reply = "ERR unknown command"
+    send(reply.encode(), addr)
+    return True
 
 # ------------------------------ GUI (DearPyGui) ------------------------------
 
+dpg = None   # dearpygui.dearpygui once import_gui() ran
+
+def import_gui():
+    global dpg
+    import dearpygui.dearpygui as dpg
 IDS = {
     "log_child": "log_child",
+    "log_scroll": "log_scroll",
+    "log_file": "log_file",
+    "autosave": "autosave",
+    "profile_combo": "profile_combo",
+    "macros_file": "macros_file",
     "subs_text": "subs_text",
-    "host_text": "host_text",
-    "port_text": "port_text",
+    "listen_text": "listen_text",
+    "listen": "listen",
     "ptr_combo": "ptr_combo",
+    "slot_combo": "slot_combo",
+    "slot_enabled": "slot_enabled",
+    "slot_pad": "slot_pad",
 
     # controls we want to sync on reset
     "hz_slider": "hz_slider",
     "invert_y": "invert_y",
     "smooth_slider": "smooth_slider",
+    "pointer_filter": "pointer_filter",
+    "oe_min_cutoff": "oe_min_cutoff",
+    "oe_beta": "oe_beta",
+    "predict_ms": "predict_ms",
+    "sub_timeout": "sub_timeout",
+    "sched_combo": "sched_combo",
+    "catchup_combo": "catchup_combo",
+    "spin_us": "spin_us",
+    "server_mode": "server_mode",
+    "sampler_hz": "sampler_hz",
+    "delta_mode": "delta_mode",
+    "keepalive_ms": "keepalive_ms",
+    "max_rate_hz": "max_rate_hz",
+    "suppressed_text": "suppressed_text",
     "cursor_speed": "cursor_speed",
     "deadzone": "deadzone",
     "tpad_w": "tpad_w",
     "tpad_h": "tpad_h",
     "lstick_mag": "lstick_mag",
     "bindings_file": "bindings_file",
+    "session_file": "session_file",
+    "stats_text": "stats_text",
+    "stats_file": "stats_file",
+    "trace_latency": "trace_latency",
 
     # Motion/Shake/Twist tuning sliders (sync too)
     "twirl_z_dps": "twirl_z_dps",
@@ -677,78 +3371,163 @@ IDS = {
     "pulse_az": "pulse_az",
     "pulse_ms": "pulse_ms",
     "cooldown_ms": "cooldown_ms",
+    "pulse_shape": "pulse_shape",
+    "pulse_curve_file": "pulse_curve_file",
     "twist_dps": "twist_dps",
+    "imu_mode": "imu_mode",
+    "imu_auto_recenter": "imu_auto_recenter",
+    "recenter_dps": "recenter_dps",
 }
 
 BIND_LABEL_TAG = {}
 REBIND_BTN_TAG  = {}
-for key,_ in ACTIONS_WIIMOTE + ACTIONS_EXTRA + ACTIONS_TWIST:
+for key,_ in ACTIONS_WIIMOTE + ACTIONS_EXTRA + ACTIONS_TWIST + ACTIONS_MACRO:
     BIND_LABEL_TAG[key] = f"bind_label_{key}"
     REBIND_BTN_TAG[key] = f"rebind_btn_{key}"
 
+SLOT_LABELS = [f"Slot {i+1}" for i in range(MAX_SLOTS)]
+gui_slot = 0   # slot whose pointer source / bindings the window is editing
+
 def on_slider_change(sender, app_data, user_data):
-    key = user_data
-    with config.lock:
-        config.values[key] = app_data
+    config.set_value(user_data, app_data)
 
 def on_checkbox(sender, app_data, user_data):
-    key = user_data
-    with config.lock:
-        config.values[key] = bool(app_data)
+    config.set_value(user_data, bool(app_data))
 
 def on_combo(sender, app_data, user_data):
-    key = user_data
-    with config.lock:
-        config.values[key] = str(app_data)
+    config.set_value(user_data, str(app_data))
 
 def on_input_text(sender, app_data, user_data):
-    key = user_data
-    with config.lock:
-        config.values[key] = str(app_data)
+    config.set_value(user_data, str(app_data))
+
+def on_listen_text(sender, app_data, user_data):
+    # only a list that parses is stored; it is bound on the next start
+    try:
+        parse_endpoints(app_data)
+    except ValueError as e:
+        log(f"Listen: {e}")
+        dpg.set_value(sender, config.values["listen"])
+        return
+    config.set_value("listen", app_data)
+
+def on_slot_setting(sender, app_data, user_data):
+    config.set_slot(gui_slot, user_data, app_data)
+
+def on_slot_select(sender, app_data, user_data):
+    global gui_slot
+    gui_slot = SLOT_LABELS.index(app_data)
+    sync_slot_controls()
 
 def on_click_rebind(sender, app_data, user_data):
     action = user_data
-    config.begin_rebind(action)
-    log(f"Rebind '{action}' started: press any key or XInput button...")
+    rebind.start(gui_slot, action)
+    log(f"Rebind slot {gui_slot+1} '{action}' started: press any key or XInput button...")
 
 def on_save_config(sender, app_data, user_data):
     config.save()
 
 def on_save_bindings(sender, app_data, user_data):
-    with config.lock:
-        fn = config.values.get("bindings_filename", "bindings_user.json")
+    fn = config.snap.values.get("bindings_filename", "bindings_user.json")
     if not fn.lower().endswith(".json"):
         fn += ".json"
-    config.save_bindings_only(fn)
+    config.save_bindings_only(fn, gui_slot)
 
 def on_load_bindings(sender, app_data, user_data):
-    with config.lock:
-        fn = config.values.get("bindings_filename", "bindings_user.json")
+    fn = config.snap.values.get("bindings_filename", "bindings_user.json")
     if not fn.lower().endswith(".json"):
         fn += ".json"
-    config.load_bindings_only(fn)
+    config.load_bindings_only(fn, gui_slot)
+
+def on_reload_macros(sender, app_data, user_data):
+    config.refresh()
+    n = sum(tl is not None for tl in config.snap.macros)
+    log(f"Macros: {n} loaded from '{config.snap.values['macros_file']}'")
+
+def on_profile_select(sender, app_data, user_data):
+    profiles.switch(config, app_data)
+
+def on_reload_profiles(sender, app_data, user_data):
+    names = profiles.load(config, config.snap.values["profiles_dir"])
+    dpg.configure_item(IDS["profile_combo"], items=names)
+    gui_set(IDS["profile_combo"], config.profile or BASE_PROFILE)
+
+def on_start_recording(sender, app_data, user_data):
+    snap = config.snap
+    fn = snap.values.get("session_filename", "session.vwrec")
+    hz = snap.hz
+    try:
+        start_recording(fn, hz)
+    except OSError as e:
+        log(f"Could not start recording: {e}")
+
+def on_stop_recording(sender, app_data, user_data):
+    stop_recording()
+
+def on_export_stats(sender, app_data, user_data):
+    fn = config.snap.values.get("stats_filename", "vwiimote_stats.json")
+    try:
+        stats.to_json(fn)
+        log(f"Stats exported to '{fn}'.")
+    except OSError as e:
+        log(f"Error exporting stats: {e}")
+
+def on_reset_stats(sender, app_data, user_data):
+    stats.reset()
+    log("Stats reset.")
 
 def sync_controls_from_config():
-    with config.lock:
-        dpg.set_value(IDS["hz_slider"],           config.values["hz"])
-        dpg.set_value(IDS["invert_y"],            config.values["invert_y"])
-        dpg.set_value(IDS["smooth_slider"],       config.values["smooth"])
-        dpg.set_value(IDS["ptr_combo"],           config.values["pointer_source"])
-        dpg.set_value(IDS["cursor_speed"],        config.values["cursor_speed_px_s"])
-        dpg.set_value(IDS["deadzone"],            config.values["stick_deadzone"])
-        dpg.set_value(IDS["tpad_w"],              config.values["tpad_w"])
-        dpg.set_value(IDS["tpad_h"],              config.values["tpad_h"])
-        dpg.set_value(IDS["lstick_mag"],          config.values["lstick_magnitude"])
-        dpg.set_value(IDS["bindings_file"],       config.values["bindings_filename"])
-
-        dpg.set_value(IDS["twirl_z_dps"],         config.values["twirl_z_dps"])
-        dpg.set_value(IDS["spin_x_dps"],          config.values["spin_x_dps"])
-        dpg.set_value(IDS["w_pulse_ax"],          config.values["w_pulse_ax"])
-        dpg.set_value(IDS["e_pulse_ay"],          config.values["e_pulse_ay"])
-        dpg.set_value(IDS["pulse_az"],            config.values["pulse_az"])
-        dpg.set_value(IDS["pulse_ms"],            config.values["pulse_ms"])
-        dpg.set_value(IDS["cooldown_ms"],         config.values["cooldown_ms"])
-        dpg.set_value(IDS["twist_dps"],           config.values["twist_dps"])
+    v = config.snap.values
+    dpg.set_value(IDS["hz_slider"],           v["hz"])
+    dpg.set_value(IDS["invert_y"],            v["invert_y"])
+    dpg.set_value(IDS["smooth_slider"],       v["smooth"])
+    dpg.set_value(IDS["pointer_filter"],      v["pointer_filter"])
+    dpg.set_value(IDS["oe_min_cutoff"],       v["oe_min_cutoff"])
+    dpg.set_value(IDS["oe_beta"],             v["oe_beta"])
+    dpg.set_value(IDS["predict_ms"],          v["predict_ms"])
+    dpg.set_value(IDS["sub_timeout"],         v["sub_timeout_s"])
+    dpg.set_value(IDS["sched_combo"],         v["sched_strategy"])
+    dpg.set_value(IDS["catchup_combo"],       v["sched_catchup"])
+    dpg.set_value(IDS["spin_us"],             v["spin_us"])
+    dpg.set_value(IDS["server_mode"],         v["server_mode"])
+    dpg.set_value(IDS["listen"],              v["listen"])
+    dpg.set_value(IDS["sampler_hz"],          v["sampler_hz"])
+    dpg.set_value(IDS["delta_mode"],          v["delta_mode"])
+    dpg.set_value(IDS["keepalive_ms"],        v["keepalive_ms"])
+    dpg.set_value(IDS["max_rate_hz"],         v["max_rate_hz"])
+    dpg.set_value(IDS["cursor_speed"],        v["cursor_speed_px_s"])
+    dpg.set_value(IDS["deadzone"],            v["stick_deadzone"])
+    dpg.set_value(IDS["tpad_w"],              v["tpad_w"])
+    dpg.set_value(IDS["tpad_h"],              v["tpad_h"])
+    dpg.set_value(IDS["lstick_mag"],          v["lstick_magnitude"])
+    dpg.set_value(IDS["bindings_file"],       v["bindings_filename"])
+    dpg.set_value(IDS["session_file"],        v["session_filename"])
+    dpg.set_value(IDS["stats_file"],          v["stats_filename"])
+    dpg.set_value(IDS["log_file"],            v["log_file"])
+    dpg.set_value(IDS["autosave"],            v["autosave"])
+    dpg.set_value(IDS["macros_file"],         v["macros_file"])
+    dpg.set_value(IDS["trace_latency"],       v["trace_latency"])
+
+    dpg.set_value(IDS["twirl_z_dps"],         v["twirl_z_dps"])
+    dpg.set_value(IDS["spin_x_dps"],          v["spin_x_dps"])
+    dpg.set_value(IDS["w_pulse_ax"],          v["w_pulse_ax"])
+    dpg.set_value(IDS["e_pulse_ay"],          v["e_pulse_ay"])
+    dpg.set_value(IDS["pulse_az"],            v["pulse_az"])
+    dpg.set_value(IDS["pulse_ms"],            v["pulse_ms"])
+    dpg.set_value(IDS["cooldown_ms"],         v["cooldown_ms"])
+    dpg.set_value(IDS["pulse_shape"],         v["pulse_shape"])
+    dpg.set_value(IDS["pulse_curve_file"],    v["pulse_curve_file"])
+    dpg.set_value(IDS["twist_dps"],           v["twist_dps"])
+    dpg.set_value(IDS["imu_mode"],            v["imu_mode"])
+    dpg.set_value(IDS["imu_auto_recenter"],   v["imu_auto_recenter"])
+    dpg.set_value(IDS["recenter_dps"],        v["recenter_dps"])
+    sync_slot_controls()
+
+def sync_slot_controls():
+    sc = config.snap.slots[gui_slot]
+    dpg.set_value(IDS["slot_combo"],   SLOT_LABELS[gui_slot])
+    dpg.set_value(IDS["slot_enabled"], sc["enabled"])
+    dpg.set_value(IDS["slot_pad"],     sc["xinput_index"])
+    dpg.set_value(IDS["ptr_combo"],    sc["pointer_source"])
 
 def on_reset_defaults(sender, app_data, user_data):
     config.reset_to_defaults(delete_config_file=True)
@@ -764,23 +3543,21 @@ def build_bind_table(title, actions):
         for key, label in actions:
             with dpg.table_row():
                 dpg.add_text(label)
-                with config.lock:
-                    b = config.bindings.get(key)
+                b = config.snap.bindings[gui_slot].get(key)
                 dpg.add_text(binding_name(b), tag=BIND_LABEL_TAG[key])
                 dpg.add_button(label="Rebind", tag=REBIND_BTN_TAG[key], user_data=key, callback=on_click_rebind)
 
 def build_gui():
+    import_gui()
     dpg.create_context()
-    dpg.create_viewport(title=APP_TITLE, width=1100, height=930)
+    dpg.create_viewport(title=APP_TITLE, width=1100, height=930, vsync=True)
     dpg.setup_dearpygui()
 
     with dpg.window(label=APP_TITLE, tag="main", width=1080, height=900, no_collapse=True):
         dpg.add_text("Server status")
         dpg.add_separator()
         with dpg.group(horizontal=True):
-            dpg.add_text("Host:"); dpg.add_text(HOST, tag=IDS["host_text"])
-            dpg.add_spacer(width=20)
-            dpg.add_text("Port:"); dpg.add_text(str(PORT), tag=IDS["port_text"])
+            dpg.add_text("Listening:"); dpg.add_text(", ".join(format_endpoint(h, p) for h,p in ENDPOINTS), tag=IDS["listen_text"])
             dpg.add_spacer(width=20)
             dpg.add_text("Subs: "); dpg.add_text("0", tag=IDS["subs_text"])
 
@@ -790,11 +3567,40 @@ def build_gui():
             dpg.add_slider_int(label="HZ", default_value=config.values["hz"], min_value=60, max_value=250, width=220, callback=on_slider_change, user_data="hz", tag=IDS["hz_slider"])
             dpg.add_checkbox(label="Invert Y", default_value=config.values["invert_y"], callback=on_checkbox, user_data="invert_y", tag=IDS["invert_y"])
             dpg.add_slider_float(label="Smoothing", default_value=config.values["smooth"], min_value=0.0, max_value=1.0, width=220, callback=on_slider_change, user_data="smooth", tag=IDS["smooth_slider"])
+            dpg.add_slider_float(label="Sub timeout (s)", default_value=config.values["sub_timeout_s"], min_value=1.0, max_value=30.0, width=160, callback=on_slider_change, user_data="sub_timeout_s", tag=IDS["sub_timeout"])
+        with dpg.group(horizontal=True):
+            dpg.add_text("Pointer filter")
+            dpg.add_combo(list(POINTER_FILTERS), default_value=config.values["pointer_filter"], width=100, callback=on_combo, user_data="pointer_filter", tag=IDS["pointer_filter"])
+            dpg.add_slider_float(label="Min cutoff (Hz)", default_value=config.values["oe_min_cutoff"], min_value=0.05, max_value=10.0, width=140, callback=on_slider_change, user_data="oe_min_cutoff", tag=IDS["oe_min_cutoff"])
+            dpg.add_slider_float(label="Beta", default_value=config.values["oe_beta"], min_value=0.0, max_value=0.2, width=140, callback=on_slider_change, user_data="oe_beta", tag=IDS["oe_beta"])
+            dpg.add_slider_float(label="Predict (ms)", default_value=config.values["predict_ms"], min_value=0.0, max_value=50.0, width=140, callback=on_slider_change, user_data="predict_ms", tag=IDS["predict_ms"])
+        with dpg.group(horizontal=True):
+            dpg.add_text("Scheduler")
+            dpg.add_combo(SCHED_STRATEGIES, default_value=config.values["sched_strategy"], width=110, callback=on_combo, user_data="sched_strategy", tag=IDS["sched_combo"])
+            dpg.add_text("Catch-up")
+            dpg.add_combo(SCHED_CATCHUP, default_value=config.values["sched_catchup"], width=110, callback=on_combo, user_data="sched_catchup", tag=IDS["catchup_combo"])
+            dpg.add_slider_int(label="Spin window (us)", default_value=config.values["spin_us"], min_value=0, max_value=4000, width=200, callback=on_slider_change, user_data="spin_us", tag=IDS["spin_us"])
+            dpg.add_slider_int(label="Sampler Hz (0 = off)", default_value=config.values["sampler_hz"], min_value=0, max_value=2000, width=160, callback=on_slider_change, user_data="sampler_hz", tag=IDS["sampler_hz"])
+            dpg.add_text("Server (restart)")
+            dpg.add_combo(SERVER_MODES, default_value=config.values["server_mode"], width=90, callback=on_combo, user_data="server_mode", tag=IDS["server_mode"])
+            dpg.add_input_text(label="Listen (restart)", default_value=config.values["listen"], width=220, on_enter=True, callback=on_listen_text, tag=IDS["listen"])
+        with dpg.group(horizontal=True):
+            dpg.add_checkbox(label="Send on change", default_value=config.values["delta_mode"], callback=on_checkbox, user_data="delta_mode", tag=IDS["delta_mode"])
+            dpg.add_slider_int(label="Keepalive (ms)", default_value=config.values["keepalive_ms"], min_value=20, max_value=1000, width=160, callback=on_slider_change, user_data="keepalive_ms", tag=IDS["keepalive_ms"])
+            dpg.add_slider_int(label="Max rate / subscriber (Hz, 0 = tick)", default_value=config.values["max_rate_hz"], min_value=0, max_value=250, width=160, callback=on_slider_change, user_data="max_rate_hz", tag=IDS["max_rate_hz"])
+            dpg.add_text("Suppressed: 0.0%", tag=IDS["suppressed_text"])
+        dpg.add_separator()
+
+        dpg.add_text("Slot (each slot is one virtual Wiimote; pointer source and bindings below are per slot)")
+        with dpg.group(horizontal=True):
+            dpg.add_combo(SLOT_LABELS, default_value=SLOT_LABELS[gui_slot], width=120, callback=on_slot_select, tag=IDS["slot_combo"])
+            dpg.add_checkbox(label="Enabled", default_value=config.slots[gui_slot]["enabled"], callback=on_slot_setting, user_data="enabled", tag=IDS["slot_enabled"])
+            dpg.add_slider_int(label="XInput pad", default_value=config.slots[gui_slot]["xinput_index"], min_value=0, max_value=3, width=120, callback=on_slot_setting, user_data="xinput_index", tag=IDS["slot_pad"])
         dpg.add_separator()
 
         dpg.add_text("Pointer (IR) — Source & dynamics")
         with dpg.group(horizontal=True):
-            dpg.add_combo(POINTER_SOURCES, default_value=config.values["pointer_source"], width=160, callback=on_combo, user_data="pointer_source", tag=IDS["ptr_combo"])
+            dpg.add_combo(POINTER_SOURCES, default_value=config.slots[gui_slot]["pointer_source"], width=160, callback=on_slot_setting, user_data="pointer_source", tag=IDS["ptr_combo"])
             dpg.add_slider_float(label="Cursor speed (px/s)", default_value=config.values["cursor_speed_px_s"], min_value=100.0, max_value=4000.0, width=300, callback=on_slider_change, user_data="cursor_speed_px_s", tag=IDS["cursor_speed"])
             dpg.add_slider_int(label="Stick deadzone", default_value=config.values["stick_deadzone"], min_value=0, max_value=20000, width=240, callback=on_slider_change, user_data="stick_deadzone", tag=IDS["deadzone"])
         with dpg.group(horizontal=True):
@@ -815,6 +3621,12 @@ def build_gui():
         # NEW: Twist bindings section (independent of D-Pad; gyro-only)
         build_bind_table("Bindings — Twist (hold to twist controller)", ACTIONS_TWIST)
 
+        dpg.add_separator()
+        build_bind_table("Bindings — Macros (press to play)", ACTIONS_MACRO)
+        with dpg.group(horizontal=True):
+            dpg.add_input_text(label="Macros file", default_value=config.values["macros_file"], width=220, callback=on_input_text, user_data="macros_file", on_enter=True, tag=IDS["macros_file"])
+            dpg.add_button(label="Reload Macros", callback=on_reload_macros)
+
         dpg.add_separator()
         dpg.add_text("Motion / Shake / Twist Tuning")
         with dpg.group(horizontal=True):
@@ -827,53 +3639,233 @@ def build_gui():
         with dpg.group(horizontal=True):
             dpg.add_slider_int(label="Pulse ms", default_value=config.values["pulse_ms"], min_value=4, max_value=200, width=200, callback=on_slider_change, user_data="pulse_ms", tag=IDS["pulse_ms"])
             dpg.add_slider_int(label="Cooldown ms", default_value=config.values["cooldown_ms"], min_value=0, max_value=200, width=220, callback=on_slider_change, user_data="cooldown_ms", tag=IDS["cooldown_ms"])
+        with dpg.group(horizontal=True):
+            dpg.add_text("Pulse shape")
+            dpg.add_combo(PULSE_SHAPES, default_value=config.values["pulse_shape"], width=110, callback=on_combo, user_data="pulse_shape", tag=IDS["pulse_shape"])
+            dpg.add_input_text(label="Custom curve file", default_value=config.values["pulse_curve_file"], width=220, callback=on_input_text, user_data="pulse_curve_file", on_enter=True, tag=IDS["pulse_curve_file"])
         with dpg.group(horizontal=True):
             dpg.add_slider_float(label="Twist rate (deg/s)",  default_value=config.values["twist_dps"],   min_value=0.0, max_value=720.0, width=260, callback=on_slider_change, user_data="twist_dps",  tag=IDS["twist_dps"])
+        with dpg.group(horizontal=True):
+            dpg.add_checkbox(label="IMU mode (tilt gravity with the gyro)", default_value=config.values["imu_mode"], callback=on_checkbox, user_data="imu_mode", tag=IDS["imu_mode"])
+            dpg.add_checkbox(label="Auto recenter", default_value=config.values["imu_auto_recenter"], callback=on_checkbox, user_data="imu_auto_recenter", tag=IDS["imu_auto_recenter"])
+            dpg.add_slider_float(label="Recenter rate (deg/s)", default_value=config.values["recenter_dps"], min_value=30.0, max_value=1440.0, width=200, callback=on_slider_change, user_data="recenter_dps", tag=IDS["recenter_dps"])
 
         dpg.add_separator()
         dpg.add_text("Config & Bindings")
         with dpg.group(horizontal=True):
             dpg.add_button(label="Save Config", callback=on_save_config)
             dpg.add_button(label="Reset to Defaults", callback=on_reset_defaults)
+            dpg.add_checkbox(label="Autosave", default_value=config.values["autosave"], callback=on_checkbox, user_data="autosave", tag=IDS["autosave"])
+        with dpg.group(horizontal=True):
+            dpg.add_text("Profile:")
+            dpg.add_combo(profiles.names(), default_value=config.profile or BASE_PROFILE, width=160, callback=on_profile_select, tag=IDS["profile_combo"])
+            dpg.add_button(label="Reload Profiles", callback=on_reload_profiles)
+            dpg.add_text(f"(*.json in '{config.values['profiles_dir']}', cycle with Next Profile)")
         with dpg.group(horizontal=True):
             dpg.add_input_text(label="Bindings file (.json)", default_value=config.values["bindings_filename"], width=260, callback=on_input_text, user_data="bindings_filename", tag=IDS["bindings_file"])
             dpg.add_button(label="Save Bindings (.json)", callback=on_save_bindings)
             dpg.add_button(label="Load Bindings (.json)", callback=on_load_bindings)
+        with dpg.group(horizontal=True):
+            dpg.add_input_text(label="Session file", default_value=config.values["session_filename"], width=260, callback=on_input_text, user_data="session_filename", tag=IDS["session_file"])
+            dpg.add_button(label="Start Recording", callback=on_start_recording)
+            dpg.add_button(label="Stop Recording", callback=on_stop_recording)
+
+        dpg.add_separator()
+        dpg.add_text("Diagnostics (tick lateness, encode and send times)")
+        dpg.add_text(stats.summary(), tag=IDS["stats_text"])
+        with dpg.group(horizontal=True):
+            dpg.add_input_text(label="Stats file (.json)", default_value=config.values["stats_filename"], width=260, callback=on_input_text, user_data="stats_filename", tag=IDS["stats_file"])
+            dpg.add_button(label="Export Stats", callback=on_export_stats)
+            dpg.add_button(label="Reset Stats", callback=on_reset_stats)
+            dpg.add_checkbox(label="Trace input latency", default_value=config.values["trace_latency"], callback=on_checkbox, user_data="trace_latency", tag=IDS["trace_latency"])
 
         dpg.add_separator()
-        dpg.add_text("Log:")
-        dpg.add_child_window(tag=IDS["log_child"], height=240, autosize_x=True, horizontal_scrollbar=True)
+        with dpg.group(horizontal=True):
+            dpg.add_text("Log:")
+            dpg.add_input_text(label="Log file (empty = off)", default_value=config.values["log_file"], width=260, on_enter=True, callback=on_input_text, user_data="log_file", tag=IDS["log_file"])
+        # fixed pool of rows over log_writer.lines; the slider scrolls back (0 = follow)
+        with dpg.group(horizontal=True):
+            with dpg.child_window(tag=IDS["log_child"], height=240, width=-40, horizontal_scrollbar=True, no_scrollbar=True):
+                for tag in LOG_ROW_TAGS:
+                    dpg.add_text("", tag=tag)
+            dpg.add_slider_int(tag=IDS["log_scroll"], vertical=True, height=240, width=20, min_value=0, max_value=0, default_value=0, format="")
 
     dpg.set_primary_window("main", True)
     dpg.show_viewport()
 
+LOG_ROWS = 13
+LOG_ROW_TAGS = [f"log_row_{i}" for i in range(LOG_ROWS)]
+log_view = [-1, -1]     # (seq, back) last drawn
+
+def render_log():
+    seq = log_writer.seq
+    back = dpg.get_value(IDS["log_scroll"])
+    if seq == log_view[0] and back == log_view[1]: return
+    span = max(0, len(log_writer.lines) - LOG_ROWS)
+    if back and log_view[0] >= 0:
+        back = min(span, back + seq - log_view[0])     # scrolled back: keep the view still
+    dpg.configure_item(IDS["log_scroll"], max_value=span)
+    dpg.set_value(IDS["log_scroll"], back)
+    rows = log_writer.view(LOG_ROWS, back)
+    rows += [""] * (LOG_ROWS - len(rows))
+    for tag, line in zip(LOG_ROW_TAGS, rows):
+        dpg.set_value(tag, line)
+    log_view[0] = seq
+    log_view[1] = back
+
+GUI_MAX_FPS = 60         # only when presenting doesn't wait for vsync
+GUI_VSYNC_WAIT_S = 0.001 # a present that took this long was paced by vsync
+gui_seen = {}           # topic -> Config.changes count last rendered
+gui_shown = {}          # tag -> value last pushed to the widget
+
+def gui_dirty(*topics):
+    hit = False
+    for t in topics:
+        n = config.changes[t]
+        if gui_seen.get(t) != n:
+            gui_seen[t] = n
+            hit = True
+    return hit
+
+def gui_set(tag, value):
+    if gui_shown.get(tag) != value:
+        gui_shown[tag] = value
+        dpg.set_value(tag, value)
+
+def render_binding_labels():
+    binds = config.snap.bindings[gui_slot]
+    target = config.rebind_target
+    for k,_ in ACTIONS_WIIMOTE + ACTIONS_EXTRA + ACTIONS_TWIST + ACTIONS_MACRO:
+        name = binding_name(binds.get(k))
+        if target == (gui_slot, k):
+            name = f"{name}  (waiting...)"
+        gui_set(BIND_LABEL_TAG[k], name)
+
 def gui_mainloop():
-    th = threading.Thread(target=server_thread, daemon=True)
+    mode = config.snap.values.get("server_mode", "thread")
+    th = threading.Thread(target=server_asyncio_thread if mode == "asyncio" else server_thread, daemon=True)
     th.start()
+    saver = ConfigSaver(config).start()
+    next_stats = 0.0
+    last_frame = time.perf_counter()
     while dpg.is_dearpygui_running():
-        # flush logs
-        while log_queue:
-            line = log_queue.popleft()
-            dpg.add_text(line, parent=IDS["log_child"])
-            dpg.set_y_scroll(IDS["log_child"], 1e9)
-
-        # update binding labels & subs count
-        with config.lock:
-            for k,_ in ACTIONS_WIIMOTE + ACTIONS_EXTRA + ACTIONS_TWIST:
-                name = binding_name(config.bindings.get(k))
-                if config.rebind_target == k:
-                    name = f"{name}  (waiting...)"
-                dpg.set_value(BIND_LABEL_TAG[k], name)
-            dpg.set_value(IDS["subs_text"], str(config.subs_count))
-
+        render_log()
+
+        if gui_dirty("bindings", "rebind") or gui_seen.get("slot") != gui_slot:
+            gui_seen["slot"] = gui_slot
+            render_binding_labels()
+        if gui_dirty("subs"):
+            gui_set(IDS["subs_text"], str(config.subs_count))
+        if gui_dirty("profile"):
+            # switched from the hotkey / a control message / the combo
+            gui_set(IDS["profile_combo"], config.profile or BASE_PROFILE)
+            sync_controls_from_config()
+
+        now = time.perf_counter()
+        if now >= next_stats:
+            gui_set(IDS["stats_text"], stats.summary())
+            gui_set(IDS["suppressed_text"], f"Suppressed: {stats.suppression_ratio()*100:.1f}%")
+            next_stats = now + 0.5
+
+        # render_dearpygui_frame() blocks on vsync, which paces the loop at the
+        # display's rate (120/144 Hz included). When it returns at once
+        # (minimized, vsync forced off by the driver) cap at GUI_MAX_FPS,
+        # counted from the previous frame's end.
+        t0 = time.perf_counter()
         dpg.render_dearpygui_frame()
-        time.sleep(0.01)
+        t1 = time.perf_counter()
+        if t1 - t0 < GUI_VSYNC_WAIT_S:
+            spare = 1.0 / GUI_MAX_FPS - (t1 - last_frame)
+            if spare > 0:
+                time.sleep(spare)
+                t1 = time.perf_counter()
+        last_frame = t1
 
     config.want_stop = True
+    saver.close()
     dpg.destroy_context()
 
 # ------------------------------ MAIN ------------------------------
+#   py vwiimote.py                               GUI + server
+#   py vwiimote.py --headless [--port 26761] ... server only (kiosk, CI)
+#   py vwiimote.py --switch NAME                 profile switch for a running server
+
+def parse_args(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(prog="vwiimote", description=f"{APP_TITLE}: DSU (Cemuhook) server")
+    ap.add_argument("--headless", action="store_true", help="run only the DSU server, no GUI")
+    ap.add_argument("--listen", metavar="ENDPOINTS", help='endpoints to serve, e.g. "127.0.0.1:26760,[::1]:26761" (overrides the config)')
+    ap.add_argument("--host", help=f"single endpoint: address to bind (default {HOST})")
+    ap.add_argument("--port", type=int, help=f"single endpoint: UDP port (default {PORT})")
+    ap.add_argument("--hz", type=int, help="packet rate, overrides the config and every profile")
+    ap.add_argument("--config", default=CONFIG_FILE, metavar="FILE", help=f"config file (default {CONFIG_FILE})")
+    ap.add_argument("--profile", metavar="NAME", help="start on this profile (see PROFILES)")
+    ap.add_argument("--switch", metavar="NAME", help="tell the running server on the first --listen endpoint to switch profile, then exit")
+    ap.add_argument("--backend", choices=list(INPUT_BACKENDS), help="input backend (default: win32 / evdev / synthetic)")
+    ap.add_argument("--session", metavar="FILE", help="session file for --backend replay")
+    args = ap.parse_args(argv)
+    if args.backend == "replay" and not args.session:
+        ap.error("--backend replay needs --session FILE")
+    if args.hz is not None:
+        try:
+            args.hz = coerce_setting("hz", args.hz, DEFAULTS["hz"])
+        except ValueError as e:
+            ap.error(f"--hz: {e}")
+    if args.listen is None and (args.host is not None or args.port is not None):
+        args.listen = format_endpoint(args.host or HOST, PORT if args.port is None else args.port)
+    if args.listen is not None:
+        try:
+            args.listen = parse_endpoints(args.listen)
+        except ValueError as e:
+            ap.error(f"--listen: {e}")
+    return args
+
+def send_control(host, port, command, timeout=1.0):
+    # -> the server's reply to a VWCTL command, or None without one
+    s = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_DGRAM)
+    s.settimeout(timeout)
+    try:
+        s.sendto(CTL_MAGIC + command.encode(), (host, port))
+        return s.recv(2048).decode("utf-8", "replace")
+    except OSError:
+        return None
+    finally:
+        s.close()
+
+def main(argv=None):
+    global HOST, PORT, ENDPOINTS
+    args = parse_args(argv)
+    if args.switch:
+        host, port = (args.listen or ENDPOINTS)[0]
+        host = {"0.0.0.0": "127.0.0.1", "::": "::1"}.get(host, host)
+        reply = send_control(host, port, f"profile {args.switch}")
+        print(reply or f"no reply from udp://{format_endpoint(host, port)}")
+        sys.exit(0 if reply and reply.startswith("OK") else 1)
+    config.load(args.config)
+    if args.hz is not None:
+        config.set_value("hz", args.hz)
+        profiles.overrides["hz"] = args.hz
+    profiles.load(config, config.snap.values["profiles_dir"])
+    if args.profile and not profiles.switch(config, args.profile):
+        log(f"Unknown profile '{args.profile}' (have: {', '.join(profiles.names())})")
+    ENDPOINTS = args.listen or parse_endpoints(config.values["listen"])
+    HOST, PORT = ENDPOINTS[0]
+    if args.backend == "replay":
+        use_backend("replay", path=args.session)
+    elif args.backend:
+        use_backend(args.backend)
+    if not args.headless:
+        build_gui()
+        gui_mainloop()
+        return
+    # headless: the server on this thread, Ctrl+C stops it; nothing is autosaved
+    try:
+        if config.snap.values["server_mode"] == "asyncio":
+            server_asyncio_thread()
+        else:
+            server_thread()
+    except KeyboardInterrupt:
+        config.want_stop = True
 
 if __name__ == "__main__":
-    build_gui()
-    gui_mainloop()
+    main()